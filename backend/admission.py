@@ -0,0 +1,220 @@
+"""
+admission.py
+Admission control for the prediction endpoints: a cap on requests in flight, a bounded
+wait queue, per-request queue deadlines and fast rejections under overload.
+
+- Up to `max_concurrent` requests run at once; later ones wait in a FIFO queue of at
+  most `max_queue` requests. A request arriving to a full queue is rejected at once
+  with 429, so overload costs the client one round trip instead of a slow timeout.
+- A queued request that has not started within its deadline (`queue_timeout_ms`, or
+  less if the client sends `X-Request-Timeout-Ms`) is rejected with 503: by then its
+  answer would be too late to be useful, and running it would only delay the rest.
+- A client deadline (`X-Request-Timeout-Ms`) also covers running: a request still
+  running when it passes is answered with 503 if nothing was sent yet. The work itself
+  is not cancelled, since a sync endpoint's threadpool thread cannot be stopped. It
+  finishes in the background with its output discarded and keeps its slot until then,
+  so no more than `max_concurrent` requests ever run.
+- Rejections carry `Retry-After`, estimated from the queue length and the recent
+  average service time.
+- A slot is handed straight from a finishing request to the next queued one, so queued
+  requests cannot be overtaken by new arrivals.
+
+Paths are matched exactly, so long-running routes (CSV uploads, batches) can be given
+their own Admission and cannot starve the interactive ones. Everything runs on the event
+loop, so no locks are needed; with several gunicorn workers each worker admits
+independently.
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+
+class Admission:
+    def __init__(self, max_concurrent: int = 32, max_queue: int = 64, queue_timeout_ms: float = 1000.0,
+                 max_retry_after: int = 30):
+        self.max_concurrent = max_concurrent  # 0 disables admission control
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self.max_retry_after = max_retry_after
+
+        self.active = 0
+        self._waiters = deque()
+        self._service_seconds = 0.05  # moving average of admitted requests' duration
+
+        self.admitted = 0
+        self.queued_total = 0
+        self.queue_wait_seconds = 0.0
+        self.rejected = {"queue_full": 0, "deadline": 0, "timed_out": 0}
+        self.peak_queued = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float = None):
+        """Take a slot; returns None when admitted, or the rejection reason ("queue_full", "deadline")."""
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            return "queue_full"
+
+        timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued_total += 1
+        self.peak_queued = max(self.peak_queued, len(self._waiters))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Client went away while queued; pass on a slot it was granted meanwhile
+            if waiter.done():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            self.queue_wait_seconds += time.perf_counter() - started
+
+        if waiter.done():  # granted, possibly in the same tick the deadline passed
+            self.admitted += 1
+            return None
+        self._waiters.remove(waiter)
+        self.rejected["deadline"] += 1
+        return "deadline"
+
+    def release(self, seconds: float = None):
+        if seconds is not None:
+            self._service_seconds += 0.1 * (seconds - self._service_seconds)
+        # Hand the slot to the oldest waiter instead of freeing it
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request should have drained."""
+        backlog = (len(self._waiters) + 1) * self._service_seconds / max(1, self.max_concurrent)
+        return max(1, min(self.max_retry_after, math.ceil(backlog)))
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout_ms": self.queue_timeout * 1000.0,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "peak_queued": self.peak_queued,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "queue_wait_seconds": round(self.queue_wait_seconds, 6),
+            "rejected": dict(self.rejected),
+            "avg_service_ms": round(self._service_seconds * 1000.0, 3),
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware: requests to `paths` (exact) go through `admission`; others pass straight through."""
+
+    statuses = {"queue_full": 429, "deadline": 503, "timed_out": 503}
+    messages = {"queue_full": "Server busy: request queue is full", "deadline": "Server busy: request waited past its deadline",
+                "timed_out": "Request ran past its deadline"}
+
+    def __init__(self, app, admission: Admission, paths=()):
+        self.app = app
+        self.admission = admission
+        self.paths = frozenset(paths)
+        self._abandoned = set()  # requests answered past their deadline and still running
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not self.admission.enabled or scope["method"] == "OPTIONS"
+                or scope["path"] not in self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.perf_counter()
+        timeout = _client_timeout(scope)
+        rejected = await self.admission.acquire(timeout)
+        if rejected is not None:
+            await self._reject(send, rejected)
+            return
+        started = time.perf_counter()
+        if timeout is not None:
+            await self._run_until(scope, receive, send, timeout - (started - arrived), started)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release(time.perf_counter() - started)
+
+    async def _run_until(self, scope, receive, send, remaining: float, started: float):
+        # The client's deadline covers queueing and running; past it the answer is no longer wanted
+        response_started = abandoned = False
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if abandoned:
+                return  # past the deadline: answered with 503, or the stream is cut off
+            response_started = response_started or message["type"] == "http.response.start"
+            await send(message)
+
+        def finished(task):
+            # The slot is held until the work is really over, not just until the client was answered
+            self._abandoned.discard(task)
+            self.admission.release(time.perf_counter() - started)
+            if not task.cancelled():
+                task.exception()  # a failure past the deadline has no one left to report to
+
+        task = asyncio.ensure_future(self.app(scope, receive, tracked_send))
+        task.add_done_callback(finished)
+        try:
+            done, _ = await asyncio.wait((task,), timeout=max(remaining, 0.0))
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if done:
+            task.result()
+            return
+        self.admission.rejected["timed_out"] += 1
+        self._abandoned.add(task)
+        abandoned = True
+        if not response_started:
+            await self._reject(send, "timed_out")
+
+    async def _reject(self, send, reason: str):
+        body = json.dumps({"detail": self.messages[reason], "reason": reason}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": self.statuses[reason],
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.admission.retry_after()).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _client_timeout(scope):
+    # X-Request-Timeout-Ms: how long the client is willing to wait for a slot
+    for name, value in scope.get("headers", ()):
+        if name == b"x-request-timeout-ms":
+            try:
+                return max(0.0, float(value) / 1000.0)
+            except ValueError:
+                return None
+    return None
@@ -0,0 +1,331 @@
+"""
+agronomy.py
+Vectorized post-processing shared by main.py, simple_server.py and simple_test.py.
+
+Given NumPy arrays of request inputs and predicted yields (N rows), computes the
+monthly yield profile, factor scores and labels, suitability score, drought/heat/
+flood/water risk tiers and recommendation flags for all rows at once. Each server
+keeps its own thresholds and wording as a profile dict below, so single and batch
+requests go through the same code path.
+"""
+
+import numpy as np
+
+INPUT_FIELDS = ("temperature", "rainfall", "humidity", "water", "fertilizer")
+RISKS = ("drought", "heat", "flood", "water")
+FACTORS = ("temperature", "rainfall", "humidity", "water")
+
+MONTHLY_WEIGHTS = [0.03, 0.04, 0.05, 0.08, 0.10, 0.13, 0.15, 0.14, 0.11, 0.07, 0.06, 0.04]
+
+_OPS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}
+_INF = float("inf")
+_COMPILED = {}  # id(profile) -> compile_profile() output
+
+
+# ---------- Profiles ----------
+
+# main.py (XGBoost model server)
+MAIN_PROFILE = {
+    "monthly_weights": MONTHLY_WEIGHTS,
+    "yield_decimals": 2,
+    "monthly_decimals": 2,
+    "scores": {
+        "temperature": {"kind": "distance", "center": 29, "slope": 4},
+        "rainfall": {"kind": "distance", "center": 1200, "slope": 0.05},
+        "humidity": {"kind": "distance", "center": 75, "slope": 2},
+        "water": {"kind": "value"},
+    },
+    # score >= threshold -> label, thresholds in descending order
+    "labels": {
+        "temperature": {"tiers": [(70, "Optimal"), (40, "Manageable")], "default": "Stressful", "inclusive": True},
+        "rainfall": {"tiers": [(70, "Well distributed"), (40, "Variable")], "default": "Inadequate", "inclusive": True},
+        "humidity": {"tiers": [(70, "Favorable"), (40, "Mixed")], "default": "Unfavorable", "inclusive": True},
+        "water": {"tiers": [(70, "Secure"), (40, "Cautious")], "default": "Insufficient", "inclusive": True},
+    },
+    # Temperature ideal ~ 25–32, rainfall ~ 900–1500 mm, water (irrigation), humidity (loose effect)
+    "suitability": {
+        "kind": "bands",
+        "bands": {
+            "temperature": {"bands": [(25, 32, 30), (22, 35, 20)], "default": 10},
+            "rainfall": {"bands": [(900, 1500, 30), (700, 2000, 20)], "default": 10},
+            "water": {"bands": [(75, _INF, 25), (50, _INF, 15)], "default": 5},
+            "humidity": {"bands": [(60, 85, 15)], "default": 8},
+        },
+    },
+    "risk_labels": ("High", "Moderate", "Low"),
+    "risks": {
+        "drought": {"high": [("rainfall", "<", 700), ("water", "<", 60)], "moderate": [("rainfall", "<", 900)]},
+        "heat": {"high": [("temperature", ">", 36)], "moderate": [("temperature", ">", 32)]},
+        "flood": {"high": [("rainfall", ">", 2000)], "moderate": [("rainfall", ">", 1500)]},
+        "water": {"high": [("water", "<", 40)], "moderate": [("water", "<", 70)]},
+    },
+    "fertilizer_threshold": 40,
+    "recommendations": {
+        "drought": "Plan for drought-resilient varieties and staggered irrigation to reduce moisture stress.",
+        "heat": "Avoid peak heat stress by adjusting sowing window and ensuring adequate water during flowering.",
+        "flood": "Improve drainage in low-lying fields and avoid excess standing water during heavy rains.",
+        "fertilizer": "Current fertilizer input seems low; review NPK recommendation for your soil test results.",
+        "default": "Conditions are generally favorable. Maintain timely irrigation and recommended fertilizer schedule.",
+    },
+}
+
+# simple_server.py (heuristic server deployed on Render)
+SIMPLE_SERVER_PROFILE = {
+    "monthly_weights": MONTHLY_WEIGHTS,
+    "yield_decimals": 1,
+    "monthly_decimals": 1,
+    "scores": {
+        "temperature": {"kind": "distance", "center": 28, "slope": 3},
+        "rainfall": {"kind": "ratio", "divisor": 15},
+        "humidity": {"kind": "distance", "center": 77, "slope": 2},
+        "water": {"kind": "value"},
+    },
+    # score > threshold -> label, thresholds in descending order
+    "labels": {
+        "temperature": {"tiers": [(80, "Optimal"), (60, "Moderate")], "default": "Poor", "inclusive": False},
+        "rainfall": {"tiers": [(90, "Excellent"), (70, "Good")], "default": "Moderate", "inclusive": False},
+        "humidity": {"tiers": [(75, "Favorable"), (50, "Moderate")], "default": "Poor", "inclusive": False},
+        "water": {"tiers": [(70, "Secure"), (40, "Limited")], "default": "Critical", "inclusive": False},
+    },
+    "suitability": {"kind": "mean", "decimals": None, "clip": True},
+    "risk_labels": ("High", "Medium", "Low"),
+    "risks": {
+        "drought": {"high": [("rainfall", "<", 800), ("water", "<", 60)], "moderate": [("rainfall", "<", 1200)]},
+        "heat": {"high": [("temperature", ">", 35)], "moderate": [("temperature", ">", 32)]},
+        "flood": {"high": [("rainfall", ">", 2500)], "moderate": [("rainfall", ">", 2000)]},
+        "water": {"high": [("water", "<", 30)], "moderate": [("water", "<", 60)]},
+    },
+    "fertilizer_threshold": 40,
+    "recommendations": {
+        "drought": "Consider drought-resistant varieties and efficient irrigation",
+        "heat": "Plan for heat stress management during flowering stage",
+        "flood": "Ensure proper drainage and avoid waterlogging",
+        "fertilizer": "Consider increasing fertilizer application based on soil test",
+        "default": "Conditions are favorable for rice cultivation",
+    },
+}
+
+# simple_test.py (randomized test server)
+SIMPLE_TEST_PROFILE = {
+    "monthly_weights": MONTHLY_WEIGHTS,
+    "yield_decimals": 2,
+    "monthly_decimals": 2,
+    "scores": {
+        "temperature": {"kind": "distance", "center": 29, "slope": 3},
+        "rainfall": {"kind": "distance", "center": 1200, "slope": 0.04},
+        "humidity": {"kind": "distance", "center": 75, "slope": 1.5},
+        "water": {"kind": "value", "clip": False},
+    },
+    "labels": {
+        factor: {"tiers": [(70, "Good")], "default": "Fair", "inclusive": False} for factor in FACTORS
+    },
+    "suitability": {"kind": "mean", "decimals": 1, "clip": False},
+    "risk_labels": ("High", "Moderate", "Low"),
+    "risks": {
+        "drought": {"high": [("rainfall", "<", 600)], "moderate": None},
+        "heat": {"high": [("temperature", ">", 35)], "moderate": None},
+        "flood": {"high": [("rainfall", ">", 2000)], "moderate": None},
+        "water": {"high": [("water", "<", 40)], "moderate": None},
+    },
+    "fertilizer_threshold": 40,
+    # simple_test.py writes its own recommendation text
+    "recommendations": None,
+}
+
+
+# ---------- Vectorized building blocks ----------
+
+def inputs_from_requests(reqs) -> dict:
+    """Column arrays of the slider inputs from a list of PredictionRequest objects."""
+    return {field: np.array([getattr(req, field) for req in reqs], dtype=np.float64) for field in INPUT_FIELDS}
+
+
+def _select(conditions: list, table: np.ndarray) -> np.ndarray:
+    # First matching condition wins, like np.select; table holds the choices followed by the default.
+    # Avoids np.select's broadcasting overhead, which dominates for single-row requests.
+    index = np.full(len(conditions[0]), len(conditions))
+    for k in range(len(conditions) - 1, -1, -1):
+        index[conditions[k]] = k
+    return table[index]
+
+
+def compile_profile(profile: dict) -> dict:
+    """Turn a profile into coefficient and lookup arrays (cached per profile)."""
+    compiled = _COMPILED.get(id(profile))
+    if compiled is not None:
+        return compiled
+
+    # score = offset + slope * |x - center| + x / divisor, clipped per factor:
+    # "distance" -> 100 - slope*|x - center|, "ratio" -> x / divisor, "value" -> x
+    rules = [profile["scores"][factor] for factor in FACTORS]
+    for rule in rules:
+        if rule["kind"] not in ("distance", "ratio", "value"):
+            raise ValueError(f"Unknown score kind: {rule['kind']}")
+    distance = [rule["kind"] == "distance" for rule in rules]
+
+    # Label tiers are in descending threshold order, so the tier index is the number of thresholds missed
+    label_rules = [profile["labels"][factor] for factor in FACTORS]
+    n_tiers = max(len(rule["tiers"]) for rule in label_rules)
+    thresholds = np.full((len(FACTORS), n_tiers), -_INF)
+    table = np.empty((len(FACTORS), n_tiers + 1), dtype=object)
+    for k, rule in enumerate(label_rules):
+        for t, (threshold, label) in enumerate(rule["tiers"]):
+            thresholds[k, t] = threshold
+            table[k, t] = label
+        table[k, len(rule["tiers"]):] = rule["default"]
+
+    compiled = {
+        "offset": np.array([100.0 if d else 0.0 for d in distance]),
+        "center": np.array([rule["center"] if d else 0.0 for rule, d in zip(rules, distance)], dtype=np.float64),
+        "slope": np.array([-rule["slope"] if d else 0.0 for rule, d in zip(rules, distance)], dtype=np.float64),
+        "divisor": np.array([
+            _INF if rule["kind"] == "distance" else rule.get("divisor", 1.0) for rule in rules
+        ], dtype=np.float64),
+        "lower": np.array([0.0 if rule.get("clip", True) else -_INF for rule in rules]),
+        "upper": np.array([100.0 if rule.get("clip", True) else _INF for rule in rules]),
+        "label_thresholds": thresholds,
+        "label_inclusive": np.array([rule["inclusive"] for rule in label_rules])[:, None],
+        "label_table": table,
+        "bands": {
+            field: np.array([points for _, _, points in spec["bands"]] + [spec["default"]], dtype=np.float64)
+            for field, spec in profile["suitability"].get("bands", {}).items()
+        },
+        "risk_table": np.array(profile["risk_labels"], dtype=object),
+    }
+    _COMPILED[id(profile)] = compiled
+    return compiled
+
+
+def factor_scores(compiled: dict, inputs: dict) -> np.ndarray:
+    """(N, 4) unrounded scores in FACTORS order."""
+    x = np.column_stack([inputs[factor] for factor in FACTORS])
+    score = compiled["offset"] + compiled["slope"] * np.abs(x - compiled["center"]) + x / compiled["divisor"]
+    return np.clip(score, compiled["lower"], compiled["upper"])
+
+
+def qualitative_labels(compiled: dict, scores: np.ndarray) -> np.ndarray:
+    """(N, 4) labels for the (N, 4) scores."""
+    s = scores[:, :, None]
+    thresholds = compiled["label_thresholds"]
+    missed = np.where(compiled["label_inclusive"], s < thresholds, s <= thresholds)
+    return compiled["label_table"][np.arange(len(FACTORS)), missed.sum(axis=2)]
+
+
+def compute_suitability(profile: dict, compiled: dict, inputs: dict, scores: np.ndarray) -> np.ndarray:
+    rule = profile["suitability"]
+    if rule["kind"] == "bands":
+        total = np.zeros(len(scores))
+        for field, spec in rule["bands"].items():
+            x = inputs[field]
+            conditions = [(lo <= x) & (x <= hi) for lo, hi, _ in spec["bands"]]
+            total += _select(conditions, compiled["bands"][field])
+        return np.clip(total, 0, 100).astype(np.int64)
+
+    # Same left-to-right summation order as the original scalar code
+    mean = (scores[:, 0] + scores[:, 1] + scores[:, 2] + scores[:, 3]) / len(FACTORS)
+    if rule["decimals"] is None:
+        mean = np.trunc(mean).astype(np.int64)
+    # Rounding to rule["decimals"] happens when the response is built (see round_values)
+    return np.clip(mean, 0, 100) if rule["clip"] else mean
+
+
+def _all_conditions(inputs: dict, conditions: list) -> np.ndarray:
+    field, op, threshold = conditions[0]
+    mask = _OPS[op](inputs[field], threshold)
+    for field, op, threshold in conditions[1:]:
+        mask &= _OPS[op](inputs[field], threshold)
+    return mask
+
+
+def risk_tiers(profile: dict, compiled: dict, inputs: dict) -> dict:
+    tiers = {}
+    for risk, rule in profile["risks"].items():
+        conditions = [_all_conditions(inputs, rule["high"])]
+        if rule["moderate"]:
+            conditions.append(_all_conditions(inputs, rule["moderate"]))
+            table = compiled["risk_table"]
+        else:
+            table = compiled["risk_table"][[0, 2]]
+        tiers[risk] = _select(conditions, table)
+    return tiers
+
+
+def evaluate(profile: dict, inputs: dict, yields) -> dict:
+    """Compute every derived quantity for N rows; all values are unrounded arrays with N rows."""
+    compiled = compile_profile(profile)
+    yields = np.asarray(yields, dtype=np.float64)
+
+    scores = factor_scores(compiled, inputs)
+    labels = qualitative_labels(compiled, scores)
+    risks = risk_tiers(profile, compiled, inputs)
+
+    low = profile["risk_labels"][2]
+    flags = {
+        "drought": risks["drought"] != low,
+        "heat": risks["heat"] != low,
+        "flood": risks["flood"] != low,
+        "fertilizer": inputs["fertilizer"] < profile["fertilizer_threshold"],
+    }
+
+    return {
+        "yield": yields,
+        "monthly_yield": yields[:, None] * np.asarray(profile["monthly_weights"]),
+        "suitability_score": compute_suitability(profile, compiled, inputs, scores),
+        "scores": {factor: scores[:, k] for k, factor in enumerate(FACTORS)},
+        "labels": {factor: labels[:, k] for k, factor in enumerate(FACTORS)},
+        "risk": risks,
+        "flags": flags,
+    }
+
+
+def round_values(values: np.ndarray, decimals) -> list:
+    # Python's round() is correctly rounded on the decimal value (83.55 -> 83.5) whereas
+    # np.round scales first (-> 83.6); round per element to keep the established API output
+    if decimals is None:
+        return values.tolist()
+    if values.ndim == 2:
+        return [[round(v, decimals) for v in row] for row in values.tolist()]
+    return [round(v, decimals) for v in values.tolist()]
+
+
+def recommendations_for(profile: dict, flags: dict) -> list:
+    """Per-row recommendation lists from the boolean flag arrays."""
+    texts = profile["recommendations"]
+    order = ("drought", "heat", "flood", "fertilizer")
+    columns = [flags[name].tolist() for name in order]
+    rows = []
+    for row_flags in zip(*columns):
+        row = [texts[name] for name, on in zip(order, row_flags) if on]
+        rows.append(row or [texts["default"]])
+    return rows
+
+
+def build_responses(profile: dict, inputs: dict, yields) -> list:
+    """Response dicts shaped like the frontend PredictionResult, one per row."""
+    result = evaluate(profile, inputs, yields)
+
+    # Convert every column to Python scalars once, then assemble rows
+    yield_col = round_values(result["yield"], profile["yield_decimals"])
+    monthly = round_values(result["monthly_yield"], profile["monthly_decimals"])
+    suitability = round_values(result["suitability_score"], profile["suitability"].get("decimals"))
+    scores = {factor: round_values(result["scores"][factor], 1) for factor in FACTORS}
+    labels = {factor: result["labels"][factor].tolist() for factor in FACTORS}
+    risks = {risk: result["risk"][risk].tolist() for risk in RISKS}
+    recommendations = (recommendations_for(profile, result["flags"]) if profile["recommendations"]
+                       else [[] for _ in yield_col])
+
+    responses = []
+    for i in range(len(yield_col)):
+        responses.append({
+            "yield": yield_col[i],
+            "monthly_yield": monthly[i],
+            "weather_analysis": {
+                "suitability_score": suitability[i],
+                "factors": {
+                    factor: {"score": scores[factor][i], "label": labels[factor][i]} for factor in FACTORS
+                },
+            },
+            "risk": {risk: risks[risk][i] for risk in RISKS},
+            "recommendations": recommendations[i],
+        })
+    return responses
@@ -0,0 +1,337 @@
+"""
+benchmark.py
+Reproducible latency/throughput/memory benchmark for the FastAPI servers
+(main.py, simple_server.py, simple_test.py).
+
+Each app runs in its own process, either in-process behind an ASGI client ("asgi")
+or as a local uvicorn server driven over HTTP ("uvicorn"). Request bodies are built
+from rows of training/tamil_nadu_rice_yield_dataset.csv:
+
+- unique  every request is a different dataset row
+- repeat  80% of requests come from a hot set of 50 rows (exercises caches)
+- batch   /api/predict/batch with --batch-size rows per call (apps that have it)
+
+Results (p50/p95/p99 latency, throughput per concurrency level, RSS) are written as
+JSON together with the git commit, so runs can be compared across commits:
+
+    python benchmark.py --out bench_before.json
+    python benchmark.py --out bench_after.json --compare bench_before.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATASET_PATH = os.path.join(HERE, "..", "training", "tamil_nadu_rice_yield_dataset.csv")
+APPS = ("main", "simple_server", "simple_test")
+MODES = ("asgi", "uvicorn")
+MIXES = ("unique", "repeat", "batch")
+HOT_SET_SIZE = 50
+HOT_SET_SHARE = 0.8
+
+
+# ---------- Request mixes ----------
+
+def dataset_requests(path: str = DATASET_PATH, seed: int = 0) -> list[dict]:
+    """One /api/predict body per dataset row, in the units the frontend sends."""
+    rng = random.Random(seed)
+    bodies = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            fertilizer_kg = float(row["fertilizer_kg_per_ha"])
+            bodies.append({
+                "district": row["district"],
+                "season": row["season"].lower(),
+                "year": int(row["year"]),
+                "temperature": round((float(row["max_temp_c"]) + float(row["min_temp_c"])) / 2.0, 1),
+                "rainfall": float(row["rainfall_mm"]),
+                # Not in the dataset; drawn from the frontend slider's usual range
+                "humidity": float(rng.randint(55, 90)),
+                "water": float(row["irrigation_percent"]),
+                # Inverse of main.py's slider -> kg/ha mapping (0-100 -> 70-250 kg/ha)
+                "fertilizer": round(min(max((fertilizer_kg - 70.0) / 180.0 * 100.0, 0.0), 100.0), 1),
+            })
+    return bodies
+
+
+def request_mix(bodies: list[dict], mix: str, n: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    if mix == "repeat":
+        hot = rng.sample(bodies, min(HOT_SET_SIZE, len(bodies)))
+        return [rng.choice(hot) if rng.random() < HOT_SET_SHARE else rng.choice(bodies) for _ in range(n)]
+    order = list(bodies)
+    rng.shuffle(order)
+    return [order[i % len(order)] for i in range(n)]
+
+
+# ---------- Measurement ----------
+
+def rss_mb(pid: int = None) -> dict:
+    """Current and peak resident memory of a process (Linux /proc; falls back to getrusage for self)."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {"rss_mb": round(int(fields["VmRSS"].split()[0]) / 1024.0, 1),
+                "peak_rss_mb": round(int(fields["VmHWM"].split()[0]) / 1024.0, 1)}
+    except (OSError, KeyError, ValueError):
+        if pid is not None:
+            return {"rss_mb": None, "peak_rss_mb": None}
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+        return {"rss_mb": None, "peak_rss_mb": round(peak_mb, 1)}
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float, n_requests: int, rows_per_request: int) -> dict:
+    lat_ms = np.array(latencies) * 1000.0
+    return {
+        "requests": n_requests,
+        "errors": errors,
+        "throughput_rps": round(n_requests / elapsed, 1),
+        "rows_per_second": round(n_requests * rows_per_request / elapsed, 1),
+        "latency_ms": {
+            "p50": round(float(np.percentile(lat_ms, 50)), 3),
+            "p95": round(float(np.percentile(lat_ms, 95)), 3),
+            "p99": round(float(np.percentile(lat_ms, 99)), 3),
+            "mean": round(float(lat_ms.mean()), 3),
+            "max": round(float(lat_ms.max()), 3),
+        } if len(lat_ms) else None,
+    }
+
+
+async def drive(client, path: str, payloads: list, concurrency: int) -> tuple[list[float], int, float]:
+    # Closed loop: `concurrency` workers each send their next request as soon as the last one returns
+    latencies, errors = [], 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < len(payloads):
+            payload = payloads[next_index]
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run_scenarios(client, args, server_pid: int = None) -> list[dict]:
+    bodies = dataset_requests(args.dataset, args.seed)
+    results = []
+    for mix in args.mixes:
+        if mix == "batch":
+            probe = await client.post("/api/predict/batch", json=bodies[:1])
+            if probe.status_code in (404, 405):
+                continue
+            path, rows_per_request = "/api/predict/batch", args.batch_size
+            rows = request_mix(bodies, "unique", args.requests * args.batch_size, args.seed)
+            payloads = [rows[i:i + args.batch_size] for i in range(0, len(rows), args.batch_size)]
+        else:
+            path, rows_per_request = "/api/predict", 1
+            payloads = request_mix(bodies, mix, args.requests, args.seed)
+
+        if args.warmup:
+            await drive(client, path, payloads[:args.warmup], min(args.warmup, max(args.concurrency)))
+        for concurrency in args.concurrency:
+            latencies, errors, elapsed = await drive(client, path, payloads, concurrency)
+            result = {"mix": mix, "concurrency": concurrency}
+            result.update(summarize(latencies, errors, elapsed, len(payloads), rows_per_request))
+            result.update(rss_mb(server_pid))
+            results.append(result)
+            print(f"  {mix:7s} c={concurrency:<3d} {result['throughput_rps']:8.1f} rps  "
+                  f"p50={result['latency_ms']['p50']:.2f}ms p99={result['latency_ms']['p99']:.2f}ms  "
+                  f"errors={errors}", file=sys.stderr)
+    return results
+
+
+# ---------- One app, one mode (runs in a child process) ----------
+
+async def bench_asgi(app_name: str, args) -> dict:
+    import httpx
+
+    started = time.perf_counter()
+    sys.path.insert(0, HERE)
+    module = __import__(app_name)
+    app = module.app
+    # Run the app's startup/shutdown hooks (model load, micro-batcher) as uvicorn would
+    async with app.router.lifespan_context(app):
+        startup_seconds = time.perf_counter() - started
+        memory_after_startup = rss_mb()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            results = await run_scenarios(client, args)
+    return {"startup_seconds": round(startup_seconds, 3), "memory_after_startup": memory_after_startup,
+            "results": results}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def bench_uvicorn(app_name: str, args) -> dict:
+    import httpx
+
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{app_name}:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=HERE, stdout=subprocess.DEVNULL,
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30.0,
+                                     limits=httpx.Limits(max_connections=max(args.concurrency))) as client:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {server.returncode} while starting {app_name}")
+                if time.perf_counter() - started > args.startup_timeout:
+                    raise RuntimeError(f"{app_name} did not answer /health within {args.startup_timeout}s")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.05)
+            startup_seconds = time.perf_counter() - started
+            memory_after_startup = rss_mb(server.pid)
+            results = await run_scenarios(client, args, server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return {"startup_seconds": round(startup_seconds, 3), "memory_after_startup": memory_after_startup,
+            "results": results}
+
+
+def run_child(app_name: str, mode: str, argv: list[str]) -> dict:
+    # A fresh interpreter per (app, mode) so imports, caches and memory do not leak between runs
+    command = [sys.executable, os.path.abspath(__file__), "--child", app_name, mode] + argv
+    completed = subprocess.run(command, cwd=HERE, stdout=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        return {"error": f"benchmark process exited with code {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# ---------- Reporting ----------
+
+def git_info() -> dict:
+    def git(*cmd):
+        try:
+            return subprocess.run(["git", *cmd], cwd=HERE, capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+
+def result_key(run: dict, result: dict) -> tuple:
+    return run["app"], run["mode"], result["mix"], result["concurrency"]
+
+
+def compare(report: dict, baseline: dict):
+    previous = {result_key(run, r): r for run in baseline.get("runs", []) for r in run.get("results", [])}
+    print(f"\nCompared with {baseline.get('git', {}).get('commit', '?')[:10]}:")
+    print(f"{'app':14s} {'mode':8s} {'mix':7s} {'c':>3s} {'rps':>16s} {'p50 ms':>18s} {'p99 ms':>18s}")
+    for run in report["runs"]:
+        for r in run.get("results", []):
+            old = previous.get(result_key(run, r))
+            if old is None:
+                continue
+
+            def delta(new, before):
+                change = (new - before) / before * 100.0 if before else 0.0
+                return f"{new:9.2f} ({change:+5.1f}%)"
+
+            print(f"{run['app']:14s} {run['mode']:8s} {r['mix']:7s} {r['concurrency']:3d} "
+                  f"{delta(r['throughput_rps'], old['throughput_rps']):>16s} "
+                  f"{delta(r['latency_ms']['p50'], old['latency_ms']['p50']):>18s} "
+                  f"{delta(r['latency_ms']['p99'], old['latency_ms']['p99']):>18s}")
+
+
+def parse_args(argv=None):
+    def names(allowed):
+        def parse(value):
+            items = [v.strip() for v in value.split(",") if v.strip()]
+            unknown = set(items) - set(allowed)
+            if unknown:
+                raise argparse.ArgumentTypeError(f"unknown: {', '.join(sorted(unknown))} (choose from {', '.join(allowed)})")
+            return items
+        return parse
+
+    parser = argparse.ArgumentParser(description="Benchmark the rice yield prediction servers")
+    parser.add_argument("--apps", type=names(APPS), default=list(APPS))
+    parser.add_argument("--modes", type=names(MODES), default=list(MODES))
+    parser.add_argument("--mixes", type=names(MIXES), default=list(MIXES))
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="requests per mix and concurrency level")
+    parser.add_argument("--batch-size", type=int, default=50, help="rows per /api/predict/batch call")
+    parser.add_argument("--warmup", type=int, default=50, help="requests sent before each mix is measured")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    parser.add_argument("--child", nargs=2, metavar=("APP", "MODE"), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+
+    if args.child:
+        app_name, mode = args.child
+        bench = bench_asgi if mode == "asgi" else bench_uvicorn
+        # Keep stdout for the JSON result; the apps' own startup prints go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            result = asyncio.run(bench(app_name, args))
+        print(json.dumps(result))
+        return
+
+    report = {
+        "git": git_info(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("child", "out", "compare")},
+        "runs": [],
+    }
+    for app_name in args.apps:
+        for mode in args.modes:
+            print(f"▶ {app_name} ({mode})", file=sys.stderr)
+            run = {"app": app_name, "mode": mode}
+            run.update(run_child(app_name, mode, argv))
+            report["runs"].append(run)
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Saved results to {args.out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
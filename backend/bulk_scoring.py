@@ -0,0 +1,219 @@
+"""
+bulk_scoring.py
+Chunked parsing, validation and result formatting for scoring large CSV files
+(POST /api/predict/csv and `python main.py score`).
+
+Input is read as raw byte blocks, split into complete lines and handed out `chunk_rows`
+records at a time, so memory stays bounded by one chunk no matter how long the file
+is. Two input schemas are recognised from the header:
+
+- "request": the PredictionRequest fields (district, season, year, temperature,
+  rainfall, humidity, water, fertilizer), i.e. the frontend's units
+- "dataset": the training CSV (tamil_nadu_rice_yield_dataset.csv) columns, scored in
+  the model's own units; area_ha and production_tonnes are optional
+
+Each record is one line (quoted fields may not contain newlines). Rows that fail
+validation are reported with their row number and scoring carries on.
+"""
+
+import csv
+import io
+import json
+import math
+
+import numpy as np
+
+SCHEMAS = {
+    "request": {
+        "text": ("district", "season"),
+        "numeric": ("year", "temperature", "rainfall", "humidity", "water", "fertilizer"),
+        "optional": (),
+    },
+    "dataset": {
+        "text": ("district", "season"),
+        "numeric": ("year", "rainfall_mm", "max_temp_c", "min_temp_c", "irrigation_percent", "fertilizer_kg_per_ha"),
+        "optional": ("area_ha", "production_tonnes"),
+    },
+}
+OUTPUT_COLUMNS = ["row", "district", "season", "year", "yield", "error"]
+
+
+class BulkInputError(ValueError):
+    """The input as a whole cannot be scored (bad header, oversized line)."""
+
+
+def detect_schema(header: list[str]) -> str:
+    columns = set(header)
+    missing = {}
+    for name, schema in SCHEMAS.items():
+        missing[name] = [c for c in schema["text"] + schema["numeric"] if c not in columns]
+        if not missing[name]:
+            return name
+    closest = min(missing, key=lambda name: len(missing[name]))
+    raise BulkInputError(f"CSV header matches no known schema; closest is '{closest}', "
+                         f"missing columns: {', '.join(missing[closest])}")
+
+
+class LineSplitter:
+    """Turns arbitrary byte chunks into complete lines, holding back a trailing partial line."""
+
+    def __init__(self, max_line_bytes: int = 65536):
+        self.max_line_bytes = max_line_bytes
+        self._pending = b""
+        self._started = False
+
+    def feed(self, data: bytes) -> list[str]:
+        data = self._pending + data
+        if not self._started and data:
+            self._started = True
+            if data.startswith(b"\xef\xbb\xbf"):
+                data = data[3:]
+        end = data.rfind(b"\n")
+        if end < 0:
+            self._pending = data
+            if len(data) > self.max_line_bytes:
+                raise BulkInputError(f"Line longer than {self.max_line_bytes} bytes")
+            return []
+        self._pending = data[end + 1:]
+        return self._decode(data[:end])
+
+    def close(self) -> list[str]:
+        rest, self._pending = self._pending, b""
+        return self._decode(rest) if rest.strip() else []
+
+    @staticmethod
+    def _decode(data: bytes) -> list[str]:
+        return [line for line in data.decode("utf-8", errors="replace").splitlines() if line.strip()]
+
+
+class ChunkParser:
+    """Feeds lines in, hands out validated chunks of at most `chunk_rows` records."""
+
+    def __init__(self, chunk_rows: int = 1000):
+        self.chunk_rows = chunk_rows
+        self.header = None
+        self.schema = None
+        self.rows_seen = 0
+        self._lines = []
+
+    def add_lines(self, lines: list[str]) -> list[dict]:
+        """Chunks that became complete by adding these lines."""
+        if self.header is None and lines:
+            self.header = [c.strip() for c in next(csv.reader(lines[:1]))]
+            self.schema = detect_schema(self.header)
+            lines = lines[1:]
+        self._lines.extend(lines)
+        chunks = []
+        while len(self._lines) >= self.chunk_rows:
+            chunk_lines, self._lines = self._lines[:self.chunk_rows], self._lines[self.chunk_rows:]
+            chunks.append(self._parse(chunk_lines))
+        return chunks
+
+    def finish(self) -> list[dict]:
+        if self.header is None:
+            raise BulkInputError("Empty CSV: no header row")
+        chunks = [self._parse(self._lines)] if self._lines else []
+        self._lines = []
+        return chunks
+
+    def _parse(self, lines: list[str]) -> dict:
+        """{"rows": row numbers, "text"/"numeric": column arrays, "errors": per-row message or None}"""
+        import pandas as pd  # on first upload, not at server start
+        first_row = self.rows_seen + 1
+        self.rows_seen += len(lines)
+        schema = SCHEMAS[self.schema]
+        width = len(self.header)
+
+        errors = [None] * len(lines)
+        records = []
+        for i, record in enumerate(csv.reader(lines)):
+            if len(record) != width:
+                errors[i] = f"expected {width} fields, got {len(record)}"
+                record = [""] * width
+            records.append(record)
+        frame = pd.DataFrame(records, columns=self.header, dtype=object) if records else pd.DataFrame(columns=self.header)
+
+        problems = [[] for _ in lines]
+        text = {}
+        for col in schema["text"]:
+            values = frame[col].str.strip()
+            for i in np.flatnonzero((values == "").to_numpy()):
+                problems[i].append(f"{col}: missing")
+            text[col] = values.tolist()
+
+        numeric = {}
+        for col in schema["numeric"] + schema["optional"]:
+            if col not in frame.columns:
+                continue
+            raw = frame[col].str.strip()
+            values = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64)
+            empty = (raw == "").to_numpy()
+            bad = ~np.isfinite(values)
+            if col in schema["optional"]:
+                bad &= ~empty  # blank optional values are filled in by the caller
+            for i in np.flatnonzero(bad):
+                problems[i].append(f"{col}: missing" if empty[i] else f"{col}: not a number ({raw.iat[i]!r})")
+            if col == "year":
+                for i in np.flatnonzero(~bad & (values != np.round(values))):
+                    problems[i].append(f"year: not an integer ({raw.iat[i]!r})")
+            numeric[col] = values
+
+        for i, found in enumerate(problems):
+            if found and errors[i] is None:
+                errors[i] = "; ".join(found)
+        return {"rows": list(range(first_row, first_row + len(lines))), "text": text, "numeric": numeric, "errors": errors}
+
+
+def subset(chunk: dict, valid: np.ndarray) -> tuple[dict, dict]:
+    """Text and numeric columns of the valid rows only."""
+    text = {col: [v for v, ok in zip(values, valid) if ok] for col, values in chunk["text"].items()}
+    numeric = {col: values[valid] for col, values in chunk["numeric"].items()}
+    return text, numeric
+
+
+def result_records(chunk: dict, yields: dict) -> list[dict]:
+    """One output record per input row; `yields` maps chunk position -> yield or error string."""
+    records = []
+    for i, row in enumerate(chunk["rows"]):
+        year = chunk["numeric"]["year"][i]
+        record = {
+            "row": row,
+            "district": chunk["text"]["district"][i],
+            "season": chunk["text"]["season"][i],
+            "year": int(year) if math.isfinite(year) and year == round(year) else None,
+        }
+        outcome = chunk["errors"][i] if chunk["errors"][i] is not None else yields.get(i)
+        if isinstance(outcome, str):
+            record["error"] = outcome
+        else:
+            record["yield"] = outcome
+        records.append(record)
+    return records
+
+
+class ResultWriter:
+    """Serialises records plus progress/summary lines as NDJSON, or as CSV with `#` comment lines."""
+
+    media_types = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+    def __init__(self, fmt: str = "ndjson"):
+        if fmt not in self.media_types:
+            raise ValueError(f"Unknown output format '{fmt}' (choose from {', '.join(self.media_types)})")
+        self.fmt = fmt
+        self.media_type = self.media_types[fmt]
+
+    def header(self) -> str:
+        return ",".join(OUTPUT_COLUMNS) + "\n" if self.fmt == "csv" else ""
+
+    def records(self, records: list[dict]) -> str:
+        if self.fmt == "ndjson":
+            return "".join(json.dumps(r) + "\n" for r in records)
+        out = io.StringIO()
+        csv.DictWriter(out, fieldnames=OUTPUT_COLUMNS, lineterminator="\n").writerows(records)
+        return out.getvalue()
+
+    def event(self, kind: str, body: dict) -> str:
+        # kind is "progress", "summary" or "error"
+        if self.fmt == "ndjson":
+            return json.dumps({kind: body}) + "\n"
+        return f"# {kind} " + " ".join(f"{k}={v}" for k, v in body.items()) + "\n"
@@ -0,0 +1,152 @@
+"""
+climate_store.py
+Climate data for /api/climate-data, loaded once from Merged_TamilNaduRice_Climate_FULL.csv.
+
+Season-level metrics live in a float32 array indexed (district, season, year, metric)
+and monthly climate in one indexed (district, season, year, month, variable). District,
+season and year map to array positions through dicts, so a request is a handful of
+O(1) lookups. Climatology (mean over years, per district and season, and per district
+over all seasons) is precomputed and answers years or seasons the dataset does not have.
+"""
+
+import hashlib
+
+import numpy as np
+
+MONTHS = ["January", "February", "March", "April", "May", "June",
+          "July", "August", "September", "October", "November", "December"]
+
+# Response key -> season-level dataset column
+SEASON_METRICS = {
+    "avg_temperature": "Avg_Temperature_C",
+    "total_rainfall": "Total_Rainfall_mm",
+    "humidity_avg": "Avg_Humidity_Percent",
+    "wind_speed": "Wind_Speed_kmph",
+    "sunshine_hours": "Sunshine_Hours_per_Day",
+    "rainy_days": "Rainy_Days",
+}
+METRIC_DECIMALS = {"avg_temperature": 1, "total_rainfall": 0, "humidity_avg": 1,
+                   "wind_speed": 1, "sunshine_hours": 1, "rainy_days": 0}
+
+# Response key -> monthly dataset column
+MONTHLY_VARIABLES = {
+    "temperature": "Temperature_C",
+    "rainfall": "Rainfall_mm",
+    "humidity": "Humidity_%",
+}
+
+
+def _nanmean(values: np.ndarray, axis) -> np.ndarray:
+    # np.nanmean without the all-NaN RuntimeWarning
+    counts = np.sum(~np.isnan(values), axis=axis)
+    totals = np.nansum(values, axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / np.maximum(counts, 1), np.nan).astype(np.float32)
+
+
+def _rounded(value, decimals: int):
+    if np.isnan(value):
+        return None
+    return int(round(float(value))) if decimals == 0 else round(float(value), decimals)
+
+
+class ClimateStore:
+    def __init__(self, districts, seasons, years, metrics, monthly, version: str):
+        self.districts = list(districts)
+        self.seasons = list(seasons)
+        self.years = list(years)
+        self.district_index = {d.lower(): i for i, d in enumerate(self.districts)}
+        self.season_index = {s.lower(): i for i, s in enumerate(self.seasons)}
+        self.year_index = {y: i for i, y in enumerate(self.years)}
+
+        self.metrics = metrics    # (district, season, year, metric)
+        self.monthly = monthly    # (district, season, year, month, variable)
+        self.version = version    # digest of the source data, part of every ETag
+
+        # Climatology: mean over years per (district, season), and over seasons too per district
+        self.season_climatology = _nanmean(metrics, axis=2)
+        self.monthly_climatology = _nanmean(monthly, axis=2)
+        self.district_climatology = _nanmean(self.season_climatology, axis=1)
+        self.district_monthly_climatology = _nanmean(self.monthly_climatology, axis=1)
+
+        # Rounded response payloads per (district, season, year) cell, built on first use.
+        # Keys are array positions (None for climatology), so the dict stays bounded.
+        self._payloads = {}
+
+    @classmethod
+    def from_csv(cls, path: str):
+        import pandas as pd
+
+        usecols = ["Year", "District_yield", "Season", "Month"] + list(SEASON_METRICS.values()) + list(MONTHLY_VARIABLES.values())
+        df = pd.read_csv(path, usecols=usecols)
+        districts = sorted(df["District_yield"].unique())
+        seasons = sorted(df["Season"].unique())
+        years = sorted(int(y) for y in df["Year"].unique())
+
+        d = df["District_yield"].map({v: i for i, v in enumerate(districts)}).to_numpy()
+        s = df["Season"].map({v: i for i, v in enumerate(seasons)}).to_numpy()
+        y = df["Year"].map({v: i for i, v in enumerate(years)}).to_numpy()
+        m = df["Month"].map({v: i for i, v in enumerate(MONTHS)}).to_numpy()
+
+        shape = (len(districts), len(seasons), len(years))
+        metrics = np.full(shape + (len(SEASON_METRICS),), np.nan, dtype=np.float32)
+        # Season-level columns repeat on every monthly row; any row of the season has them
+        metrics[d, s, y] = df[list(SEASON_METRICS.values())].to_numpy(dtype=np.float32)
+
+        # Several records can share a month; average them
+        sums = np.zeros(shape + (12, len(MONTHLY_VARIABLES)), dtype=np.float64)
+        counts = np.zeros(shape + (12, 1), dtype=np.int32)
+        np.add.at(sums, (d, s, y, m), df[list(MONTHLY_VARIABLES.values())].to_numpy(dtype=np.float64))
+        np.add.at(counts, (d, s, y, m), 1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            monthly = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan).astype(np.float32)
+
+        digest = hashlib.sha256(metrics.tobytes() + monthly.tobytes()).hexdigest()[:16]
+        return cls(districts, seasons, years, metrics, monthly, digest)
+
+    def lookup(self, district: str, season: str, year: int):
+        """Response body for one query, or None when the district is unknown."""
+        di = self.district_index.get(district.strip().lower())
+        if di is None:
+            return None
+        si = self.season_index.get(season.strip().lower())
+        yi = self.year_index.get(year)
+
+        if si is None:
+            key = (di, None, None)
+        elif yi is None or np.isnan(self.metrics[di, si, yi, 0]):
+            key = (di, si, None)
+        else:
+            key = (di, si, yi)
+        payload = self._payloads.get(key)
+        if payload is None:
+            payload = self._payloads[key] = self._build_payload(*key)
+
+        return {
+            "district": self.districts[di],
+            "season": self.seasons[si] if si is not None else season.title(),
+            "year": year,
+            **payload,
+        }
+
+    def _build_payload(self, di: int, si, yi):
+        if si is None:
+            metrics, monthly, source = self.district_climatology[di], self.district_monthly_climatology[di], "climatology"
+        elif yi is None:
+            metrics, monthly, source = self.season_climatology[di, si], self.monthly_climatology[di, si], "climatology"
+        else:
+            metrics, source = self.metrics[di, si, yi], "observed"
+            # Months with no records that year come from the climatology
+            monthly = np.where(np.isnan(self.monthly[di, si, yi]), self.monthly_climatology[di, si], self.monthly[di, si, yi])
+
+        return {
+            "source": source,
+            "climate_metrics": {key: _rounded(metrics[j], METRIC_DECIMALS[key]) for j, key in enumerate(SEASON_METRICS)},
+            "monthly": {
+                "months": MONTHS,
+                **{key: [_rounded(v, 1) for v in monthly[:, j]] for j, key in enumerate(MONTHLY_VARIABLES)},
+            },
+        }
+
+    def etag(self, district: str, season: str, year: int) -> str:
+        return f'"{self.version}-{district.strip().lower()}-{season.strip().lower()}-{year}"'
@@ -0,0 +1,234 @@
+"""
+drift.py
+Input drift monitoring: how far the requests a model answers have moved from the data it
+was trained on, without storing any request.
+
+- train.py builds a reference for each model version (drift_reference.json). Numeric inputs
+  get decile bin edges from the training data plus two extra bins for values below the
+  training minimum and above the training maximum. District and season get their
+  category shares.
+- DriftMonitor keeps fixed-size counts per bin and per known category (anything else is
+  counted as "other"), so memory does not grow with traffic. Counts are kept for the
+  current window of `window` requests and the one before it; reports cover both, i.e.
+  the last `window` to 2 x `window` requests, plus lifetime totals.
+- observe() is a handful of bisects and increments (a few microseconds).
+- Drift is scored with the population stability index (PSI) between the reference and
+  observed shares: below 0.1 is stable, 0.1-0.25 moderate, above 0.25 significant. The
+  share of values outside the training range and of unknown categories is reported too.
+
+Numeric inputs are compared in the model's units (temperature -> max_temp_c, fertilizer
+slider -> fertilizer_kg_per_ha, ...); humidity is not a model input, so it has no
+reference and is not scored.
+
+    python drift.py reference ../training/tamil_nadu_rice_yield_dataset.csv --out rice_yield_model_drift.json
+"""
+
+import json
+import threading
+from bisect import bisect_right
+
+import numpy as np
+
+from explain import INPUT_FEATURES
+
+REFERENCE_FORMAT_VERSION = 1
+NUMERIC_INPUTS = ("temperature", "rainfall", "humidity", "water", "fertilizer")
+CATEGORICAL_INPUTS = ("district", "season")
+OTHER = "__other__"
+N_QUANTILE_BINS = 10
+PSI_EPSILON = 1e-4  # floor for empty shares, so a bin seen on one side only scores high instead of infinite
+PSI_THRESHOLDS = ((0.1, "stable"), (0.25, "moderate"))
+
+
+def model_feature(field: str):
+    # The model feature a request field is compared as (temperature -> max_temp_c), or None
+    features = INPUT_FEATURES.get(field, (field,))
+    return features[0] if features else None
+
+
+def build_reference(frame, n_bins: int = N_QUANTILE_BINS) -> dict:
+    """Reference sketches from training features (a DataFrame with the served feature columns).
+
+    Raises ValueError when no input can be sketched from the frame (e.g. it is not in the
+    served schema), rather than producing a reference that silently never reports drift.
+    """
+    numeric, missing = {}, []
+    for field in NUMERIC_INPUTS:
+        feature = model_feature(field)
+        if feature is None:
+            continue  # no model feature to compare with (humidity)
+        if feature not in frame.columns:
+            missing.append(feature)
+            continue
+        values = frame[feature].to_numpy(dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            continue
+        # Interior edges at the quantiles; repeated edges (discrete values) collapse into one bin
+        interior = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+        low, high = float(values.min()), float(values.max())
+        edges = [low] + [float(e) for e in interior if low < e < high] + [high]
+        # Bins: below min, [edges[0], edges[1]), ..., [edges[-2], max], above max
+        counts = np.zeros(len(edges) + 1)
+        positions = np.searchsorted(edges, values, side="right")
+        positions[values == high] = len(edges) - 1  # the maximum belongs to the last in-range bin
+        np.add.at(counts, positions, 1)
+        numeric[field] = {"feature": feature, "edges": edges, "shares": (counts / counts.sum()).tolist()}
+
+    categorical = {}
+    for field in CATEGORICAL_INPUTS:
+        if field not in frame.columns:
+            missing.append(field)
+            continue
+        shares = frame[field].astype(str).value_counts(normalize=True)
+        categorical[field] = {"feature": field, "shares": {str(k): float(v) for k, v in shares.items()}}
+
+    if not numeric and not categorical:
+        raise ValueError(f"No drift input found in the frame's columns (expected {', '.join(missing)}); "
+                         "build the reference from served-schema features")
+    if missing:
+        print(f"⚠️ Drift reference has no data for {', '.join(missing)}; those inputs are not monitored")
+    return {"format_version": REFERENCE_FORMAT_VERSION, "rows": int(len(frame)), "numeric": numeric,
+            "categorical": categorical}
+
+
+def save_reference(reference: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(reference, f, indent=2)
+
+
+def load_reference(path: str) -> dict:
+    with open(path) as f:
+        reference = json.load(f)
+    if reference.get("format_version") != REFERENCE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported drift reference version: {reference.get('format_version')}")
+    return reference
+
+
+def psi(expected, observed) -> float:
+    expected = np.maximum(np.asarray(expected, dtype=np.float64), PSI_EPSILON)
+    observed = np.maximum(np.asarray(observed, dtype=np.float64), PSI_EPSILON)
+    return float(np.sum((observed - expected) * np.log(observed / expected)))
+
+
+def psi_status(score: float) -> str:
+    for limit, status in PSI_THRESHOLDS:
+        if score < limit:
+            return status
+    return "significant"
+
+
+class DriftMonitor:
+    def __init__(self, reference: dict, version: str = None, window: int = 10000, min_samples: int = 100):
+        self.reference = reference
+        self.version = version
+        self.window = window
+        self.min_samples = min_samples
+
+        # Fields observe() sees, in order; numeric fields without a reference are not counted
+        self.numeric = [(i, field, reference["numeric"][field]["edges"])
+                        for i, field in enumerate(NUMERIC_INPUTS) if field in reference["numeric"]]
+        self.categories = {field: {name: j for j, name in enumerate(sorted(ref["shares"]))}
+                           for field, ref in reference["categorical"].items()}
+        self._lock = threading.Lock()
+        self._windows = [self._empty(), self._empty()]  # [previous, current]
+        self._totals = self._empty()
+        self._in_window = 0
+        self.observed = 0
+
+    def _empty(self) -> dict:
+        counts = {field: [0] * (len(edges) + 1) for _, field, edges in self.numeric}
+        for field, index in self.categories.items():
+            counts[field] = [0] * (len(index) + 1)  # last slot is "other"
+        return counts
+
+    def observe(self, district: str, season: str, values: tuple):
+        """One request: district/season as the model sees them, numeric values in NUMERIC_INPUTS order and model units."""
+        positions = []
+        for i, field, edges in self.numeric:
+            value = values[i]
+            position = bisect_right(edges, value)
+            if position == len(edges) and value == edges[-1]:
+                position -= 1  # the training maximum is in range
+            positions.append((field, position))
+        for field, value in (("district", district), ("season", season)):
+            index = self.categories.get(field)
+            if index is not None:
+                positions.append((field, index.get(value, len(index))))
+
+        with self._lock:
+            if self._in_window >= self.window:
+                self._windows = [self._windows[1], self._empty()]
+                self._in_window = 0
+            current = self._windows[1]
+            for field, position in positions:
+                current[field][position] += 1
+                self._totals[field][position] += 1
+            self._in_window += 1
+            self.observed += 1
+
+    def report(self, detail: bool = False) -> dict:
+        with self._lock:
+            recent = {field: [a + b for a, b in zip(self._windows[0][field], self._windows[1][field])]
+                      for field in self._totals}
+            totals = {field: list(counts) for field, counts in self._totals.items()}
+            observed = self.observed
+        features = {}
+        for _, field, edges in self.numeric:
+            ref = self.reference["numeric"][field]
+            features[field] = self._score(ref["feature"], ref["shares"], recent[field], totals[field],
+                                          out_of_range=lambda c: c[0] + c[-1], detail=detail,
+                                          bins=["below_min"] + [f"{lo:g}-{hi:g}" for lo, hi in zip(edges, edges[1:])] + ["above_max"])
+        for field, index in self.categories.items():
+            names = sorted(index)
+            ref_shares = [self.reference["categorical"][field]["shares"][name] for name in names] + [0.0]
+            features[field] = self._score(field, ref_shares, recent[field], totals[field],
+                                          out_of_range=lambda c: c[-1], detail=detail, bins=names + [OTHER])
+        for field in NUMERIC_INPUTS:
+            if field not in features:
+                features[field] = {"feature": model_feature(field), "status": "no_reference"}
+        return {
+            "version": self.version,
+            "reference_rows": self.reference.get("rows"),
+            "observed": observed,
+            "window": self.window,
+            "features": features,
+        }
+
+    def _score(self, feature, ref_shares, recent, totals, out_of_range, detail, bins) -> dict:
+        n = sum(recent)
+        result = {"feature": feature, "samples": n}
+        if n == 0:
+            result["status"] = "no_data"
+            return result
+        shares = [c / n for c in recent]
+        score = psi(ref_shares, shares)
+        result.update({
+            "psi": round(score, 4),
+            "status": psi_status(score) if n >= self.min_samples else "insufficient_data",
+            # Share of requests outside the training range (numeric) or of categories never seen in training
+            "unseen_share": round(out_of_range(recent) / n, 4),
+            "lifetime_psi": round(psi(ref_shares, [c / sum(totals) for c in totals]), 4),
+        })
+        if detail:
+            result["bins"] = [{"bin": name, "reference": round(r, 4), "observed": round(o, 4)}
+                              for name, r, o in zip(bins, ref_shares, shares)]
+        return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Drift reference sketches for a model")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("reference", help="build a reference from a training CSV (model feature columns)")
+    build.add_argument("csv")
+    build.add_argument("--out", default="rice_yield_model_drift.json")
+    args = parser.parse_args()
+
+    reference = build_reference(pd.read_csv(args.csv))
+    save_reference(reference, args.out)
+    print(f"✅ Saved drift reference for {reference['rows']} rows "
+          f"({', '.join(list(reference['numeric']) + list(reference['categorical']))}) to {args.out}")
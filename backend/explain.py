@@ -0,0 +1,84 @@
+"""
+explain.py
+Turn XGBoost's per-column contributions (ServingModel.contributions) into per-field
+explanations for /api/explain.
+
+The booster sees one-hot columns (district=Thanjavur, ...) and scaled numeric columns.
+TreeSHAP contributions are additive, so the one-hot columns of a field are summed back
+into that field, and model features are then summed into the request field they are
+derived from (temperature drives max_temp_c and min_temp_c; the district also sets the
+estimated area_ha and production_tonnes). Contributions are in kg/ha of raw model output.
+"""
+
+import numpy as np
+
+# Request field -> model features derived from it (see main.feature_columns)
+INPUT_FEATURES = {
+    "district": ("district", "area_ha", "production_tonnes"),
+    "season": ("season",),
+    "year": ("year",),
+    "temperature": ("max_temp_c", "min_temp_c"),
+    "rainfall": ("rainfall_mm",),
+    "water": ("irrigation_percent",),
+    "fertilizer": ("fertilizer_kg_per_ha",),
+    "humidity": (),  # not a model input; only used by the agronomy rules
+}
+
+
+class FeatureGrouping:
+    """Matrices that sum encoded columns into model features, and model features into request fields."""
+
+    def __init__(self, encoder):
+        self.features = list(encoder.numeric_cols) + list(encoder.categorical_cols)
+        feature_index = {name: j for j, name in enumerate(self.features)}
+
+        to_features = np.zeros((encoder.n_features, len(self.features)))
+        for j in range(len(encoder.numeric_cols)):
+            to_features[j, j] = 1.0
+        for k, index in enumerate(encoder.category_index):
+            for position in index.values():
+                to_features[position, len(encoder.numeric_cols) + k] = 1.0
+        self.to_features = to_features
+
+        # Model features no request field maps to keep their own name
+        mapped = {f for features in INPUT_FEATURES.values() for f in features}
+        self.inputs = list(INPUT_FEATURES) + [f for f in self.features if f not in mapped]
+        to_inputs = np.zeros((len(self.features), len(self.inputs)))
+        for i, name in enumerate(self.inputs):
+            for feature in INPUT_FEATURES.get(name, (name,)):
+                if feature in feature_index:
+                    to_inputs[feature_index[feature], i] = 1.0
+        self.to_inputs = to_inputs
+
+    def explain(self, contributions: np.ndarray, columns: dict) -> list[dict]:
+        """One explanation per row of `contributions` (n x (encoded columns + bias))."""
+        by_feature = contributions[:, :-1] @ self.to_features
+        by_input = by_feature @ self.to_inputs
+        bias = contributions[:, -1]
+        model_output = contributions.sum(axis=1)
+
+        feature_values = {f: list(columns[f]) for f in self.features}
+        # + 0.0 turns the -0.0 of rounded tiny negatives into 0.0
+        by_feature = (np.round(by_feature, 2) + 0.0).tolist()
+        by_input = (np.round(by_input, 2) + 0.0).tolist()
+        explanations = []
+        for i in range(len(contributions)):
+            features = [
+                {"feature": f, "value": _plain(feature_values[f][i]), "contribution": by_feature[i][j]}
+                for j, f in enumerate(self.features)
+            ]
+            features.sort(key=lambda item: -abs(item["contribution"]))
+            explanations.append({
+                "base_value": round(float(bias[i]), 2),
+                "model_output": round(float(model_output[i]), 2),
+                "contributions": dict(zip(self.inputs, by_input[i])),
+                "features": features,
+            })
+        return explanations
+
+
+def _plain(value):
+    # NumPy scalars -> JSON-friendly Python values
+    if isinstance(value, np.generic):
+        value = value.item()
+    return round(value, 2) if isinstance(value, float) else value
@@ -0,0 +1,243 @@
+"""
+fast_encoder.py
+Compiled fast-path replacement for the fitted sklearn ColumnTransformer.
+
+The pipeline saved by training/train.py runs SimpleImputer -> StandardScaler on the
+numeric columns and SimpleImputer -> OneHotEncoder on the categorical columns. For
+single-row requests most of the latency is pandas and sklearn overhead, so this
+module copies the fitted medians, means, scales and category indices out once at
+startup and writes encoded rows straight into float32 NumPy arrays.
+
+Parity check against the original pipeline, on rows in the schema main.py serves
+(training/tamil_nadu_rice_yield_dataset.csv by default):
+    python fast_encoder.py --model rice_yield_model_xgb.pkl --csv ../training/tamil_nadu_rice_yield_dataset.csv
+"""
+
+import math
+import threading
+
+import numpy as np
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class CompiledEncoder:
+    def __init__(self, numeric_cols, fill_numeric, means, scales,
+                 categorical_cols, fill_categorical, categories, ignore_unknown=True):
+        self.numeric_cols = list(numeric_cols)
+        self.fill_numeric = [float(v) for v in fill_numeric]
+        self.means = [float(v) for v in means]
+        self.scales = [float(v) for v in scales]
+
+        self.categorical_cols = list(categorical_cols)
+        self.fill_categorical = list(fill_categorical)
+        self.categories = [list(c) for c in categories]
+        self.ignore_unknown = ignore_unknown
+
+        # One-hot output index for every (column, category), laid out after the numeric block
+        self.category_index = []
+        offset = len(self.numeric_cols)
+        for cats in self.categories:
+            self.category_index.append({cat: offset + i for i, cat in enumerate(cats)})
+            offset += len(cats)
+        self.n_features = offset
+
+        self._local = threading.local()
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        return cls.from_preprocessor(pipeline.named_steps["preprocessor"])
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor):
+        # Walk the fitted ColumnTransformer; anything other than the train.py layout is rejected
+        numeric_cols, fill_numeric, means, scales = [], [], [], []
+        categorical_cols, fill_categorical, categories = [], [], []
+        ignore_unknown = True
+
+        for name, transformer, cols in preprocessor.transformers_:
+            if transformer == "drop" or len(cols) == 0:
+                continue
+            if transformer == "passthrough" or not hasattr(transformer, "named_steps"):
+                raise ValueError(f"Unsupported transformer in block '{name}': {transformer!r}")
+
+            steps = transformer.named_steps
+            imputer = steps.get("imputer")
+            if imputer is not None and getattr(imputer, "add_indicator", False):
+                raise ValueError(f"Imputer missing-value indicators are not supported (block '{name}')")
+            fills = list(imputer.statistics_) if imputer is not None else [None] * len(cols)
+
+            onehot = steps.get("onehot")
+            if onehot is not None:
+                if onehot.drop is not None or onehot.handle_unknown not in ("ignore", "error"):
+                    raise ValueError(f"Unsupported OneHotEncoder settings in block '{name}'")
+                if onehot.handle_unknown == "error":
+                    ignore_unknown = False
+                categorical_cols.extend(cols)
+                fill_categorical.extend(fills)
+                categories.extend([list(c) for c in onehot.categories_])
+                continue
+
+            scaler = steps.get("scaler")
+            extra = set(steps) - {"imputer", "scaler"}
+            if extra:
+                raise ValueError(f"Unsupported steps {sorted(extra)} in block '{name}'")
+            if categorical_cols:
+                raise ValueError("Numeric blocks must come before categorical blocks")
+            numeric_cols.extend(cols)
+            fill_numeric.extend(float("nan") if f is None else f for f in fills)
+            if scaler is not None:
+                means.extend(scaler.mean_ if scaler.with_mean else [0.0] * len(cols))
+                scales.extend(scaler.scale_ if scaler.with_std else [1.0] * len(cols))
+            else:
+                means.extend([0.0] * len(cols))
+                scales.extend([1.0] * len(cols))
+
+        return cls(numeric_cols, fill_numeric, means, scales,
+                   categorical_cols, fill_categorical, categories, ignore_unknown)
+
+    def to_spec(self) -> dict:
+        """JSON-serialisable preprocessing spec (inverse of from_spec)."""
+        def plain(value):
+            return value.item() if isinstance(value, np.generic) else value
+
+        return {
+            "numeric_cols": [plain(c) for c in self.numeric_cols],
+            "fill_numeric": self.fill_numeric,
+            "means": self.means,
+            "scales": self.scales,
+            "categorical_cols": [plain(c) for c in self.categorical_cols],
+            "fill_categorical": [plain(v) for v in self.fill_categorical],
+            "categories": [[plain(c) for c in cats] for cats in self.categories],
+            "ignore_unknown": self.ignore_unknown,
+        }
+
+    @classmethod
+    def from_spec(cls, spec: dict):
+        return cls(spec["numeric_cols"], spec["fill_numeric"], spec["means"], spec["scales"],
+                   spec["categorical_cols"], spec["fill_categorical"], spec["categories"],
+                   spec.get("ignore_unknown", True))
+
+    def _row_buffer(self) -> np.ndarray:
+        # One preallocated row per thread (FastAPI runs sync endpoints on a threadpool)
+        buf = getattr(self._local, "row", None)
+        if buf is None:
+            buf = np.zeros((1, self.n_features), dtype=np.float32)
+            self._local.row = buf
+        return buf
+
+    def _category_position(self, j: int, value):
+        if _is_missing(value):
+            value = self.fill_categorical[j]
+        pos = self.category_index[j].get(value)
+        if pos is None and not self.ignore_unknown:
+            raise ValueError(f"Unknown category {value!r} for column '{self.categorical_cols[j]}'")
+        return pos
+
+    def transform_row(self, row: dict) -> np.ndarray:
+        """Encode one row (column name -> value) into the shared per-thread buffer.
+
+        The returned array is reused by the next call on the same thread, so it must be
+        consumed (e.g. passed to the regressor) before encoding another row.
+        """
+        buf = self._row_buffer()
+        out = buf[0]
+        out.fill(0.0)
+
+        for j, col in enumerate(self.numeric_cols):
+            value = row[col]
+            if _is_missing(value):
+                value = self.fill_numeric[j]
+            out[j] = (float(value) - self.means[j]) / self.scales[j]
+
+        for j, col in enumerate(self.categorical_cols):
+            pos = self._category_position(j, row[col])
+            if pos is not None:
+                out[pos] = 1.0
+
+        return buf
+
+    def transform(self, columns: dict) -> np.ndarray:
+        """Encode column-oriented data (column name -> list of values) into a new (n, n_features) array."""
+        n_rows = len(columns[self.numeric_cols[0] if self.numeric_cols else self.categorical_cols[0]])
+        out = np.zeros((n_rows, self.n_features), dtype=np.float32)
+
+        for j, col in enumerate(self.numeric_cols):
+            values = np.array(columns[col], dtype=np.float64)
+            values[np.isnan(values)] = self.fill_numeric[j]
+            out[:, j] = (values - self.means[j]) / self.scales[j]
+
+        rows = np.arange(n_rows)
+        for j, col in enumerate(self.categorical_cols):
+            positions = np.array(
+                [-1 if pos is None else pos for pos in (self._category_position(j, v) for v in columns[col])],
+                dtype=np.int64,
+            )
+            hit = positions >= 0
+            out[rows[hit], positions[hit]] = 1.0
+
+        return out
+
+
+def check_parity(pipeline, csv_path: str) -> dict:
+    """Compare encoder + regressor against the full pipeline on every row of a CSV."""
+    import pandas as pd
+
+    preprocessor = pipeline.named_steps["preprocessor"]
+    regressor = pipeline.named_steps["regressor"]
+    encoder = CompiledEncoder.from_preprocessor(preprocessor)
+
+    df = pd.read_csv(csv_path)
+    missing = [col for col in preprocessor.feature_names_in_ if col not in df.columns]
+    if missing:
+        shown = ", ".join(missing[:5]) + (f" and {len(missing) - 5} more" if len(missing) > 5 else "")
+        raise ValueError(f"{csv_path} lacks the model's feature columns ({shown}); "
+                         "pass --csv with data in the schema the model was trained on")
+    X = df[list(preprocessor.feature_names_in_)]
+    columns = {col: X[col].tolist() for col in X.columns}
+
+    expected = np.asarray(preprocessor.transform(X), dtype=np.float32)
+    encoded = encoder.transform(columns)
+    single = np.vstack([encoder.transform_row({col: columns[col][i] for col in columns}).copy()
+                        for i in range(min(len(X), 500))])
+
+    y_pipeline = pipeline.predict(X)
+    y_fast = regressor.predict(encoded)
+
+    return {
+        "rows": len(X),
+        "n_features": encoder.n_features,
+        "max_feature_diff": float(np.abs(expected - encoded).max()),
+        "max_single_row_feature_diff": float(np.abs(expected[:len(single)] - single).max()),
+        "max_prediction_diff": float(np.abs(y_pipeline - y_fast).max()),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import sys
+
+    import joblib
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Check the compiled encoder against the sklearn pipeline")
+    parser.add_argument("--model", default=os.path.join(here, "rice_yield_model_xgb.pkl"))
+    parser.add_argument("--csv", default=os.path.join(here, "..", "training", "tamil_nadu_rice_yield_dataset.csv"))
+    parser.add_argument("--tolerance", type=float, default=1e-3, help="max allowed prediction difference (kg/ha)")
+    args = parser.parse_args()
+
+    try:
+        report = check_parity(joblib.load(args.model), args.csv)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+    if report["max_feature_diff"] > 1e-6 or report["max_prediction_diff"] > args.tolerance:
+        print("❌ Compiled encoder does not match the pipeline")
+        sys.exit(1)
+    print("✅ Compiled encoder matches the pipeline")
@@ -0,0 +1,59 @@
+"""
+heuristic_model.py
+The multiplicative yield heuristic behind simple_server.py's /api/predict.
+
+A base yield is scaled by a factor per input (temperature, rainfall, humidity, water,
+fertilizer), per district and per season, and clamped to 1000-6000 kg/ha. It needs no
+model files and answers in microseconds, so main.py also uses it when the XGBoost model
+is still loading or misses its latency budget (see LATENCY_BUDGET_MS).
+"""
+
+BASE_YIELD = 2500.0  # kg/ha
+MIN_YIELD = 1000.0
+MAX_YIELD = 6000.0
+
+DISTRICT_FACTORS = {
+    'thanjavur': 1.2, 'nagapattinam': 1.15, 'tiruvarur': 1.1,
+    'cuddalore': 1.05, 'villupuram': 1.0, 'chengalpattu': 0.95,
+    'kanchipuram': 0.95, 'tiruvallur': 0.9, 'chennai': 0.85
+}
+SEASON_FACTORS = {'kuruvai': 1.1, 'samba': 1.0, 'thaladi': 0.9}
+
+
+def heuristic_yield(req) -> float:
+    """Yield in kg/ha for a PredictionRequest (or anything with its fields)."""
+    if 25 <= req.temperature <= 30:
+        temp_factor = 1.0
+    elif req.temperature < 25:
+        temp_factor = 0.8 + (req.temperature - 20) * 0.04
+    else:
+        temp_factor = 1.0 - (req.temperature - 30) * 0.03
+    temp_factor = max(0.5, min(1.2, temp_factor))
+
+    if 1000 <= req.rainfall <= 1800:
+        rain_factor = 1.0
+    elif req.rainfall < 1000:
+        rain_factor = 0.6 + (req.rainfall / 1000) * 0.4
+    else:
+        rain_factor = 1.0 - (req.rainfall - 1800) * 0.0002
+    rain_factor = max(0.4, min(1.3, rain_factor))
+
+    if 70 <= req.humidity <= 85:
+        humidity_factor = 1.0
+    else:
+        humidity_factor = 1.0 - abs(req.humidity - 77.5) * 0.01
+    humidity_factor = max(0.7, min(1.1, humidity_factor))
+
+    water_factor = 0.7 + (req.water / 100) * 0.4
+    water_factor = max(0.7, min(1.1, water_factor))
+
+    fertilizer_factor = 0.8 + (req.fertilizer / 100) * 0.3
+    fertilizer_factor = max(0.8, min(1.2, fertilizer_factor))
+
+    district_factor = DISTRICT_FACTORS.get(req.district.lower(), 1.0)
+    season_factor = SEASON_FACTORS.get(req.season.lower(), 1.0)
+
+    predicted_yield = (BASE_YIELD * temp_factor * rain_factor *
+                       humidity_factor * water_factor * fertilizer_factor *
+                       district_factor * season_factor)
+    return max(MIN_YIELD, min(MAX_YIELD, predicted_yield))
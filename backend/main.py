@@ -1,17 +1,121 @@
-from fastapi import FastAPI
+import time
+IMPORT_STARTED = time.perf_counter()  # reference point for the cold-start timings in /ready
+
+from fastapi import Body, Depends, FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import joblib
-import pandas as pd
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, ValidationError
+import asyncio
+import json
+import math
 import os
+import sys
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+
+import agronomy
+from admission import Admission, AdmissionMiddleware
+from bulk_scoring import BulkInputError, ChunkParser, LineSplitter, ResultWriter, result_records, subset
+from drift import DriftMonitor, load_reference
+from explain import FeatureGrouping
+from fast_encoder import CompiledEncoder
+from heuristic_model import heuristic_yield
+from metrics import Metrics, MetricsMiddleware
+from micro_batch import MicroBatcher
+from model_registry import (DRIFT_FILE, ServingModel, active_version, artifact_paths, check_servable, clear_active,
+                            list_versions, read_metadata, set_active, version_dir)
+from native_model import load_native
+from prediction_cache import PredictionCache
+from prediction_log import PredictionLog, read_rows
+from tree_ensemble import TreeEnsemble
+from yield_surface import SURFACE_PATH, YieldSurface
 
 # ---------- Config ----------
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "rice_yield_model_xgb.pkl")
 # If your model is named differently, change the above line.
+# "pickle" loads the sklearn pipeline; "native" loads the XGBoost booster + JSON spec written by
+# native_model.py (no sklearn/joblib); "trees" serves from the arrays written by tree_ensemble.py
+# (no xgboost either); "auto" prefers native files when present and falls back to the pickle.
+MODEL_FORMAT = os.environ.get("MODEL_FORMAT", "auto")
+NATIVE_BOOSTER_PATH = os.path.join(os.path.dirname(__file__), "rice_yield_model_xgb.ubj")
+NATIVE_SPEC_PATH = os.path.join(os.path.dirname(__file__), "rice_yield_model_preprocess.json")
+TREES_PATH = os.path.join(os.path.dirname(__file__), "rice_yield_model_trees.npz")
+# Load the model in a background thread so the server answers /health (and /ready with 503) at once
+MODEL_BACKGROUND_LOAD = os.environ.get("MODEL_BACKGROUND_LOAD", "0") == "1"
+# Versioned models (written by training/train.py); the ACTIVE version wins over the files above
+MODEL_REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", os.path.join(os.path.dirname(__file__), "models"))
+# Poll the registry's ACTIVE file and hot-swap when it changes; 0 disables polling
+MODEL_REGISTRY_POLL_SECONDS = float(os.environ.get("MODEL_REGISTRY_POLL_SECONDS", "0"))
+# When set, /api/models activate/rollback require this value in the X-Admin-Token header
+MODEL_ADMIN_TOKEN = os.environ.get("MODEL_ADMIN_TOKEN")
+MAX_BATCH_SIZE = 1000  # max items accepted by /api/predict/batch
+# Micro-batching of concurrent /api/predict calls; a max size of 1 turns it off
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get("MICRO_BATCH_MAX_WAIT_MS", "2"))
+MICRO_BATCH_MAX_SIZE = int(os.environ.get("MICRO_BATCH_MAX_SIZE", "64"))
+MAX_SCENARIO_POINTS = 20000  # max grid points scored by one /api/scenarios call
+# Rows per model call when scoring an uploaded CSV (/api/predict/csv, `python main.py score`)
+BULK_CHUNK_ROWS = int(os.environ.get("BULK_CHUNK_ROWS", "2000"))
+MAX_BULK_CHUNK_ROWS = 20000
+BULK_SPOOL_MEMORY_BYTES = int(os.environ.get("BULK_SPOOL_MEMORY_BYTES", str(8 << 20)))  # larger uploads spool to disk
+# Prediction cache: 0 entries disables it; inputs are snapped to RESOLUTION before lookup and scoring
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "4096"))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "3600"))
+PREDICTION_CACHE_RESOLUTION = float(os.environ.get("PREDICTION_CACHE_RESOLUTION", "0.1"))
+EXPLAIN_CACHE_SIZE = int(os.environ.get("EXPLAIN_CACHE_SIZE", "1024"))  # /api/explain results, same TTL/resolution
+# "shap": exact TreeSHAP contributions; "saabas": XGBoost's approximate path attribution, ~4x faster
+EXPLAIN_METHOD = os.environ.get("EXPLAIN_METHOD", "shap")
+# "model": every /api/predict is scored by the model. "surface": answered by interpolating the
+# precomputed yield surface (yield_surface.py), falling back to the model outside its grid or with ?exact=1
+SERVING_MODE = os.environ.get("SERVING_MODE", "model")
+SURFACE_PATH = os.environ.get("SURFACE_PATH", SURFACE_PATH)
+# /api/predict waits at most this long for the model, then answers with the heuristic engine
+# (heuristic_model.py, "source": "heuristic"); it also answers while the model is loading. 0 = always wait
+LATENCY_BUDGET_MS = float(os.environ.get("LATENCY_BUDGET_MS", "0"))
+# Admission control for the prediction endpoints: requests running at once (0 disables), requests allowed
+# to wait for a slot (more get 429), and how long one may wait before it is dropped with 503
+ADMISSION_MAX_CONCURRENT = int(os.environ.get("ADMISSION_MAX_CONCURRENT", "32"))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_MS", "1000"))
+ADMISSION_PATHS = ("/api/predict", "/api/explain", "/api/scenarios")
+# Batch and CSV scoring get their own, smaller pool, so long uploads cannot take the interactive slots
+BULK_ADMISSION_MAX_CONCURRENT = int(os.environ.get("BULK_ADMISSION_MAX_CONCURRENT", "2"))
+BULK_ADMISSION_MAX_QUEUE = int(os.environ.get("BULK_ADMISSION_MAX_QUEUE", "8"))
+BULK_ADMISSION_QUEUE_TIMEOUT_MS = float(os.environ.get("BULK_ADMISSION_QUEUE_TIMEOUT_MS", "10000"))
+BULK_ADMISSION_PATHS = ("/api/predict/batch", "/api/predict/csv", "/api/explain/batch")
+# Write-behind log of served predictions (SQLite, see prediction_log.py); an empty path disables it
+PREDICTION_LOG_PATH = os.environ.get("PREDICTION_LOG_PATH", os.path.join(os.path.dirname(__file__), "prediction_log.sqlite3"))
+PREDICTION_LOG_BUFFER = int(os.environ.get("PREDICTION_LOG_BUFFER", "10000"))  # entries held in memory; more are dropped
+PREDICTION_LOG_FLUSH_SECONDS = float(os.environ.get("PREDICTION_LOG_FLUSH_SECONDS", "1"))
+# `export-log` yield column: what the server answered, not an observed yield, so deliberately not train.py's TARGET
+EXPORT_YIELD_COLUMN = "predicted_yield_kg_per_ha"
+# Input drift against the served version's training data (drift.py); scores cover the last 1-2 windows of requests
+DRIFT_REFERENCE_PATH = os.path.join(os.path.dirname(__file__), "rice_yield_model_drift.json")  # for the unversioned model
+DRIFT_WINDOW = int(os.environ.get("DRIFT_WINDOW", "10000"))
+# /ws/predict: after a slider update, wait this long for more before predicting, but never longer than the max;
+# more sessions than WS_MAX_SESSIONS are closed with 1013 (try again later)
+WS_DEBOUNCE_MS = float(os.environ.get("WS_DEBOUNCE_MS", "25"))
+WS_MAX_COALESCE_MS = float(os.environ.get("WS_MAX_COALESCE_MS", "200"))
+WS_MAX_SESSIONS = int(os.environ.get("WS_MAX_SESSIONS", "1000"))
+# Add a Server-Timing header with per-stage durations to every response
+METRICS_SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING", "0") == "1"
 # -----------------------------
 
 app = FastAPI(title="Tamil Nadu Rice Yield Prediction API")
 
+# Added first so it sits inside CORS (rejections keep their CORS headers) and inside the metrics middleware
+admission = Admission(max_concurrent=ADMISSION_MAX_CONCURRENT, max_queue=ADMISSION_MAX_QUEUE,
+                      queue_timeout_ms=ADMISSION_QUEUE_TIMEOUT_MS)
+app.add_middleware(AdmissionMiddleware, admission=admission, paths=ADMISSION_PATHS)
+bulk_admission = Admission(max_concurrent=BULK_ADMISSION_MAX_CONCURRENT, max_queue=BULK_ADMISSION_MAX_QUEUE,
+                           queue_timeout_ms=BULK_ADMISSION_QUEUE_TIMEOUT_MS)
+app.add_middleware(AdmissionMiddleware, admission=bulk_admission, paths=BULK_ADMISSION_PATHS)
+
 # Allow frontend (Vite dev server + any origin for now)
 app.add_middleware(
     CORSMiddleware,
@@ -21,19 +125,262 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+metrics = Metrics("rice_yield")
+app.add_middleware(MetricsMiddleware, metrics=metrics, server_timing=METRICS_SERVER_TIMING)
+
+prediction_cache = PredictionCache(
+    maxsize=PREDICTION_CACHE_SIZE,
+    ttl=PREDICTION_CACHE_TTL,
+    resolution=PREDICTION_CACHE_RESOLUTION,
+)
+explanation_cache = PredictionCache(
+    maxsize=EXPLAIN_CACHE_SIZE,
+    ttl=PREDICTION_CACHE_TTL,
+    resolution=PREDICTION_CACHE_RESOLUTION,
+)
+
+prediction_log = PredictionLog(PREDICTION_LOG_PATH, capacity=PREDICTION_LOG_BUFFER,
+                               flush_seconds=PREDICTION_LOG_FLUSH_SECONDS) if PREDICTION_LOG_PATH else None
+
+
+serving_model = None   # current ServingModel; replaced, never mutated, when a version is activated
+previous_model = None  # the version it replaced, kept warm for instant rollback
+_swap_lock = threading.Lock()  # one activation/rollback at a time
+model_status = {
+    "ready": False,
+    "version": None,
+    "format": None,
+    "path": None,
+    "load_seconds": None,
+    "warmup_seconds": None,
+    # Seconds since main.py started importing
+    "ready_after_seconds": None,
+    "first_prediction_after_seconds": None,
+    "preloaded": False,
+    "error": None,
+}
+activation_status = {"version": None, "state": "idle", "error": None}
+preloaded_model = None  # (ServingModel, timings) loaded by serve.py's master before forking workers
+yield_surface = None   # YieldSurface when SERVING_MODE is "surface"
+surface_stats = {"hits": 0, "fallbacks": 0, "stale": False}
+_surface_checked = (None, False)  # (ServingModel, whether the surface was built from it)
+# /api/predict calls under LATENCY_BUDGET_MS: answered by the model, or by the heuristic and why
+fallback_stats = {"model": 0, "cold_start": 0, "budget": 0}
+ws_stats = {"active": 0, "sessions": 0, "rejected": 0, "updates": 0, "coalesced": 0, "stale": 0, "sent": 0}
+drift_monitor = None  # DriftMonitor for the served version, None when it has no drift reference
+
+# Rows scored before a model is swapped in: one single-row call and one batch call cover both code paths
+WARMUP_ROWS = {
+    "district": ["Thanjavur", "Madurai", "Coimbatore"],
+    "season": ["Samba", "Kuruvai", "Navarai"],
+    "year": [2024, 2024, 2024],
+    "temperature": [30.0, 33.0, 27.0],
+    "rainfall": [1200.0, 800.0, 1600.0],
+    "humidity": [75.0, 65.0, 85.0],
+    "water": [70.0, 40.0, 90.0],
+    "fertilizer": [50.0, 30.0, 80.0],
+}
+
+
+def legacy_paths() -> dict:
+    # Unversioned files next to main.py (used when the registry has no ACTIVE version)
+    return {"pickle": MODEL_PATH, "booster": NATIVE_BOOSTER_PATH, "spec": NATIVE_SPEC_PATH, "trees": TREES_PATH}
+
+
+def resolve_model_format(paths: dict) -> str:
+    if MODEL_FORMAT != "auto":
+        return MODEL_FORMAT
+    if os.path.exists(paths["booster"]) and os.path.exists(paths["spec"]):
+        return "native"
+    return "pickle"
+
+
+def load_artifacts(model_format: str, paths: dict):
+    # Returns (sklearn pipeline or None, encoder or None, regressor or None, artifact path)
+    if model_format == "trees":
+        if not os.path.exists(paths["trees"]):
+            raise FileNotFoundError(f"Exported trees not found at {paths['trees']} (run tree_ensemble.py)")
+        trees, spec = TreeEnsemble.load(paths["trees"])
+        print(f"✅ Loaded {len(trees.roots)} exported trees from", paths["trees"])
+        return None, CompiledEncoder.from_spec(spec), trees, paths["trees"]
+
+    if model_format == "native":
+        for path in (paths["booster"], paths["spec"]):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Native model file not found at {path} (run native_model.py)")
+        booster, native_encoder = load_native(paths["booster"], paths["spec"])
+        print("✅ Loaded native booster from", paths["booster"])
+        return None, native_encoder, booster, paths["booster"]
+
+    if not os.path.exists(paths["pickle"]):
+        raise FileNotFoundError(f"Model file not found at {paths['pickle']}")
+    import joblib
+    pipeline = joblib.load(paths["pickle"])
+    print("✅ Loaded model from", paths["pickle"])
+
+    # Compile the fitted preprocessor once so requests skip the sklearn ColumnTransformer
+    try:
+        pipeline_encoder = CompiledEncoder.from_pipeline(pipeline)
+        print(f"✅ Compiled feature encoder ({pipeline_encoder.n_features} features)")
+        return pipeline, pipeline_encoder, pipeline.named_steps["regressor"], paths["pickle"]
+    except (ValueError, AttributeError, KeyError) as e:
+        print("⚠️ Falling back to the full sklearn pipeline:", e)
+        return pipeline, None, None, paths["pickle"]
+
+
+def warm_up(candidate: ServingModel):
+    # First predictions pay one-off initialisation inside xgboost/NumPy; also rejects a broken model
+    columns = feature_columns(WARMUP_ROWS["district"], WARMUP_ROWS["season"], WARMUP_ROWS["year"],
+                              {field: np.array(WARMUP_ROWS[field]) for field in agronomy.INPUT_FIELDS})
+    batch = np.asarray(candidate.predict(columns), dtype=np.float64)
+    single = np.asarray(candidate.predict({col: values[:1] for col, values in columns.items()}), dtype=np.float64)
+    if not (np.all(np.isfinite(batch)) and np.all(np.isfinite(single))):
+        raise ValueError(f"Model version {candidate.version} produced non-finite warm-up predictions")
+
+
+def load_serving_model(version=None, warm: bool = True) -> tuple[ServingModel, dict]:
+    """Load and warm a registry version (or the legacy files when version is None) without serving it."""
+    started = time.perf_counter()
+    if version is None:
+        paths, metadata = legacy_paths(), {}
+    else:
+        paths, metadata = artifact_paths(version_dir(MODEL_REGISTRY_DIR, version)), read_metadata(MODEL_REGISTRY_DIR, version)
+    model_format = resolve_model_format(paths)
+    pipeline, loaded_encoder, loaded_regressor, path = load_artifacts(model_format, paths)
+    candidate = ServingModel(version or "local", model_format, path, pipeline, loaded_encoder, loaded_regressor, metadata)
+    loaded = time.perf_counter()
+    timings = {"load_seconds": round(loaded - started, 4)}
+    check_servable(candidate.features(), candidate.version)
+
+    if warm:
+        warm_up(candidate)
+        timings["warmup_seconds"] = round(time.perf_counter() - loaded, 4)
+    return candidate, timings
+
+
+def swap_model(candidate: ServingModel, timings: dict = None):
+    global serving_model, previous_model
+    # A single reference assignment: requests that already hold the old model finish on it
+    previous_model, serving_model = serving_model, candidate
+    # Yields are cached per version; drop the old version's entries and follow the new file
+    prediction_cache.watch(candidate.path)
+    explanation_cache.watch(candidate.path)
+
+    model_status.update({"ready": True, "version": candidate.version, "format": candidate.model_format,
+                         "path": candidate.path, "error": None})
+    model_status.update(timings or {})
+    print(f"✅ Serving model version {candidate.version} ({candidate.model_format})")
+    load_drift_reference(candidate)
+
+
+def load_drift_reference(candidate: ServingModel):
+    # Counts start over with each version: they are only meaningful against its own training data
+    global drift_monitor
+    if drift_monitor is not None and drift_monitor.version == candidate.version:
+        return
+    if candidate.version == "local":
+        path = DRIFT_REFERENCE_PATH
+    else:
+        path = os.path.join(version_dir(MODEL_REGISTRY_DIR, candidate.version), DRIFT_FILE)
+    try:
+        drift_monitor = DriftMonitor(load_reference(path), version=candidate.version, window=DRIFT_WINDOW)
+    except FileNotFoundError:
+        drift_monitor = None
+        print(f"⚠️ No drift reference at {path}; /api/drift is unavailable for version {candidate.version}")
+    except (ValueError, KeyError) as e:
+        drift_monitor = None
+        print(f"⚠️ Could not load drift reference {path}: {e}")
+
+
+def preload_model():
+    """Load the active version in a pre-fork master (serve.py) so workers share it copy-on-write.
+
+    It is not warmed here: predicting would start XGBoost's OpenMP thread pool, which does
+    not survive fork. Each worker warms the shared model in load_model() instead.
+    """
+    global preloaded_model
+    preloaded_model = load_serving_model(active_version(MODEL_REGISTRY_DIR), warm=False)
+    print(f"✅ Preloaded model version {preloaded_model[0].version} ({preloaded_model[0].model_format})")
+
+
+def load_model():
+    version = active_version(MODEL_REGISTRY_DIR)
+    # A worker recycled after a hot-swap must not fall back to the version the master preloaded
+    if preloaded_model is not None and preloaded_model[0].version == (version or "local"):
+        candidate, timings = preloaded_model
+        started = time.perf_counter()
+        warm_up(candidate)
+        timings = {**timings, "warmup_seconds": round(time.perf_counter() - started, 4)}
+        model_status["preloaded"] = True
+    else:
+        candidate, timings = load_serving_model(version)
+    swap_model(candidate, timings)
+    model_status["ready_after_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 4)
+    print(f"✅ Model ready {model_status['ready_after_seconds']:.2f}s after import")
+
+
+def try_load_model():
+    # Startup never aborts on a broken model (e.g. one failing its warm-up): /ready reports the error
+    try:
+        load_model()
+    except Exception as e:
+        model_status["error"] = f"{type(e).__name__}: {e}"
+        print("❌ Model load failed:", model_status["error"])
+
+
+def activate_version(version: str):
+    """Load, warm and swap in a registry version (None: the unversioned files); the current version keeps serving until the swap."""
+    with _swap_lock:
+        activation_status.update({"version": version or "local", "state": "loading", "error": None})
+        try:
+            candidate, timings = load_serving_model(version)
+            if version is None:
+                clear_active(MODEL_REGISTRY_DIR)
+            else:
+                set_active(MODEL_REGISTRY_DIR, version)
+            swap_model(candidate, timings)
+        except Exception as e:
+            activation_status.update({"state": "failed", "error": f"{type(e).__name__}: {e}"})
+            print(f"❌ Activating model version {version or 'local'} failed:", activation_status["error"])
+            return
+        activation_status["state"] = "active"
+
+
+def poll_registry():
+    # Hot-swap whenever training (or an operator) points ACTIVE at a different version; no ACTIVE
+    # (a rollback to "local") means the unversioned files, so every worker follows a rollback too
+    failed_version = None
+    while True:
+        time.sleep(MODEL_REGISTRY_POLL_SECONDS)
+        version = active_version(MODEL_REGISTRY_DIR)
+        wanted = version or "local"
+        current = serving_model
+        if current is None and version is None:
+            continue  # startup load still running (or failed); nothing to roll back from
+        if wanted == failed_version or (current is not None and wanted == current.version):
+            continue
+        activate_version(version)
+        if activation_status["state"] == "failed":
+            failed_version = wanted
+
+
 # Load model at startup
 @app.on_event("startup")
-def load_model():
-    global model
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
-    model = joblib.load(MODEL_PATH)
-    print("✅ Loaded model from", MODEL_PATH)
+def start_model_loading():
+    if MODEL_BACKGROUND_LOAD:
+        threading.Thread(target=try_load_model, name="model-load", daemon=True).start()
+    else:
+        try_load_model()
+    if MODEL_REGISTRY_POLL_SECONDS > 0:
+        threading.Thread(target=poll_registry, name="model-registry-poll", daemon=True).start()
 
 
 # ---------- Request / Response Schemas ----------
 
 class PredictionRequest(BaseModel):
+    # NaN/inf (which JSON parsing accepts) would break cache quantization and the model: 422 instead
+    model_config = ConfigDict(allow_inf_nan=False)
+
     district: str
     season: str          # "kuruvai", "samba", "thaladi" from frontend
     year: int
@@ -44,6 +391,30 @@ class PredictionRequest(BaseModel):
     fertilizer: float    # 0–100 slider
 
 
+class ScenarioAxis(BaseModel):
+    model_config = ConfigDict(allow_inf_nan=False)
+
+    field: str           # one of the slider inputs: temperature, rainfall, humidity, water, fertilizer
+    start: float
+    stop: float          # inclusive
+    step: float
+
+
+class ScenarioRequest(BaseModel):
+    model_config = ConfigDict(allow_inf_nan=False)
+
+    district: str
+    season: str
+    year: int
+    # Baseline values for the inputs that are not swept
+    temperature: float = 30.0
+    rainfall: float = 1200.0
+    humidity: float = 75.0
+    water: float = 70.0
+    fertilizer: float = 50.0
+    axes: list[ScenarioAxis]  # one or two swept inputs
+
+
 class PredictionResultWeatherFactor(BaseModel):
     score: float
     label: str
@@ -77,184 +448,1033 @@ def map_season(season_raw: str) -> str:
     return mapping.get(season_raw, "Samba")
 
 
-def compute_suitability(temp: float, rainfall: float, water: float, humidity: float) -> int:
-    # Simple heuristic scoring
-    score = 0
+def finite_json(value):
+    # NaN/inf cannot be written as JSON; they are echoed back as strings
+    if isinstance(value, float) and not math.isfinite(value):
+        return repr(value)
+    if isinstance(value, dict):
+        return {k: finite_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [finite_json(v) for v in value]
+    return value
 
-    # Temperature ideal ~ 25–32
-    if 25 <= temp <= 32:
-        score += 30
-    elif 22 <= temp <= 35:
-        score += 20
-    else:
-        score += 10
 
-    # Rainfall ideal ~ 900–1500 mm
-    if 900 <= rainfall <= 1500:
-        score += 30
-    elif 700 <= rainfall <= 2000:
-        score += 20
-    else:
-        score += 10
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    # FastAPI's default handler echoes the offending input, which fails to render for NaN/inf (a 500)
+    return JSONResponse({"detail": finite_json(jsonable_encoder(exc.errors()))}, status_code=422)
 
-    # Water (irrigation)
-    if water >= 75:
-        score += 25
-    elif water >= 50:
-        score += 15
-    else:
-        score += 5
 
-    # Humidity (loose effect)
-    if 60 <= humidity <= 85:
-        score += 15
-    else:
-        score += 8
+@app.get("/health")
+def health_check():
+    return {"status": "ok"}
 
-    return max(0, min(100, int(score)))
 
+@app.get("/ready")
+def readiness_check():
+    # Separate from /health: the process can be alive while the model is still loading
+    return JSONResponse(model_status, status_code=200 if model_status["ready"] else 503)
 
-def qualitative_label(score: float, good: str = "Good", moderate: str = "Moderate", poor: str = "Poor") -> str:
-    if score >= 70:
-        return good
-    elif score >= 40:
-        return moderate
-    else:
-        return poor
 
+def require_admin(x_admin_token: str | None = Header(None)):
+    if MODEL_ADMIN_TOKEN and x_admin_token != MODEL_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
 
-@app.get("/health")
-def health_check():
-    return {"status": "ok"}
+
+@app.get("/api/models")
+def model_versions():
+    return {
+        "registry_dir": MODEL_REGISTRY_DIR,
+        "active_version": active_version(MODEL_REGISTRY_DIR),
+        "serving": serving_model.describe() if serving_model is not None else None,
+        "rollback_to": previous_model.describe() if previous_model is not None else None,
+        "activation": activation_status,
+        "versions": list_versions(MODEL_REGISTRY_DIR),
+    }
 
 
-@app.post("/api/predict")
-def predict(req: PredictionRequest):
+@app.post("/api/models/{version}/activate", status_code=202, dependencies=[Depends(require_admin)])
+def activate_model_version(version: str):
+    try:
+        read_metadata(MODEL_REGISTRY_DIR, version)
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if _swap_lock.locked():
+        raise HTTPException(status_code=409, detail=f"Model version {activation_status['version']} is still loading")
+
+    # Load and warm in the background; the current version keeps answering until the swap
+    threading.Thread(target=activate_version, args=(version,), name="model-activate", daemon=True).start()
+    return {"status": "loading", "version": version}
+
+
+@app.post("/api/models/rollback", dependencies=[Depends(require_admin)])
+def rollback_model():
+    with _swap_lock:
+        if previous_model is None:
+            raise HTTPException(status_code=409, detail="No previous model version to roll back to")
+        candidate = previous_model
+        # Persisted, so the registry poller (and every other worker) follows instead of undoing it
+        if candidate.version == "local":
+            clear_active(MODEL_REGISTRY_DIR)
+        else:
+            set_active(MODEL_REGISTRY_DIR, candidate.version)
+        swap_model(candidate)
+        activation_status.update({"version": candidate.version, "state": "active", "error": None})
+    return {"status": "rolled back", "serving": candidate.describe()}
+
+
+def collect_serving_metrics():
+    # Read at scrape time: cache, micro-batcher and model-load figures
+    cache = prediction_cache.stats()
+    yield ("prediction_cache_lookups_total", "counter", "Prediction cache lookups by result",
+           [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])])
+    yield ("prediction_cache_removals_total", "counter", "Prediction cache entries dropped by reason",
+           [({"reason": "evicted"}, cache["evictions"]), ({"reason": "expired"}, cache["expirations"])])
+    yield ("prediction_cache_invalidations_total", "counter", "Whole-cache invalidations", [({}, cache["invalidations"])])
+    yield ("prediction_cache_entries", "gauge", "Entries currently cached", [({}, cache["size"])])
+    explained = explanation_cache.stats()
+    yield ("explanation_cache_lookups_total", "counter", "Explanation cache lookups by result",
+           [({"result": "hit"}, explained["hits"]), ({"result": "miss"}, explained["misses"])])
+
+    pools = [(pool, limiter.stats()) for pool, limiter in (("interactive", admission), ("bulk", bulk_admission))
+             if limiter.enabled]
+    if pools:
+        yield ("admission_active", "gauge", "Prediction requests running", [({"pool": p}, a["active"]) for p, a in pools])
+        yield ("admission_queued", "gauge", "Prediction requests waiting for a slot",
+               [({"pool": p}, a["queued"]) for p, a in pools])
+        yield ("admission_admitted_total", "counter", "Prediction requests admitted",
+               [({"pool": p}, a["admitted"]) for p, a in pools])
+        yield ("admission_queue_wait_seconds_total", "counter", "Time admitted and dropped requests spent queued",
+               [({"pool": p}, a["queue_wait_seconds"]) for p, a in pools])
+        yield ("admission_rejected_total", "counter",
+               "Prediction requests rejected by reason (429 queue_full, 503 deadline; 503 timed_out: ran past the client deadline)",
+               [({"pool": p, "reason": reason}, n) for p, a in pools for reason, n in a["rejected"].items()])
+
+    if LATENCY_BUDGET_MS > 0:
+        yield ("budgeted_predictions_total", "counter",
+               "/api/predict calls under the latency budget by who answered (heuristic: cold start or budget missed)",
+               [({"source": "model", "reason": "in_budget"}, fallback_stats["model"]),
+                ({"source": "heuristic", "reason": "cold_start"}, fallback_stats["cold_start"]),
+                ({"source": "heuristic", "reason": "budget"}, fallback_stats["budget"])])
+
+    if prediction_log is not None:
+        logged = prediction_log.stats()
+        yield ("prediction_log_entries_total", "counter", "Predictions offered to the prediction log by outcome",
+               [({"result": "written"}, logged["written"]), ({"result": "dropped"}, logged["dropped"])])
+        yield ("prediction_log_buffered", "gauge", "Predictions waiting to be written", [({}, logged["buffered"])])
+        yield ("prediction_log_flush_seconds_total", "counter", "Time spent writing the prediction log",
+               [({}, logged["flush_seconds"])])
+
+    if drift_monitor is not None:
+        drift = drift_monitor.report()["features"]
+        scored = [(field, result) for field, result in drift.items() if "psi" in result]
+        yield ("input_drift_psi", "gauge", "Population stability index of recent inputs vs the training data",
+               [({"input": field}, result["psi"]) for field, result in scored])
+        yield ("input_unseen_share", "gauge", "Share of recent inputs outside the training range or categories",
+               [({"input": field}, result["unseen_share"]) for field, result in scored])
+
+    yield ("ws_sessions", "gauge", "Open /ws/predict sessions", [({}, ws_stats["active"])])
+    yield ("ws_updates_total", "counter", "/ws/predict input updates (coalesced: absorbed by the debounce; "
+           "stale: superseded a prediction in flight, which was cancelled)",
+           [({"outcome": "received"}, ws_stats["updates"]), ({"outcome": "coalesced"}, ws_stats["coalesced"]),
+            ({"outcome": "stale"}, ws_stats["stale"])])
+    yield ("ws_predictions_sent_total", "counter", "Predictions pushed to /ws/predict sessions", [({}, ws_stats["sent"])])
+
+    batcher = micro_batcher.stats()
+    yield ("micro_batch_batches_total", "counter", "Model calls made by the micro-batcher", [({}, batcher["batches"])])
+    yield ("micro_batch_items_total", "counter", "Predictions scored by the micro-batcher", [({}, batcher["items"])])
+    yield ("micro_batch_busy_seconds_total", "counter", "Time the micro-batcher spent scoring", [({}, batcher["busy_seconds"])])
+    yield ("micro_batch_queued", "gauge", "Predictions waiting for the micro-batcher", [({}, batcher["queued"])])
+
+    if yield_surface is not None:
+        yield ("surface_lookups_total", "counter", "/api/predict calls answered by the yield surface or passed to the model",
+               [({"result": "hit"}, surface_stats["hits"]), ({"result": "fallback"}, surface_stats["fallbacks"])])
+        yield ("surface_stale", "gauge", "1 when the yield surface was built from a different model version",
+               [({}, int(surface_stats["stale"]))])
+
+    yield ("model_ready", "gauge", "1 once a model is loaded and warmed", [({}, int(model_status["ready"]))])
+    if serving_model is not None:
+        yield ("model_info", "gauge", "Model version being served",
+               [({"version": serving_model.version, "format": serving_model.model_format}, 1)])
+    for key, help_text in (("load_seconds", "Time to load the served model's artifacts"),
+                           ("warmup_seconds", "Time spent warming the served model"),
+                           ("ready_after_seconds", "Seconds from import until the first model was ready")):
+        if model_status[key] is not None:
+            yield (f"model_{key}", "gauge", help_text, [({}, model_status[key])])
+
+
+metrics.add_collector(collect_serving_metrics)
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    return prediction_cache.stats()
+
+
+@app.get("/api/admission/stats")
+def admission_stats():
+    return {**admission.stats(), "bulk": bulk_admission.stats()}
+
+
+@app.get("/api/drift")
+def input_drift(detail: bool = False):
+    monitor = drift_monitor
+    if monitor is None:
+        raise HTTPException(status_code=404, detail=f"No drift reference for model version {model_status['version']}")
+    return monitor.report(detail=detail)
+
+
+@app.get("/api/prediction-log/stats")
+def prediction_log_stats():
+    if prediction_log is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_log.stats()}
+
+
+def normalize_district(district_raw: str) -> str:
     # Normalize district string to Title Case to match training data
-    district = req.district.strip()
+    district = district_raw.strip()
     if district:
         district = district[0].upper() + district[1:]
+    return district
 
-    # Map season string to training season categories
-    season = map_season(req.season)
 
-    # Build feature row with same columns as training dataset
-    area_ha = estimate_area_ha(district)
-    baseline_yield = 4000.0  # kg/ha, rough baseline
-    production_tonnes = area_ha * baseline_yield / 1000.0
+def fertilizer_kg_per_ha(fertilizer):
+    # Map fertilizer slider (0–100) to ~70–250 kg/ha range
+    return 70.0 + (fertilizer / 100.0) * (250.0 - 70.0)
 
-    rainfall_mm = req.rainfall
-    max_temp_c = req.temperature
-    min_temp_c = req.temperature - 5.0
 
-    irrigation_percent = req.water
-    # Map fertilizer slider (0–100) to ~70–250 kg/ha range
-    fertilizer_kg_per_ha = 70.0 + (req.fertilizer / 100.0) * (250.0 - 70.0)
-
-    # Create DataFrame exactly with training dataset columns
-    data = {
-        "year": [req.year],
-        "district": [district],
-        "season": [season],
-        "area_ha": [area_ha],
-        "production_tonnes": [production_tonnes],
-        "rainfall_mm": [rainfall_mm],
-        "max_temp_c": [max_temp_c],
-        "min_temp_c": [min_temp_c],
-        "irrigation_percent": [irrigation_percent],
-        "fertilizer_kg_per_ha": [fertilizer_kg_per_ha]
+def feature_columns(districts: list[str], seasons: list[str], years, inputs: dict) -> dict:
+    # Feature columns with same columns as training dataset, from normalized district/season
+    # lists and slider input arrays (see agronomy.inputs_from_requests); keys are model_registry.SERVED_FEATURES
+    baseline_yield = 4000.0  # kg/ha, rough baseline
+    area_ha = np.array([estimate_area_ha(d) for d in districts], dtype=np.float64)
+    temperature = inputs["temperature"]
+
+    return {
+        "year": np.asarray(years),
+        "district": districts,
+        "season": seasons,
+        "area_ha": area_ha,
+        "production_tonnes": area_ha * baseline_yield / 1000.0,
+        "rainfall_mm": inputs["rainfall"],
+        "max_temp_c": temperature,
+        "min_temp_c": temperature - 5.0,
+        "irrigation_percent": inputs["water"],
+        "fertilizer_kg_per_ha": fertilizer_kg_per_ha(inputs["fertilizer"]),
     }
 
-    X = pd.DataFrame(data)
 
-    # Predict yield
-    y_pred = float(model.predict(X)[0])  # kg per hectare
-    
+def build_feature_columns(reqs: list[PredictionRequest]) -> dict:
+    # One row per request; season strings mapped to training season categories
+    with metrics.stage("normalize"):
+        districts = [normalize_district(req.district) for req in reqs]
+        seasons = [map_season(req.season) for req in reqs]
+    with metrics.stage("features"):
+        return feature_columns(districts, seasons, [req.year for req in reqs], agronomy.inputs_from_requests(reqs))
+
+
+def current_model() -> ServingModel:
+    current = serving_model
+    if current is None:
+        if model_status["error"]:
+            raise HTTPException(status_code=503, detail=f"Model failed to load: {model_status['error']}")
+        raise HTTPException(status_code=503, detail="Model is still loading", headers={"Retry-After": "2"})
+    return current
+
+
+def score_feature_columns(columns: dict, current: ServingModel = None) -> np.ndarray:
+    # One model call over all rows; returns kg per hectare per row
+    current = current or current_model()
+    with metrics.stage("encode"):
+        X = current.encode(columns)
+    with metrics.stage("model"):
+        y_pred = current.predict_encoded(X)
+
+    if model_status["first_prediction_after_seconds"] is None and model_status["ready"]:
+        model_status["first_prediction_after_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 4)
+
+    return clip_yields(y_pred)
+
+
+def clip_yields(y_pred) -> np.ndarray:
     # Ensure yield is positive and realistic (minimum 1000 kg/ha, maximum 8000 kg/ha)
-    y_pred = max(1000.0, min(8000.0, abs(y_pred)))
-
-    # Build monthly yield profile (just an illustrative seasonal curve)
-    # Higher yield in core cropping months
-    # Simple 12-month distribution that sums to ~predicted yield
-    monthly_weights = [0.03, 0.04, 0.05, 0.08, 0.10, 0.13, 0.15, 0.14, 0.11, 0.07, 0.06, 0.04]
-    monthly_yield = [round(y_pred * w, 2) for w in monthly_weights]
-
-    # Weather suitability and factors
-    suitability_score = compute_suitability(req.temperature, req.rainfall, req.water, req.humidity)
-
-    temp_score = max(0, min(100, 100 - abs(req.temperature - 29) * 4))
-    rain_score = max(0, min(100, 100 - abs(req.rainfall - 1200) * 0.05))
-    humid_score = max(0, min(100, 100 - abs(req.humidity - 75) * 2))
-    water_score = max(0, min(100, req.water))
-
-    weather_analysis = {
-        "suitability_score": suitability_score,
-        "factors": {
-            "temperature": {
-                "score": round(temp_score, 1),
-                "label": qualitative_label(temp_score, "Optimal", "Manageable", "Stressful"),
-            },
-            "rainfall": {
-                "score": round(rain_score, 1),
-                "label": qualitative_label(rain_score, "Well distributed", "Variable", "Inadequate"),
-            },
-            "humidity": {
-                "score": round(humid_score, 1),
-                "label": qualitative_label(humid_score, "Favorable", "Mixed", "Unfavorable"),
-            },
-            "water": {
-                "score": round(water_score, 1),
-                "label": qualitative_label(water_score, "Secure", "Cautious", "Insufficient"),
-            },
-        },
+    return np.clip(np.abs(np.asarray(y_pred, dtype=np.float64)), 1000.0, 8000.0)
+
+
+def model_yields(reqs: list[PredictionRequest], current: ServingModel = None) -> list[float]:
+    return score_feature_columns(build_feature_columns(reqs), current).tolist()
+
+
+def versioned_model_yields(reqs: list[PredictionRequest]) -> list[tuple]:
+    # (model version, yield) per request, so callers cache each yield under the version that produced it
+    current = current_model()
+    return [(current.version, y_pred) for y_pred in model_yields(reqs, current)]
+
+
+def quantize_request(req: PredictionRequest) -> PredictionRequest:
+    # Slider values snapped to the cache resolution; the model scores these snapped values
+    q = prediction_cache.quantize
+    return PredictionRequest(
+        district=req.district,
+        season=req.season,
+        year=req.year,
+        temperature=q(req.temperature),
+        rainfall=q(req.rainfall),
+        humidity=q(req.humidity),
+        water=q(req.water),
+        fertilizer=q(req.fertilizer),
+    )
+
+
+def cache_key(req: PredictionRequest, version: str) -> tuple:
+    # Expects a request from quantize_request; district/season normalized as the model sees them
+    return (version, normalize_district(req.district), map_season(req.season), req.year, req.temperature,
+            req.rainfall, req.humidity, req.water, req.fertilizer)
+
+
+def predict_yields(reqs: list[PredictionRequest]) -> list[float]:
+    # Serve repeated inputs from the cache; score only the misses, in one model call
+    current = current_model()
+    if not prediction_cache.enabled:
+        return model_yields(reqs, current)
+
+    with metrics.stage("cache"):
+        quantized = [quantize_request(req) for req in reqs]
+        keys = [cache_key(req, current.version) for req in quantized]
+        yields = [prediction_cache.get(key) for key in keys]
+
+    missing = [i for i, y in enumerate(yields) if y is None]
+    if missing:
+        fresh = model_yields([quantized[i] for i in missing], current)
+        for i, y_pred in zip(missing, fresh):
+            yields[i] = y_pred
+            prediction_cache.put(keys[i], y_pred)
+    return yields
+
+
+micro_batcher = MicroBatcher(versioned_model_yields, max_wait_ms=MICRO_BATCH_MAX_WAIT_MS, max_batch_size=MICRO_BATCH_MAX_SIZE)
+
+
+@app.on_event("startup")
+async def start_micro_batcher():
+    if MICRO_BATCH_MAX_SIZE > 1:
+        micro_batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_micro_batcher():
+    await micro_batcher.stop()
+
+
+@app.on_event("startup")
+def start_prediction_log():
+    if prediction_log is None:
+        return
+    try:
+        prediction_log.start()
+        print("✅ Logging predictions to", PREDICTION_LOG_PATH)
+    except Exception as e:
+        print(f"⚠️ Prediction log disabled: cannot open {PREDICTION_LOG_PATH}: {e}")
+
+
+@app.on_event("shutdown")
+def stop_prediction_log():
+    if prediction_log is not None:
+        prediction_log.stop()
+
+
+def log_predictions(endpoint: str, reqs: list[PredictionRequest], yields: list, source: str, version: str = None):
+    # In-memory append only; the prediction log's writer thread does the disk I/O
+    if prediction_log is None or not prediction_log.running:
+        return
+    now = time.time()
+    prediction_log.record([
+        (now, endpoint, normalize_district(req.district), map_season(req.season), req.year, req.temperature,
+         req.rainfall, req.humidity, req.water, req.fertilizer, float(y_pred), source, version)
+        for req, y_pred in zip(reqs, yields) if y_pred is not None
+    ])
+
+
+async def predict_yield(req: PredictionRequest) -> float:
+    # Single prediction for the async endpoint: cache first, then coalesce misses with
+    # other in-flight requests into one model call
+    if not micro_batcher.running:
+        return (await run_in_threadpool(predict_yields, [req]))[0]
+    if not prediction_cache.enabled:
+        with metrics.stage("batch_wait"):
+            return (await micro_batcher.submit(req))[1]
+
+    with metrics.stage("cache"):
+        quantized = quantize_request(req)
+        y_pred = prediction_cache.get(cache_key(quantized, current_model().version))
+    if y_pred is None:
+        # Queueing plus the shared features/encode/model call, as seen by this request
+        with metrics.stage("batch_wait"):
+            version, y_pred = await micro_batcher.submit(quantized)
+        prediction_cache.put(cache_key(quantized, version), y_pred)
+    return y_pred
+
+
+def build_responses(reqs: list[PredictionRequest], yields: list[float]) -> list[dict]:
+    # Monthly profile, weather factors, risk tiers and recommendations for all rows at once
+    with metrics.stage("postprocess"):
+        return agronomy.build_responses(agronomy.MAIN_PROFILE, agronomy.inputs_from_requests(reqs), yields)
+
+
+def surface_districts(current: ServingModel) -> list[str]:
+    # Every district the model knows; other districts are scored by the model itself
+    encoder = current.encoder or CompiledEncoder.from_pipeline(current.pipeline)
+    return list(encoder.categories[encoder.categorical_cols.index("district")])
+
+
+def surface_seasons() -> list[str]:
+    return sorted({map_season(season) for season in ("kuruvai", "samba", "thaladi")})
+
+
+@app.on_event("startup")
+def load_surface():
+    global yield_surface
+    if SERVING_MODE != "surface":
+        return
+    try:
+        yield_surface = YieldSurface.load(SURFACE_PATH)
+    except FileNotFoundError:
+        print(f"⚠️ SERVING_MODE=surface but {SURFACE_PATH} is missing (run yield_surface.py build); scoring with the model")
+        return
+    error = yield_surface.meta["error"]
+    print(f"✅ Loaded yield surface {SURFACE_PATH} {tuple(yield_surface.values.shape)} "
+          f"(max interpolation error {error['max_abs']} kg/ha, p99 {error['p99_abs']})")
+
+
+def surface_yield(req: PredictionRequest):
+    """(yield, error bound) from the yield surface, or None when the model has to answer."""
+    global _surface_checked
+    surface, current = yield_surface, serving_model
+    if surface is None or current is None:
+        return None
+    if _surface_checked[0] is not current:
+        # Checked once per served model: a surface built from another version is never used
+        _surface_checked = (current, surface.matches(current.version, current.path))
+        surface_stats["stale"] = not _surface_checked[1]
+        if surface_stats["stale"]:
+            print(f"⚠️ Yield surface was built from model {surface.model_version}, not {current.version}; scoring with the model")
+    if not _surface_checked[1]:
+        return None
+    values = {field: getattr(req, field) for field in agronomy.INPUT_FIELDS}
+    values["year"] = req.year
+    return surface.lookup(normalize_district(req.district), map_season(req.season), values)
+
+
+def heuristic_response(req: PredictionRequest, reason: str, endpoint: str) -> dict:
+    fallback_stats[reason] += 1
+    with metrics.stage("heuristic"):
+        y_pred = heuristic_yield(req)
+    log_predictions(endpoint, [req], [y_pred], "heuristic")
+    return {**build_responses([req], [y_pred])[0], "source": "heuristic"}
+
+
+async def budgeted_prediction(req: PredictionRequest, endpoint: str) -> dict:
+    # The model gets LATENCY_BUDGET_MS; past that the heuristic answers and the model call is cancelled
+    # (a micro-batch already scoring still finishes, but its result is dropped)
+    if serving_model is None:
+        return heuristic_response(req, "cold_start", endpoint)
+    task = asyncio.ensure_future(predict_yield(req))
+    done, _ = await asyncio.wait((task,), timeout=LATENCY_BUDGET_MS / 1000.0)
+    if not done:
+        task.cancel()
+        return heuristic_response(req, "budget", endpoint)
+    fallback_stats["model"] += 1
+    y_pred = task.result()
+    log_predictions(endpoint, [req], [y_pred], "model", serving_model.version)
+    return {**build_responses([req], [y_pred])[0], "source": "model"}
+
+
+def observe_drift(reqs: list[PredictionRequest]):
+    # Numeric inputs in drift.NUMERIC_INPUTS order, in the model's units (see feature_columns)
+    monitor = drift_monitor
+    if monitor is None:
+        return
+    for req in reqs:
+        monitor.observe(normalize_district(req.district), map_season(req.season),
+                        (req.temperature, req.rainfall, req.humidity, req.water, fertilizer_kg_per_ha(req.fertilizer)))
+
+
+@app.post("/api/predict")
+async def predict(req: PredictionRequest, exact: bool = False):
+    return await predict_response(req, exact)
+
+
+async def predict_response(req: PredictionRequest, exact: bool = False, endpoint: str = "predict") -> dict:
+    # Shared by /api/predict and /ws/predict: yield surface, then the latency budget, then the model
+    observe_drift([req])
+    if SERVING_MODE == "surface" and not exact:
+        with metrics.stage("surface"):
+            found = surface_yield(req)
+        if found is not None:
+            surface_stats["hits"] += 1
+            response = build_responses([req], [found[0]])[0]
+            response.update({"source": "surface", "error_bound": round(found[1], 1)})
+            log_predictions(endpoint, [req], [found[0]], "surface", yield_surface.model_version)
+            return response
+        surface_stats["fallbacks"] += 1
+
+    if LATENCY_BUDGET_MS > 0 and not exact:
+        return await budgeted_prediction(req, endpoint)
+    y_pred = await predict_yield(req)
+    log_predictions(endpoint, [req], [y_pred], "model", serving_model.version)
+    return {**build_responses([req], [y_pred])[0], "source": "model"}
+
+
+@app.post("/api/predict/batch")
+def predict_batch(items: list[dict] = Body(...)):
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(items)} items (max {MAX_BATCH_SIZE})")
+
+    # Validate each item on its own so one bad row does not reject the whole batch
+    results: list[dict] = [None] * len(items)
+    valid: list[tuple[int, PredictionRequest]] = []
+    for i, item in enumerate(items):
+        try:
+            valid.append((i, PredictionRequest(**item)))
+        except (ValidationError, TypeError) as e:
+            results[i] = {"error": f"Invalid request: {e}"}
+
+    if valid:
+        reqs = [req for _, req in valid]
+        observe_drift(reqs)
+        try:
+            yields = predict_yields(reqs)
+        except HTTPException:
+            raise
+        except Exception:
+            # Vectorized call failed; score rows one by one to find the bad ones
+            yields = []
+            for i, req in valid:
+                try:
+                    yields.append(predict_yields([req])[0])
+                except Exception as e:
+                    results[i] = {"error": f"Prediction failed: {e}"}
+                    yields.append(None)
+
+        log_predictions("predict_batch", reqs, yields, "model", serving_model.version)
+        scored = [(i, req, y_pred) for (i, req), y_pred in zip(valid, yields) if y_pred is not None]
+        responses = build_responses([req for _, req, _ in scored], [y_pred for _, _, y_pred in scored])
+        for (i, _, _), response in zip(scored, responses):
+            results[i] = response
+
+    n_errors = sum(1 for r in results if "error" in r)
+    return {
+        "count": len(results),
+        "succeeded": len(results) - n_errors,
+        "failed": n_errors,
+        "results": results,
+    }
+
+
+# ---------- Live predictions (WebSocket) ----------
+
+class PredictionSession:
+    """One /ws/predict client: its latest inputs and at most one prediction in flight."""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.inputs = {}
+        self.seq = 0
+        self.changed = asyncio.Event()
+
+    def update(self, message) -> str:
+        """Merge a partial update into the inputs; returns an error message, or None."""
+        if not isinstance(message, dict):
+            return "Expected a JSON object of prediction inputs"
+        unknown = sorted(set(message) - set(PredictionRequest.model_fields) - {"seq"})
+        if unknown:
+            return f"Unknown fields: {', '.join(unknown)}"
+        seq = message.pop("seq", None)
+        self.seq = seq if isinstance(seq, int) else self.seq + 1
+        self.inputs.update(message)
+        ws_stats["updates"] += 1
+        self.changed.set()
+        return None
+
+    async def settle(self):
+        # Absorb updates until none has arrived for WS_DEBOUNCE_MS, or WS_MAX_COALESCE_MS has passed
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + WS_MAX_COALESCE_MS / 1000.0
+        while True:
+            self.changed.clear()
+            wait = min(WS_DEBOUNCE_MS / 1000.0, deadline - loop.time())
+            if wait <= 0:
+                return
+            try:
+                await asyncio.wait_for(self.changed.wait(), wait)
+            except asyncio.TimeoutError:
+                return
+            ws_stats["coalesced"] += 1
+
+    async def run(self):
+        # Predict for the latest inputs after each burst of updates; an update arriving while a
+        # prediction is in flight makes it stale, so it is cancelled and never sent
+        while True:
+            await self.changed.wait()
+            await self.settle()
+            seq = self.seq
+            missing = [field for field in PredictionRequest.model_fields if field not in self.inputs]
+            if missing:
+                await self.websocket.send_json({"seq": seq, "missing": missing})
+                continue
+            try:
+                req = PredictionRequest(**self.inputs)
+            except ValidationError as e:
+                await self.websocket.send_json({"seq": seq, "error": f"Invalid request: {e}"})
+                continue
+
+            prediction = asyncio.ensure_future(predict_response(req, endpoint="ws_predict"))
+            newer = asyncio.ensure_future(self.changed.wait())
+            await asyncio.wait((prediction, newer), return_when=asyncio.FIRST_COMPLETED)
+            newer.cancel()
+            if not prediction.done():
+                prediction.cancel()
+                ws_stats["stale"] += 1
+                continue
+            try:
+                response = prediction.result()
+            except HTTPException as e:
+                await self.websocket.send_json({"seq": seq, "error": e.detail})
+                continue
+            except Exception as e:
+                # e.g. OverflowError from Infinity, which json.loads accepts; the session keeps going
+                await self.websocket.send_json({"seq": seq, "error": f"Prediction failed: {type(e).__name__}: {e}"})
+                continue
+            await self.websocket.send_json({**response, "seq": seq})
+            ws_stats["sent"] += 1
+
+
+@app.websocket("/ws/predict")
+async def ws_predict(websocket: WebSocket):
+    if ws_stats["active"] >= WS_MAX_SESSIONS:
+        ws_stats["rejected"] += 1
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    ws_stats["active"] += 1
+    ws_stats["sessions"] += 1
+    session = PredictionSession(websocket)
+    worker = asyncio.ensure_future(session.run())
+    receiving = None
+    try:
+        while True:
+            receiving = asyncio.ensure_future(websocket.receive_text())
+            await asyncio.wait((receiving, worker), return_when=asyncio.FIRST_COMPLETED)
+            if not receiving.done():
+                # The worker is gone, so no update would ever be answered: close instead of going silent
+                receiving.cancel()
+                if not worker.cancelled() and worker.exception() is not None:
+                    print(f"❌ /ws/predict session failed: {worker.exception()!r}")
+                try:
+                    await websocket.close(code=1011)
+                except RuntimeError:
+                    pass  # the client had already gone
+                break
+            text = receiving.result()
+            try:
+                error = session.update(json.loads(text))
+            except ValueError:
+                error = "Messages must be JSON"
+            if error is not None:
+                await websocket.send_json({"seq": session.seq, "error": error})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        ws_stats["active"] -= 1
+        if receiving is not None:
+            receiving.cancel()
+        worker.cancel()
+        try:
+            await worker
+        except (asyncio.CancelledError, Exception):
+            pass  # e.g. a send that raced the disconnect
+
+
+# ---------- Explanations ----------
+
+_feature_groupings = weakref.WeakKeyDictionary()  # ServingModel -> FeatureGrouping
+
+
+def explain_requests(reqs: list[PredictionRequest]) -> list[dict]:
+    """Per-field contributions for each request: cached ones from the cache, the rest in one TreeSHAP call."""
+    current = current_model()
+    explanations: list[dict] = [None] * len(reqs)
+    misses = []
+    for i, req in enumerate(reqs):
+        quantized = quantize_request(req)
+        key = cache_key(quantized, current.version)
+        cached = explanation_cache.get(key)
+        if cached is None:
+            misses.append((i, quantized, key))
+        else:
+            explanations[i] = cached
+    if not misses:
+        return explanations
+
+    columns = build_feature_columns([quantized for _, quantized, _ in misses])
+    try:
+        with metrics.stage("explain"):
+            contributions = current.contributions(columns, approximate=EXPLAIN_METHOD == "saabas")
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    grouping = _feature_groupings.get(current)
+    if grouping is None:
+        grouping = _feature_groupings[current] = FeatureGrouping(current.encoder)
+    yields = clip_yields(contributions.sum(axis=1)).tolist()
+    for (i, _, key), explanation, y_pred in zip(misses, grouping.explain(contributions, columns), yields):
+        explanation = {"yield": round(y_pred, 2), **explanation, "method": EXPLAIN_METHOD, "model_version": current.version}
+        explanation_cache.put(key, explanation)
+        explanations[i] = explanation
+    return explanations
+
+
+@app.post("/api/explain")
+def explain(req: PredictionRequest):
+    """Why the model predicted this yield: kg/ha contributed by each input, relative to base_value."""
+    return explain_requests([req])[0]
+
+
+@app.post("/api/explain/batch")
+def explain_batch(items: list[dict] = Body(...)):
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(items)} items (max {MAX_BATCH_SIZE})")
+
+    results: list[dict] = [None] * len(items)
+    valid: list[tuple[int, PredictionRequest]] = []
+    for i, item in enumerate(items):
+        try:
+            valid.append((i, PredictionRequest(**item)))
+        except (ValidationError, TypeError) as e:
+            results[i] = {"error": f"Invalid request: {e}"}
+
+    if valid:
+        for (i, _), explanation in zip(valid, explain_requests([req for _, req in valid])):
+            results[i] = explanation
+
+    n_errors = sum(1 for r in results if "error" in r)
+    return {
+        "count": len(results),
+        "succeeded": len(results) - n_errors,
+        "failed": n_errors,
+        "results": results,
     }
 
-    # Risk levels based on simple thresholds
-    drought_risk = "High" if req.rainfall < 700 and req.water < 60 else ("Moderate" if req.rainfall < 900 else "Low")
-    heat_risk = "High" if req.temperature > 36 else ("Moderate" if req.temperature > 32 else "Low")
-    flood_risk = "High" if req.rainfall > 2000 else ("Moderate" if req.rainfall > 1500 else "Low")
-    water_risk = "High" if req.water < 40 else ("Moderate" if req.water < 70 else "Low")
-
-    risk = {
-        "drought": drought_risk,
-        "heat": heat_risk,
-        "flood": flood_risk,
-        "water": water_risk,
+
+def axis_values(axis: ScenarioAxis) -> np.ndarray:
+    if axis.field not in agronomy.INPUT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Unknown scenario field '{axis.field}'")
+    if axis.step <= 0 or axis.stop < axis.start:
+        raise HTTPException(status_code=400, detail=f"Invalid range for '{axis.field}'")
+    n_points = int(np.floor((axis.stop - axis.start) / axis.step + 1e-9)) + 1
+    if n_points > MAX_SCENARIO_POINTS:
+        raise HTTPException(status_code=400, detail=f"Too many grid points for '{axis.field}'")
+    # Round away float drift from start + k * step (e.g. 20.000000000000004)
+    return np.round(axis.start + axis.step * np.arange(n_points), 10)
+
+
+def nest(values: list, shape: tuple) -> list:
+    # Row-major flat list -> nested lists for a 1-D or 2-D grid
+    if len(shape) == 1:
+        return values
+    return [values[i * shape[1]:(i + 1) * shape[1]] for i in range(shape[0])]
+
+
+@app.post("/api/scenarios")
+def scenarios(req: ScenarioRequest):
+    if not 1 <= len(req.axes) <= 2:
+        raise HTTPException(status_code=400, detail="Provide one or two scenario axes")
+    if len({axis.field for axis in req.axes}) != len(req.axes):
+        raise HTTPException(status_code=400, detail="Scenario axes must sweep different inputs")
+
+    values = [axis_values(axis) for axis in req.axes]
+    shape = tuple(len(v) for v in values)
+    n_points = int(np.prod(shape))
+    if n_points > MAX_SCENARIO_POINTS:
+        raise HTTPException(status_code=400, detail=f"Grid has {n_points} points (max {MAX_SCENARIO_POINTS})")
+
+    # Whole grid as one feature matrix: swept inputs vary, the rest stay at the baseline
+    inputs = {field: np.full(n_points, float(getattr(req, field))) for field in agronomy.INPUT_FIELDS}
+    for axis, grid in zip(req.axes, np.meshgrid(*values, indexing="ij")):
+        inputs[axis.field] = grid.ravel()
+
+    district = normalize_district(req.district)
+    season = map_season(req.season)
+    columns = feature_columns([district] * n_points, [season] * n_points, np.full(n_points, req.year), inputs)
+    yields = score_feature_columns(columns)
+
+    result = agronomy.evaluate(agronomy.MAIN_PROFILE, inputs, yields)
+    return {
+        "district": district,
+        "season": season,
+        "year": req.year,
+        "axes": [{"field": axis.field, "values": v.tolist()} for axis, v in zip(req.axes, values)],
+        "shape": list(shape),
+        "yield": nest(agronomy.round_values(result["yield"], agronomy.MAIN_PROFILE["yield_decimals"]), shape),
+        "suitability_score": nest(result["suitability_score"].tolist(), shape),
+        "risk": {risk: nest(result["risk"][risk].tolist(), shape) for risk in agronomy.RISKS},
     }
 
-    # Simple text recommendations
-    recommendations = []
-
-    if drought_risk != "Low":
-        recommendations.append(
-            "Plan for drought-resilient varieties and staggered irrigation to reduce moisture stress."
-        )
-    if heat_risk != "Low":
-        recommendations.append(
-            "Avoid peak heat stress by adjusting sowing window and ensuring adequate water during flowering."
-        )
-    if flood_risk != "Low":
-        recommendations.append(
-            "Improve drainage in low-lying fields and avoid excess standing water during heavy rains."
-        )
-    if req.fertilizer < 40:
-        recommendations.append(
-            "Current fertilizer input seems low; review NPK recommendation for your soil test results."
-        )
-    if not recommendations:
-        recommendations.append(
-            "Conditions are generally favorable. Maintain timely irrigation and recommended fertilizer schedule."
-        )
-
-    # Response shaped for frontend PredictionResult
+
+# ---------- Bulk CSV scoring ----------
+
+def bulk_feature_columns(schema: str, text: dict, numeric: dict) -> dict:
+    districts = [normalize_district(d) for d in text["district"]]
+    if schema == "request":
+        seasons = [map_season(season) for season in text["season"]]
+        inputs = {field: numeric[field] for field in agronomy.INPUT_FIELDS}
+        return feature_columns(districts, seasons, numeric["year"], inputs)
+
+    # Training-dataset rows are already in the model's units and season categories
+    seasons = [season.title() for season in text["season"]]
+    area_ha = np.array([estimate_area_ha(d) for d in districts], dtype=np.float64)
+    if "area_ha" in numeric:
+        area_ha = np.where(np.isnan(numeric["area_ha"]), area_ha, numeric["area_ha"])
+    production_tonnes = area_ha * 4000.0 / 1000.0
+    if "production_tonnes" in numeric:
+        production_tonnes = np.where(np.isnan(numeric["production_tonnes"]), production_tonnes, numeric["production_tonnes"])
     return {
-        "yield": round(y_pred, 2),
-        "monthly_yield": monthly_yield,
-        "weather_analysis": weather_analysis,
-        "risk": risk,
-        "recommendations": recommendations,
+        "year": numeric["year"],
+        "district": districts,
+        "season": seasons,
+        "area_ha": area_ha,
+        "production_tonnes": production_tonnes,
+        **{col: numeric[col] for col in ("rainfall_mm", "max_temp_c", "min_temp_c", "irrigation_percent", "fertilizer_kg_per_ha")},
     }
 
+
+def score_chunk(schema: str, chunk: dict, current: ServingModel) -> list[dict]:
+    # One model call for the chunk's valid rows; row-by-row only if that call fails
+    valid = np.array([error is None for error in chunk["errors"]], dtype=bool)
+    positions = np.flatnonzero(valid)
+    yields = {}
+    if len(positions):
+        text, numeric = subset(chunk, valid)
+        try:
+            scored = score_feature_columns(bulk_feature_columns(schema, text, numeric), current)
+            yields = dict(zip(positions.tolist(), np.round(scored, 2).tolist()))
+        except Exception:
+            for i in positions.tolist():
+                one = {col: values[i:i + 1] for col, values in chunk["text"].items()}
+                try:
+                    y_pred = score_feature_columns(
+                        bulk_feature_columns(schema, one, {col: values[i:i + 1] for col, values in chunk["numeric"].items()}),
+                        current)
+                    yields[i] = round(float(y_pred[0]), 2)
+                except Exception as e:
+                    yields[i] = f"Prediction failed: {e}"
+    return result_records(chunk, yields)
+
+
+class BulkRun:
+    """Scores a CSV file object chunk by chunk, yielding output text and keeping progress totals."""
+
+    def __init__(self, writer: ResultWriter, chunk_rows: int = BULK_CHUNK_ROWS, total_bytes: int = None,
+                 on_progress=None):
+        self.writer = writer
+        self.on_progress = on_progress  # called with the totals after every chunk
+        self.parser = ChunkParser(chunk_rows)
+        self.splitter = LineSplitter()
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.current = None
+        self.started = time.perf_counter()
+
+    def read_header(self, f, block_bytes: int = 65536) -> list[dict]:
+        """Read until the header is parsed (raises BulkInputError for an unusable CSV); returns any complete chunks."""
+        chunks = []
+        while self.parser.header is None:
+            data = f.read(block_bytes)
+            if not data:
+                return self.parser.add_lines(self.splitter.close()) + self.parser.finish()
+            self.bytes_read += len(data)
+            chunks += self.parser.add_lines(self.splitter.feed(data))
+        return chunks
+
+    def iter_output(self, f, pending: list[dict] = (), block_bytes: int = 1 << 20):
+        self.current = current_model()  # one model version for the whole file
+        yield self.writer.header()
+        try:
+            for chunk in pending:
+                yield self.render(chunk)
+            for data in iter(lambda: f.read(block_bytes), b""):
+                self.bytes_read += len(data)
+                for chunk in self.parser.add_lines(self.splitter.feed(data)):
+                    yield self.render(chunk)
+            for chunk in self.parser.add_lines(self.splitter.close()) + self.parser.finish():
+                yield self.render(chunk)
+        except BulkInputError as e:
+            yield self.writer.event("error", {"detail": str(e)})
+            return
+        yield self.writer.event("summary", {**self.totals(), "schema": self.parser.schema, "model_version": self.current.version})
+
+    def render(self, chunk: dict) -> str:
+        records = score_chunk(self.parser.schema, chunk, self.current)
+        n_failed = sum(1 for r in records if "error" in r)
+        self.failed += n_failed
+        self.succeeded += len(records) - n_failed
+        totals = self.totals()
+        if self.on_progress is not None:
+            self.on_progress(totals)
+        return self.writer.records(records) + self.writer.event("progress", totals)
+
+    def totals(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        rows = self.succeeded + self.failed
+        totals = {"rows": rows, "succeeded": self.succeeded, "failed": self.failed, "bytes_read": self.bytes_read,
+                  "elapsed_seconds": round(elapsed, 3), "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else None}
+        if self.total_bytes:
+            totals["percent"] = round(100.0 * self.bytes_read / self.total_bytes, 1)
+        return totals
+
+
+def spooled_body_iter(f, run: BulkRun, pending: list[dict]):
+    try:
+        yield from run.iter_output(f, pending)
+    finally:
+        f.close()
+
+
+@app.post("/api/predict/csv")
+async def predict_csv(request: Request, format: str = "ndjson", chunk_rows: int = BULK_CHUNK_ROWS):
+    """Score a CSV request body chunk by chunk, streaming results as NDJSON or CSV.
+
+    Progress lines follow every chunk and a summary line ends the stream (in CSV output
+    they are `#` comment lines). Rows that fail validation get an `error` instead of a
+    `yield`; the rest of the file is still scored.
+    """
+    try:
+        writer = ResultWriter(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not 1 <= chunk_rows <= MAX_BULK_CHUNK_ROWS:
+        raise HTTPException(status_code=400, detail=f"chunk_rows must be between 1 and {MAX_BULK_CHUNK_ROWS}")
+    current_model()  # 503 now rather than after the upload
+
+    # Most HTTP clients only read the response once they have sent the whole body, so
+    # results cannot be streamed back while the upload is still coming in. The body is
+    # spooled (in memory up to BULK_SPOOL_MEMORY_BYTES, then on disk) and scored from there.
+    spool = tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_MEMORY_BYTES)
+    try:
+        async for data in request.stream():
+            spool.write(data)
+        total_bytes = spool.tell()
+        spool.seek(0)
+
+        run = BulkRun(writer, chunk_rows, total_bytes)
+        pending = await run_in_threadpool(run.read_header, spool)
+    except BulkInputError as e:
+        spool.close()
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        spool.close()
+        raise
+
+    # A sync iterator: StreamingResponse runs each step (parse, score, format one chunk) in the threadpool
+    return StreamingResponse(spooled_body_iter(spool, run, pending), media_type=writer.media_type)
+
+
+def score_file(input_path: str, out, fmt: str = "ndjson", chunk_rows: int = BULK_CHUNK_ROWS):
+    """`python main.py score`: results to `out`, progress to stderr."""
+    def report(totals: dict):
+        print(f"  {totals['rows']} rows ({totals['percent']}%), {totals['failed']} failed, "
+              f"{totals['rows_per_second']} rows/s", file=sys.stderr)
+
+    run = BulkRun(ResultWriter(fmt), chunk_rows, os.path.getsize(input_path), on_progress=report)
+    with open(input_path, "rb") as f:
+        pending = run.read_header(f)
+        for text in run.iter_output(f, pending):
+            out.write(text)
+    totals = run.totals()
+    print(f"✅ Scored {totals['rows']} rows ({totals['failed']} failed) in {totals['elapsed_seconds']}s", file=sys.stderr)
+
+
+# Column order of training/tamil_nadu_rice_yield_dataset.csv with the served yield in place of the observed one,
+# followed by where each yield came from
+EXPORT_COLUMNS = ["year", "state", "district", "crop", "season", "area_ha", EXPORT_YIELD_COLUMN, "production_tonnes",
+                  "rainfall_mm", "max_temp_c", "min_temp_c", "irrigation_percent", "fertilizer_kg_per_ha",
+                  "source", "model_version"]
+
+
+def export_log(out, **filters) -> int:
+    """`python main.py export-log`: logged predictions as feature rows plus the served yield (a prediction, not a label)."""
+    import csv
+
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    exported = 0
+    for rows in read_rows(PREDICTION_LOG_PATH, **filters):
+        inputs = {field: np.asarray(rows[field], dtype=np.float64) for field in agronomy.INPUT_FIELDS}
+        columns = feature_columns(rows["district"], rows["season"], rows["year"], inputs)
+        n = len(rows["year"])
+        columns.update({"state": ["Tamil Nadu"] * n, "crop": ["Rice"] * n,
+                        EXPORT_YIELD_COLUMN: np.round(np.asarray(rows["yield"], dtype=np.float64), 2),
+                        "source": rows["source"], "model_version": rows["model_version"]})
+        values = [columns[col].tolist() if isinstance(columns[col], np.ndarray) else list(columns[col])
+                  for col in EXPORT_COLUMNS]
+        writer.writerows(zip(*values))
+        exported += n
+    return exported
+
+
+def parse_log_time(value: str) -> float:
+    # "2026-10-18" or "2026-10-18T06:30:00" (local time) -> Unix timestamp
+    from datetime import datetime
+    return datetime.fromisoformat(value).timestamp()
+
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import argparse
+    import contextlib
+
+    parser = argparse.ArgumentParser(description="Rice yield prediction API")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="run the API with uvicorn (default)")
+    score = commands.add_parser("score", help="score a CSV file in chunks")
+    score.add_argument("input", help="CSV in the PredictionRequest or training dataset schema")
+    score.add_argument("--out", help="output file (default: stdout)")
+    score.add_argument("--format", choices=sorted(ResultWriter.media_types), default="ndjson")
+    score.add_argument("--chunk-rows", type=int, default=BULK_CHUNK_ROWS)
+    export = commands.add_parser("export-log", help="export logged inputs in the training dataset's feature columns, "
+                                 f"with the served yield as {EXPORT_YIELD_COLUMN} (predictions, not observed yields)")
+    export.add_argument("--out", help="output CSV (default: stdout)")
+    export.add_argument("--since", type=parse_log_time, help="first timestamp, e.g. 2026-10-01")
+    export.add_argument("--until", type=parse_log_time, help="end timestamp (exclusive)")
+    export.add_argument("--district", help="district as the model sees it, e.g. Thanjavur")
+    export.add_argument("--season", help="training season category, e.g. Samba")
+    export.add_argument("--source", choices=["model", "surface", "heuristic", "all"], default="model",
+                        help="only yields from this source (default: model; heuristic and surface answers are approximations)")
+    args = parser.parse_args()
+
+    if args.command == "score":
+        # Keep stdout for results
+        with contextlib.redirect_stdout(sys.stderr):
+            load_model()
+        try:
+            with (open(args.out, "w", newline="") if args.out else contextlib.nullcontext(sys.stdout)) as out:
+                score_file(args.input, out, args.format, args.chunk_rows)
+        except BulkInputError as e:
+            sys.exit(f"❌ {e}")
+    elif args.command == "export-log":
+        if not PREDICTION_LOG_PATH or not os.path.exists(PREDICTION_LOG_PATH):
+            sys.exit(f"❌ No prediction log at {PREDICTION_LOG_PATH!r}")
+        with (open(args.out, "w", newline="") if args.out else contextlib.nullcontext(sys.stdout)) as out:
+            exported = export_log(out, since=args.since, until=args.until, district=args.district,
+                                  season=args.season, source=None if args.source == "all" else args.source)
+        print(f"✅ Exported {exported} logged predictions", file=sys.stderr)
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8000)
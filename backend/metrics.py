@@ -0,0 +1,172 @@
+"""
+metrics.py
+Low-overhead latency histograms and counters, rendered as Prometheus text.
+
+Hot-path code wraps each stage in `with metrics.stage("features"):`; that costs two
+perf_counter calls and one bucket increment. MetricsMiddleware times whole requests,
+counts them by route and status, and (optionally) reports the stages measured while
+serving a request in a `Server-Timing` response header.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; covers 50 µs cache hits up to multi-second batch calls
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Stage durations of the request being served (None outside a request)
+_request_stages = ContextVar("request_stages", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    def __init__(self, namespace: str, buckets=DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = buckets
+        self.stages = {}     # stage -> Histogram
+        self.requests = {}   # (method, route) -> Histogram
+        self.responses = {}  # (method, route, status) -> count
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def _histogram(self, table: dict, key) -> Histogram:
+        hist = table.get(key)
+        if hist is None:
+            with self._lock:
+                hist = table.setdefault(key, Histogram(self.buckets))
+        return hist
+
+    def observe_stage(self, name: str, seconds: float):
+        self._histogram(self.stages, name).observe(seconds)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(name, time.perf_counter() - started)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        self._histogram(self.requests, (method, route)).observe(seconds)
+        key = (method, route, status)
+        with self._lock:
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def add_collector(self, collect):
+        """Register fn() -> iterable of (name, type, help, [(labels dict, value), ...]) read at scrape time."""
+        self.collectors.append(collect)
+
+    def render(self) -> str:
+        ns = self.namespace
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {ns}_{name} {help_text}")
+            lines.append(f"# TYPE {ns}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{ns}_{name}{_labels(labels)} {_number(value)}")
+
+        def histograms(name, help_text, table, label_names):
+            lines.append(f"# HELP {ns}_{name} {help_text}")
+            lines.append(f"# TYPE {ns}_{name} histogram")
+            for key, hist in sorted(table.items()):
+                labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+                counts, total, count = hist.snapshot()
+                cumulative = 0
+                for bound, n in zip(hist.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    lines.append(f"{ns}_{name}_bucket{_labels({**labels, 'le': _number(float(bound))})} {cumulative}")
+                lines.append(f"{ns}_{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{ns}_{name}_count{_labels(labels)} {count}")
+
+        histograms("stage_seconds", "Time spent in each prediction stage", self.stages, ("stage",))
+        histograms("request_seconds", "HTTP request latency", self.requests, ("method", "route"))
+        with self._lock:
+            responses = sorted(self.responses.items())
+        family("requests_total", "counter", "HTTP requests served",
+               [({"method": m, "route": r, "status": s}, n) for (m, r, s), n in responses])
+
+        for collect in self.collectors:
+            for name, kind, help_text, samples in collect():
+                family(name, kind, help_text, samples)
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request latency/count per route, plus an optional Server-Timing header."""
+
+    def __init__(self, app, metrics: Metrics, server_timing: bool = False):
+        self.app = app
+        self.metrics = metrics
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages = {}
+        token = _request_stages.set(stages)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    timings = [f"{name};dur={seconds * 1000.0:.3f}" for name, seconds in stages.items()]
+                    timings.append(f"total;dur={(time.perf_counter() - started) * 1000.0:.3f}")
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", ", ".join(timings).encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stages.reset(token)
+            # Label by route template, not the raw path, to keep the series count bounded
+            route = scope.get("route")
+            self.metrics.observe_request(scope["method"], getattr(route, "path", "unmatched"),
+                                         status, time.perf_counter() - started)
@@ -0,0 +1,130 @@
+"""
+micro_batch.py
+Coalesce concurrent single predictions into one model call.
+
+Callers `await batcher.submit(item)`; a collector task gathers items for at most
+`max_wait_ms` (or until `max_batch_size` items are queued), runs `score_fn(items)`
+once on a dedicated worker thread and resolves each caller's future with its own
+result. While a batch is being scored new items keep queueing, so under load
+batches form without any extra waiting. The collector only holds a batch open for
+`max_wait_ms` when the previous batch showed concurrent traffic, so a lone request
+is never delayed.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class MicroBatcher:
+    def __init__(self, score_fn, max_wait_ms: float = 2.0, max_batch_size: int = 64):
+        self.score_fn = score_fn  # list of items -> list of results, same order
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue = None
+        self._task = None
+        # One scoring thread: batches never contend with each other for the model
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="micro-batch")
+
+        self._last_batch_size = 0
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the collector on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Fail anything still queued rather than leaving callers hanging
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            wait = self.max_wait if self._last_batch_size > 1 else 0.0
+            deadline = loop.time() + wait
+
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._run(loop, batch)
+
+    async def _run(self, loop, batch):
+        # Callers that gave up while queued (disconnect, latency budget) are not scored
+        batch = [pair for pair in batch if not pair[1].done()]
+        if not batch:
+            return
+        self._last_batch_size = len(batch)
+        items = [item for item, _ in batch]
+        started = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(self._executor, self.score_fn, items)
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            # Score the items one by one so a single bad item only fails its own caller
+            for pair in batch:
+                await self._run(loop, [pair])
+            return
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for (_, future), result in zip(batch, results):
+            # The caller may have gone away (client disconnect cancels the request task)
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "busy_seconds": round(self.busy_seconds, 4),
+        }
@@ -0,0 +1,265 @@
+"""
+model_registry.py
+Versioned model artifacts on disk, and the in-memory object the server swaps between.
+
+Layout (default backend/models, override with MODEL_REGISTRY_DIR):
+
+    models/
+      ACTIVE                         version id the server should serve (absent: the unversioned files)
+      20261018-101500/
+        metadata.json                version, created_at, metrics, feature list, files
+        profile.json                 training stage timings and inference latency (training/profiler.py)
+        drift_reference.json         training-data sketches for drift monitoring (drift.py)
+        rice_yield_model_xgb.pkl     sklearn pipeline
+        rice_yield_model_xgb.ubj     native booster (see native_model.py)
+        rice_yield_model_preprocess.json
+        rice_yield_model_trees.npz   flattened trees for MODEL_FORMAT=trees (see tree_ensemble.py)
+
+A version directory is written under a temporary name and renamed into place, and
+ACTIVE is replaced atomically, so a server polling the registry never sees a
+half-written version.
+"""
+
+import json
+import os
+import shutil
+import time
+
+PICKLE_FILE = "rice_yield_model_xgb.pkl"
+BOOSTER_FILE = "rice_yield_model_xgb.ubj"
+SPEC_FILE = "rice_yield_model_preprocess.json"
+TREES_FILE = "rice_yield_model_trees.npz"
+METADATA_FILE = "metadata.json"
+PROFILE_FILE = "profile.json"
+DRIFT_FILE = "drift_reference.json"
+ACTIVE_FILE = "ACTIVE"
+
+# Columns main.feature_columns builds for every request; a model reading any other column cannot be served
+SERVED_FEATURES = ("year", "district", "season", "area_ha", "production_tonnes", "rainfall_mm",
+                   "max_temp_c", "min_temp_c", "irrigation_percent", "fertilizer_kg_per_ha")
+
+
+def artifact_paths(directory: str) -> dict:
+    """Where each serving format lives inside a version (or the legacy backend) directory."""
+    return {
+        "pickle": os.path.join(directory, PICKLE_FILE),
+        "booster": os.path.join(directory, BOOSTER_FILE),
+        "spec": os.path.join(directory, SPEC_FILE),
+        "trees": os.path.join(directory, TREES_FILE),
+    }
+
+
+def unservable_features(features) -> list:
+    return [col for col in features if col not in SERVED_FEATURES]
+
+
+def check_servable(features, version: str):
+    missing = unservable_features(features)
+    if missing:
+        shown = ", ".join(missing[:5]) + (f" (+{len(missing) - 5} more)" if len(missing) > 5 else "")
+        raise ValueError(f"Model version {version} reads columns the server does not send: {shown}")
+
+
+def version_dir(registry_dir: str, version: str) -> str:
+    # Version ids are directory names; refuse anything that could escape the registry
+    if not version or os.path.basename(version) != version or version.startswith("."):
+        raise ValueError(f"Invalid model version: {version!r}")
+    return os.path.join(registry_dir, version)
+
+
+def read_metadata(registry_dir: str, version: str) -> dict:
+    path = os.path.join(version_dir(registry_dir, version), METADATA_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model version {version} not found in {registry_dir}")
+    with open(path) as f:
+        return json.load(f)
+
+
+def update_metadata(registry_dir: str, version: str, fields: dict) -> dict:
+    """Merge `fields` into a registered version's metadata (file list refreshed); returns the metadata."""
+    metadata = read_metadata(registry_dir, version)
+    metadata.update(fields)
+    directory = version_dir(registry_dir, version)
+    metadata["files"] = sorted(name for name in os.listdir(directory) if not name.startswith("."))
+    tmp_path = os.path.join(directory, f".{METADATA_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(metadata, f, indent=2, default=str)
+    os.replace(tmp_path, os.path.join(directory, METADATA_FILE))
+    return metadata
+
+
+def list_versions(registry_dir: str) -> list[dict]:
+    """Metadata of every complete version, oldest first."""
+    if not os.path.isdir(registry_dir):
+        return []
+    versions = []
+    for name in sorted(os.listdir(registry_dir)):
+        if name.startswith(".") or not os.path.exists(os.path.join(registry_dir, name, METADATA_FILE)):
+            continue
+        versions.append(read_metadata(registry_dir, name))
+    return versions
+
+
+def active_version(registry_dir: str):
+    path = os.path.join(registry_dir, ACTIVE_FILE)
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_active(registry_dir: str, version: str):
+    # Must exist, and must be a model the server can feed
+    check_servable(read_metadata(registry_dir, version).get("features", []), version)
+    tmp_path = os.path.join(registry_dir, f".{ACTIVE_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, os.path.join(registry_dir, ACTIVE_FILE))
+
+
+def clear_active(registry_dir: str):
+    # Without ACTIVE the server serves the unversioned files next to main.py ("local")
+    try:
+        os.remove(os.path.join(registry_dir, ACTIVE_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def new_version_id(registry_dir: str) -> str:
+    version = time.strftime("%Y%m%d-%H%M%S")
+    suffix = 1
+    candidate = version
+    while os.path.exists(os.path.join(registry_dir, candidate)):
+        suffix += 1
+        candidate = f"{version}-{suffix}"
+    return candidate
+
+
+def register_version(registry_dir: str, pipeline, metrics: dict = None, extra: dict = None,
+                     activate: bool = True, documents: dict = None) -> dict:
+    """Save a fitted pipeline as a new version (pickle, native files, exported trees, metadata); returns the metadata.
+
+    `documents` maps file names to JSON-serialisable objects stored alongside (e.g. DRIFT_FILE).
+    """
+    import joblib
+
+    from native_model import save_native
+    from tree_ensemble import export_pipeline
+
+    os.makedirs(registry_dir, exist_ok=True)
+    version = new_version_id(registry_dir)
+    staging = os.path.join(registry_dir, f".{version}.partial")
+    os.makedirs(staging)
+
+    try:
+        paths = artifact_paths(staging)
+        joblib.dump(pipeline, paths["pickle"])
+        spec = save_native(pipeline, paths["booster"], paths["spec"])
+        export_pipeline(pipeline, paths["trees"])
+        for name, document in (documents or {}).items():
+            with open(os.path.join(staging, name), "w") as f:
+                json.dump(document, f, indent=2)
+
+        metadata = {
+            "version": version,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "metrics": metrics or {},
+            "features": list(pipeline.named_steps["preprocessor"].feature_names_in_),
+            "n_encoded_features": spec["n_features"],
+            "files": sorted(os.listdir(staging)),
+        }
+        metadata.update(extra or {})
+        with open(os.path.join(staging, METADATA_FILE), "w") as f:
+            json.dump(metadata, f, indent=2, default=str)
+
+        os.rename(staging, version_dir(registry_dir, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if activate:
+        set_active(registry_dir, version)
+    return metadata
+
+
+class ServingModel:
+    """One loaded, warmed model version.
+
+    The server holds a single reference to the current ServingModel and replaces it in
+    one assignment, so a request that already picked up a model finishes on it even if
+    another version is activated meanwhile.
+    """
+
+    def __init__(self, version, model_format, path, pipeline=None, encoder=None, regressor=None, metadata=None):
+        self.version = version
+        self.model_format = model_format
+        self.path = path
+        self.pipeline = pipeline    # full sklearn pipeline, only when the encoder could not be compiled
+        self.encoder = encoder
+        self.regressor = regressor
+        self.metadata = metadata or {}
+        self.loaded_at = time.time()
+
+    def encode(self, columns: dict):
+        # Column-oriented feature data -> model input (a DataFrame when falling back to the full pipeline)
+        if self.encoder is None:
+            import pandas as pd
+            return pd.DataFrame(columns)
+        first = next(iter(columns.values()))
+        if len(first) == 1:
+            return self.encoder.transform_row({col: values[0] for col, values in columns.items()})
+        return self.encoder.transform(columns)
+
+    def features(self) -> list:
+        # Raw input columns the model reads
+        if self.metadata.get("features"):
+            return list(self.metadata["features"])
+        if self.encoder is not None:
+            return self.encoder.numeric_cols + self.encoder.categorical_cols
+        return list(self.pipeline.named_steps["preprocessor"].feature_names_in_)
+
+    def predict_encoded(self, X):
+        if self.encoder is None:
+            return self.pipeline.predict(X)
+        return self.regressor.predict(X)
+
+    def predict(self, columns: dict):
+        # Raw model output for column-oriented feature data
+        return self.predict_encoded(self.encode(columns))
+
+    def booster(self):
+        """(xgboost Booster, iteration_range) behind this model, or None (exported trees, sklearn fallback)."""
+        if self.encoder is None:
+            return None
+        if hasattr(self.regressor, "iteration_range"):  # NativeRegressor
+            return self.regressor.booster, self.regressor.iteration_range
+        if hasattr(self.regressor, "get_booster"):  # XGBRegressor
+            best_iteration = getattr(self.regressor, "best_iteration", None)
+            return self.regressor.get_booster(), (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+        return None
+
+    def contributions(self, columns: dict, approximate: bool = False):
+        """Per-feature contributions (XGBoost's TreeSHAP) in the encoded feature space, bias last.
+
+        Each row sums to the raw model output for that row. `approximate` uses XGBoost's
+        path-based (Saabas) attribution instead, which is several times faster.
+        """
+        import xgboost
+
+        found = self.booster()
+        if found is None:
+            raise NotImplementedError(f"Model format '{self.model_format}' has no XGBoost booster to explain")
+        booster, iteration_range = found
+        X = self.encoder.transform(columns)
+        return booster.predict(xgboost.DMatrix(X), pred_contribs=True, approx_contribs=approximate,
+                               iteration_range=iteration_range)
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "format": self.model_format,
+            "path": self.path,
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.loaded_at)),
+            "metrics": self.metadata.get("metrics", {}),
+        }
@@ -0,0 +1,82 @@
+"""
+native_model.py
+Save and load the trained pipeline as a native XGBoost booster file plus a small
+JSON preprocessing spec, so serving never unpickles sklearn objects.
+
+- rice_yield_model_xgb.ubj        booster in UBJSON (or .json) via Booster.save_model
+- rice_yield_model_preprocess.json compiled encoder spec (see fast_encoder.CompiledEncoder)
+
+Export from an existing pickle:
+    python native_model.py --model rice_yield_model_xgb.pkl
+"""
+
+import json
+import os
+
+from fast_encoder import CompiledEncoder
+
+SPEC_FORMAT_VERSION = 1
+
+
+def save_native(pipeline, booster_path: str, spec_path: str) -> dict:
+    """Write the pipeline's booster and preprocessing spec; returns the spec."""
+    booster = pipeline.named_steps["regressor"].get_booster()
+    booster.save_model(booster_path)
+
+    encoder = CompiledEncoder.from_pipeline(pipeline)
+    spec = {
+        "format_version": SPEC_FORMAT_VERSION,
+        "booster_file": os.path.basename(booster_path),
+        "n_features": encoder.n_features,
+        # XGBRegressor.predict stops at the best iteration after early stopping
+        "best_iteration": booster.attr("best_iteration"),
+        "encoder": encoder.to_spec(),
+    }
+    with open(spec_path, "w") as f:
+        json.dump(spec, f, indent=2)
+    return spec
+
+
+class NativeRegressor:
+    """Thin predict() wrapper around an xgboost Booster, mirroring XGBRegressor.predict."""
+
+    def __init__(self, booster, best_iteration=None):
+        self.booster = booster
+        self.iteration_range = (0, int(best_iteration) + 1) if best_iteration is not None else (0, 0)
+
+    def predict(self, X):
+        # inplace_predict skips DMatrix construction for dense NumPy input
+        return self.booster.inplace_predict(X, iteration_range=self.iteration_range)
+
+
+def load_native(booster_path: str, spec_path: str):
+    """Returns (NativeRegressor, CompiledEncoder); imports xgboost but not sklearn or joblib."""
+    import xgboost
+
+    with open(spec_path) as f:
+        spec = json.load(f)
+    if spec.get("format_version") != SPEC_FORMAT_VERSION:
+        raise ValueError(f"Unsupported preprocessing spec version: {spec.get('format_version')}")
+
+    booster = xgboost.Booster()
+    booster.load_model(booster_path)
+    encoder = CompiledEncoder.from_spec(spec["encoder"])
+    if booster.num_features() != encoder.n_features:
+        raise ValueError(f"Booster expects {booster.num_features()} features, spec encodes {encoder.n_features}")
+    return NativeRegressor(booster, spec.get("best_iteration")), encoder
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import joblib
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Export the trained pipeline to native XGBoost + JSON spec")
+    parser.add_argument("--model", default=os.path.join(here, "rice_yield_model_xgb.pkl"))
+    parser.add_argument("--booster", default=os.path.join(here, "rice_yield_model_xgb.ubj"))
+    parser.add_argument("--spec", default=os.path.join(here, "rice_yield_model_preprocess.json"))
+    args = parser.parse_args()
+
+    spec = save_native(joblib.load(args.model), args.booster, args.spec)
+    print(f"✅ Saved booster to {args.booster} and preprocessing spec ({spec['n_features']} features) to {args.spec}")
@@ -0,0 +1,123 @@
+"""
+prediction_cache.py
+Bounded in-process cache for model predictions.
+
+Entries are evicted least-recently-used once `maxsize` is reached and expire after
+`ttl` seconds. The whole cache is dropped when the watched model file changes
+(checked at most once every `check_interval` seconds).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    def __init__(self, maxsize: int = 4096, ttl: float = 3600.0, resolution: float = 0.1,
+                 watch_path: str = None, check_interval: float = 1.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.resolution = resolution
+        self.watch_path = watch_path
+        self.check_interval = check_interval
+
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._file_signature = self._signature()
+        self._next_check = time.monotonic() + check_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def quantize(self, value: float) -> float:
+        # Snap slider values onto the configured grid so near-identical requests share a key
+        if not self.resolution:
+            return value
+        return round(round(value / self.resolution) * self.resolution, 6)
+
+    def _signature(self):
+        if not self.watch_path:
+            return None
+        try:
+            st = os.stat(self.watch_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _check_watch_path(self, now: float):
+        if self.watch_path is None or now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        signature = self._signature()
+        if signature != self._file_signature:
+            self._file_signature = signature
+            self._entries.clear()
+            self.invalidations += 1
+
+    def watch(self, path: str):
+        """Start watching a (new) model file and drop everything cached for the old one."""
+        with self._lock:
+            self.watch_path = path
+            self._file_signature = self._signature()
+            self._entries.clear()
+            self.invalidations += 1
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._check_watch_path(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "resolution": self.resolution,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,184 @@
+"""
+prediction_log.py
+Write-behind log of served predictions in a local SQLite database.
+
+- record() only appends a tuple to an in-memory buffer under a lock: no disk I/O and no
+  SQLite call on the request path. When the buffer already holds `capacity` entries the
+  new entry is dropped and counted (`dropped`), so a stalled disk costs history, never
+  latency.
+- A background thread drains the buffer every `flush_seconds` (sooner once `batch_size`
+  entries are waiting) and writes each drain in one transaction. The database runs in
+  WAL mode, so readers (exports, analytics) do not block the writer; several gunicorn
+  workers can share one file.
+- Rows are indexed by district, season and timestamp.
+
+Districts are stored as the model sees them (normalized) and seasons as training season
+categories, so exports line up with the training data.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+
+COLUMNS = ("ts", "endpoint", "district", "season", "year", "temperature", "rainfall", "humidity",
+           "water", "fertilizer", "yield", "source", "model_version")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    endpoint TEXT NOT NULL,
+    district TEXT NOT NULL,
+    season TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    temperature REAL,
+    rainfall REAL,
+    humidity REAL,
+    water REAL,
+    fertilizer REAL,
+    yield REAL NOT NULL,
+    source TEXT NOT NULL,
+    model_version TEXT
+);
+CREATE INDEX IF NOT EXISTS predictions_district ON predictions (district);
+CREATE INDEX IF NOT EXISTS predictions_season ON predictions (season);
+CREATE INDEX IF NOT EXISTS predictions_ts ON predictions (ts);
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; a crash can only lose the last flushes
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class PredictionLog:
+    def __init__(self, path: str, capacity: int = 10000, flush_seconds: float = 1.0, batch_size: int = 1000):
+        self.path = path
+        self.capacity = capacity
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.flushes = 0
+        self.flush_seconds_total = 0.0
+        self.errors = 0
+        self.last_error = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def record(self, entries: list[tuple]):
+        """Queue rows (tuples in COLUMNS order); entries that do not fit in the buffer are dropped."""
+        with self._lock:
+            room = self.capacity - len(self._buffer)
+            if room < len(entries):
+                self.dropped += len(entries) - max(room, 0)
+                entries = entries[:max(room, 0)]
+            self._buffer.extend(entries)
+            self.recorded += len(entries)
+            pending = len(self._buffer)
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def start(self):
+        if self.running:
+            return
+        connect(self.path).close()  # create the schema now, so a bad path fails at startup
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Flush what is buffered and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        conn = connect(self.path)
+        try:
+            while not self._stop.is_set():
+                self._wake.wait(self.flush_seconds)
+                self._wake.clear()
+                self._flush(conn)
+            self._flush(conn)
+        finally:
+            conn.close()
+
+    def _flush(self, conn: sqlite3.Connection):
+        while True:
+            with self._lock:
+                if not self._buffer:
+                    return
+                n = len(self._buffer)
+                batch = [self._buffer.popleft() for _ in range(n)]
+            started = time.perf_counter()
+            try:
+                with conn:  # one transaction per drain
+                    conn.executemany(
+                        f"INSERT INTO predictions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", batch)
+            except sqlite3.Error as e:
+                # The batch is lost, like a drop; the writer keeps going
+                self.errors += 1
+                self.dropped += len(batch)
+                self.last_error = str(e)
+                print(f"⚠️ Prediction log flush failed ({len(batch)} rows dropped): {e}")
+                return
+            self.written += len(batch)
+            self.flushes += 1
+            self.flush_seconds_total += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "path": self.path,
+            "running": self.running,
+            "capacity": self.capacity,
+            "buffered": buffered,
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flush_seconds": round(self.flush_seconds_total, 4),
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+def read_rows(path: str, since: float = None, until: float = None, district: str = None, season: str = None,
+              source: str = None, chunk_rows: int = 10000):
+    """Logged rows (dicts of COLUMNS lists) matching the filters, oldest first, `chunk_rows` at a time."""
+    conditions, params = [], []
+    for column, op, value in (("ts", ">=", since), ("ts", "<", until), ("district", "=", district),
+                              ("season", "=", season), ("source", "=", source)):
+        if value is not None:
+            conditions.append(f"{column} {op} ?")
+            params.append(value)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM predictions{where} ORDER BY ts, id", params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                return
+            yield dict(zip(COLUMNS, (list(values) for values in zip(*rows))))
+    finally:
+        conn.close()
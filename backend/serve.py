@@ -0,0 +1,172 @@
+"""
+serve.py
+Production launcher for main.py: a gunicorn master that loads the model once and forks
+uvicorn workers sharing it copy-on-write.
+
+- The master imports main.py and loads the active model version before forking, then
+  gc.freeze()s everything allocated so far so the workers' garbage collector never
+  writes to (and so never copies) those pages. XGBoost's booster and the NumPy arrays
+  stay shared between workers; only per-worker state (caches, micro-batcher, metrics)
+  is private.
+- The model is warmed in each worker, not the master: predicting starts XGBoost's OpenMP
+  thread pool, which does not survive fork.
+- Worker count defaults to the CPUs available to the process (affinity and cgroup quota),
+  capped by how many workers fit in available memory. OMP_NUM_THREADS is set so that
+  workers x threads does not oversubscribe the CPUs.
+- Workers are recycled after SERVE_MAX_REQUESTS requests (with jitter so they do not all
+  restart together) and get SERVE_GRACEFUL_TIMEOUT seconds to finish in-flight requests.
+  A recycled worker is forked from the master again, so it starts on the preloaded model
+  instead of reading it from disk.
+
+    python serve.py                      # auto worker count, port $PORT or 8000
+    python serve.py --workers 4 --port 8080
+    python serve.py --print-plan         # show the worker/thread plan and exit
+
+Each worker has its own /metrics, prediction cache and /api/models state. A version
+activated through one worker reaches the others through the registry's ACTIVE file, so
+MODEL_REGISTRY_POLL_SECONDS defaults to 5 here when more than one worker runs.
+"""
+
+import argparse
+import gc
+import os
+import resource
+import sys
+import time
+
+# ---------- Config ----------
+SERVE_HOST = os.environ.get("SERVE_HOST", "0.0.0.0")
+SERVE_PORT = int(os.environ.get("PORT", "8000"))
+# "auto" or a number; WEB_CONCURRENCY is the usual name platforms set for this
+SERVE_WORKERS = os.environ.get("SERVE_WORKERS", os.environ.get("WEB_CONCURRENCY", "auto"))
+# Private (non-shared) memory each worker needs on top of the shared model
+SERVE_WORKER_MEMORY_MB = float(os.environ.get("SERVE_WORKER_MEMORY_MB", "150"))
+SERVE_MEMORY_FRACTION = float(os.environ.get("SERVE_MEMORY_FRACTION", "0.8"))  # share of available memory workers may use
+SERVE_MAX_REQUESTS = int(os.environ.get("SERVE_MAX_REQUESTS", "10000"))  # 0 disables recycling
+SERVE_MAX_REQUESTS_JITTER = int(os.environ.get("SERVE_MAX_REQUESTS_JITTER", str(SERVE_MAX_REQUESTS // 10)))
+SERVE_GRACEFUL_TIMEOUT = int(os.environ.get("SERVE_GRACEFUL_TIMEOUT", "30"))
+SERVE_TIMEOUT = int(os.environ.get("SERVE_TIMEOUT", "60"))  # a worker silent for this long is restarted
+SERVE_WORKER_CLASS = "uvicorn_worker.UvicornWorker"
+
+
+def available_cpus() -> int:
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    # Container CPU quota (cgroup v2), e.g. "200000 100000" = 2 CPUs
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) // int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def available_memory_mb():
+    """Memory the workers may still use, or None when it cannot be determined."""
+    available = None
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        pass
+    # Container memory limit (cgroup v2)
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            limit = f.read().strip()
+        with open("/sys/fs/cgroup/memory.current") as f:
+            used = int(f.read())
+        if limit != "max":
+            remaining = (int(limit) - used) / 2**20
+            available = remaining if available is None else min(available, remaining)
+    except (OSError, ValueError):
+        pass
+    return available
+
+
+def worker_plan(workers: str = SERVE_WORKERS) -> dict:
+    cpus = available_cpus()
+    memory_mb = available_memory_mb()
+    by_memory = None
+    if memory_mb is not None:
+        by_memory = max(1, int(memory_mb * SERVE_MEMORY_FRACTION // SERVE_WORKER_MEMORY_MB))
+
+    if workers == "auto":
+        # Inference is CPU-bound, so one worker per CPU; more only adds context switching
+        count = cpus if by_memory is None else min(cpus, by_memory)
+    else:
+        count = int(workers)
+    return {
+        "workers": count,
+        "threads_per_worker": max(1, cpus // count),
+        "cpus": cpus,
+        "available_memory_mb": None if memory_mb is None else round(memory_mb),
+        "workers_fitting_in_memory": by_memory,
+    }
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def build_application(plan: dict, host: str, port: int):
+    from gunicorn.app.base import BaseApplication
+
+    # Must be set before xgboost (and its OpenMP runtime) is imported
+    os.environ.setdefault("OMP_NUM_THREADS", str(plan["threads_per_worker"]))
+    if plan["workers"] > 1:
+        os.environ.setdefault("MODEL_REGISTRY_POLL_SECONDS", "5")
+
+    before = rss_mb()
+    started = time.perf_counter()
+    import main
+    main.preload_model()
+    print(f"✅ Master loaded main.py and the model in {time.perf_counter() - started:.2f}s "
+          f"(+{rss_mb() - before:.0f} MB, shared with every worker)")
+
+    # Move everything allocated so far out of the collector's reach: a collection in a
+    # worker would otherwise write to these objects' headers and un-share their pages
+    gc.collect()
+    gc.freeze()
+
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": plan["workers"],
+        "worker_class": SERVE_WORKER_CLASS,
+        "preload_app": True,
+        "max_requests": SERVE_MAX_REQUESTS,
+        "max_requests_jitter": SERVE_MAX_REQUESTS_JITTER if SERVE_MAX_REQUESTS else 0,
+        "graceful_timeout": SERVE_GRACEFUL_TIMEOUT,
+        "timeout": SERVE_TIMEOUT,
+        "accesslog": None,
+    }
+
+    class PreloadedApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return main.app
+
+    return PreloadedApplication()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve main.py with preloaded, copy-on-write shared gunicorn workers")
+    parser.add_argument("--workers", default=SERVE_WORKERS, help='number of workers or "auto"')
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--print-plan", action="store_true", help="print the worker plan and exit")
+    args = parser.parse_args()
+
+    plan = worker_plan(args.workers)
+    print(f"Workers: {plan['workers']} x {plan['threads_per_worker']} thread(s) "
+          f"({plan['cpus']} CPUs, {plan['available_memory_mb']} MB available, "
+          f"{plan['workers_fitting_in_memory']} workers fit in memory)")
+    if args.print_plan:
+        sys.exit(0)
+    build_application(plan, args.host, args.port).run()
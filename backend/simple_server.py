@@ -1,13 +1,51 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
+import os
 import pandas as pd
 import numpy as np
 
+import agronomy
+from admission import Admission, AdmissionMiddleware
+from climate_store import ClimateStore
+from heuristic_model import heuristic_yield
+
+# ---------- Config ----------
+CLIMATE_DATA_PATH = os.getenv(
+    "CLIMATE_DATA_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "training", "Merged_TamilNaduRice_Climate_FULL.csv"),
+)
+CLIMATE_CACHE_CONTROL = os.getenv("CLIMATE_CACHE_CONTROL", "public, max-age=3600")
+# Concurrent /api/predict calls (0 disables the limit), queue length before 429, queue wait before 503
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "32"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "1000"))
+
 app = FastAPI()
 
+# Added before CORS so rejections still carry CORS headers
+admission = Admission(max_concurrent=ADMISSION_MAX_CONCURRENT, max_queue=ADMISSION_MAX_QUEUE,
+                      queue_timeout_ms=ADMISSION_QUEUE_TIMEOUT_MS)
+app.add_middleware(AdmissionMiddleware, admission=admission, paths=("/api/predict",))
+
 print("Using simplified prediction model based on agricultural parameters.")
 
+climate_store = None
+
+@app.on_event("startup")
+def load_climate_store():
+    global climate_store
+    if not os.path.exists(CLIMATE_DATA_PATH):
+        print(f"⚠️ Climate data not found at {CLIMATE_DATA_PATH}; /api/climate-data will use estimates")
+        return
+    try:
+        climate_store = ClimateStore.from_csv(CLIMATE_DATA_PATH)
+        print(f"✅ Climate data loaded: {len(climate_store.districts)} districts, "
+              f"{climate_store.years[0]}-{climate_store.years[-1]}")
+    except Exception as e:
+        print(f"❌ Failed to load climate data: {e}")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "*"],
@@ -30,8 +68,12 @@ class PredictionRequest(BaseModel):
 def health_check():
     return {"status": "ok"}
 
-@app.get("/api/climate-data")
-def get_climate_data(district: str = "thanjavur", season: str = "samba", year: int = 2024):
+@app.get("/api/admission/stats")
+def admission_stats():
+    return admission.stats()
+
+def estimated_climate(district: str, season: str, year: int):
+    """Hand-tuned climate profile for districts missing from the dataset."""
     district_factors = {
         'thanjavur': {'temp_adj': 0, 'rain_adj': 1.2, 'humidity_adj': 5},
         'nagapattinam': {'temp_adj': -1, 'rain_adj': 1.1, 'humidity_adj': 8},
@@ -51,6 +93,7 @@ def get_climate_data(district: str = "thanjavur", season: str = "samba", year: i
         "district": district.title(),
         "season": season.title(),
         "year": year,
+        "source": "estimated",
         "climate_metrics": {
             "avg_temperature": round(sum(adjusted_temps) / 12, 1),
             "total_rainfall": round(sum(adjusted_rainfall)),
@@ -61,115 +104,31 @@ def get_climate_data(district: str = "thanjavur", season: str = "samba", year: i
         }
     }
 
+@app.get("/api/climate-data")
+def get_climate_data(request: Request, district: str = "thanjavur", season: str = "samba", year: int = 2024):
+    if climate_store is None:
+        return estimated_climate(district, season, year)
+
+    body = climate_store.lookup(district, season, year)
+    if body is None:
+        return estimated_climate(district, season, year)
+
+    # Responses only change when the dataset does, so let browsers and proxies cache them
+    etag = climate_store.etag(district, season, year)
+    headers = {"ETag": etag, "Cache-Control": CLIMATE_CACHE_CONTROL}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
+
 @app.post("/api/predict")
 def predict(req: PredictionRequest):
     try:
-        base_yield = 2500
-        
-        if 25 <= req.temperature <= 30:
-            temp_factor = 1.0
-        elif req.temperature < 25:
-            temp_factor = 0.8 + (req.temperature - 20) * 0.04
-        else:
-            temp_factor = 1.0 - (req.temperature - 30) * 0.03
-        temp_factor = max(0.5, min(1.2, temp_factor))
-        
-        if 1000 <= req.rainfall <= 1800:
-            rain_factor = 1.0
-        elif req.rainfall < 1000:
-            rain_factor = 0.6 + (req.rainfall / 1000) * 0.4
-        else:
-            rain_factor = 1.0 - (req.rainfall - 1800) * 0.0002
-        rain_factor = max(0.4, min(1.3, rain_factor))
-        
-        if 70 <= req.humidity <= 85:
-            humidity_factor = 1.0
-        else:
-            humidity_factor = 1.0 - abs(req.humidity - 77.5) * 0.01
-        humidity_factor = max(0.7, min(1.1, humidity_factor))
-        
-        water_factor = 0.7 + (req.water / 100) * 0.4
-        water_factor = max(0.7, min(1.1, water_factor))
-        
-        fertilizer_factor = 0.8 + (req.fertilizer / 100) * 0.3
-        fertilizer_factor = max(0.8, min(1.2, fertilizer_factor))
-        
-        district_factors = {
-            'thanjavur': 1.2, 'nagapattinam': 1.15, 'tiruvarur': 1.1,
-            'cuddalore': 1.05, 'villupuram': 1.0, 'chengalpattu': 0.95,
-            'kanchipuram': 0.95, 'tiruvallur': 0.9, 'chennai': 0.85
-        }
-        district_factor = district_factors.get(req.district.lower(), 1.0)
-        
-        season_factors = {'kuruvai': 1.1, 'samba': 1.0, 'thaladi': 0.9}
-        season_factor = season_factors.get(req.season.lower(), 1.0)
-        
-        predicted_yield = (base_yield * temp_factor * rain_factor * 
-                         humidity_factor * water_factor * fertilizer_factor * 
-                         district_factor * season_factor)
-        
-        predicted_yield = max(1000, min(6000, predicted_yield))
-        
-        monthly_weights = [0.03, 0.04, 0.05, 0.08, 0.10, 0.13, 0.15, 0.14, 0.11, 0.07, 0.06, 0.04]
-        monthly_yield = [round(predicted_yield * w, 1) for w in monthly_weights]
-        
-        temp_score = max(0, min(100, 100 - abs(req.temperature - 28) * 3))
-        rain_score = max(0, min(100, min(req.rainfall / 15, 100)))
-        humidity_score = max(0, min(100, 100 - abs(req.humidity - 77) * 2))
-        water_score = max(0, min(100, req.water))
-        
-        suitability_score = int((temp_score + rain_score + humidity_score + water_score) / 4)
-        
-        drought_risk = "High" if req.rainfall < 800 and req.water < 60 else "Medium" if req.rainfall < 1200 else "Low"
-        heat_risk = "High" if req.temperature > 35 else "Medium" if req.temperature > 32 else "Low"
-        flood_risk = "High" if req.rainfall > 2500 else "Medium" if req.rainfall > 2000 else "Low"
-        water_risk = "High" if req.water < 30 else "Medium" if req.water < 60 else "Low"
-        
-        recommendations = []
-        if drought_risk != "Low":
-            recommendations.append("Consider drought-resistant varieties and efficient irrigation")
-        if heat_risk != "Low":
-            recommendations.append("Plan for heat stress management during flowering stage")
-        if flood_risk != "Low":
-            recommendations.append("Ensure proper drainage and avoid waterlogging")
-        if req.fertilizer < 40:
-            recommendations.append("Consider increasing fertilizer application based on soil test")
-        if not recommendations:
-            recommendations.append("Conditions are favorable for rice cultivation")
-        
-        return {
-            "yield": round(predicted_yield, 1),
-            "monthly_yield": monthly_yield,
-            "weather_analysis": {
-                "suitability_score": max(0, min(100, suitability_score)),
-                "factors": {
-                    "temperature": {
-                        "score": round(temp_score, 1), 
-                        "label": "Optimal" if temp_score > 80 else "Moderate" if temp_score > 60 else "Poor"
-                    },
-                    "rainfall": {
-                        "score": round(rain_score, 1), 
-                        "label": "Excellent" if rain_score > 90 else "Good" if rain_score > 70 else "Moderate"
-                    },
-                    "humidity": {
-                        "score": round(humidity_score, 1), 
-                        "label": "Favorable" if humidity_score > 75 else "Moderate" if humidity_score > 50 else "Poor"
-                    },
-                    "water": {
-                        "score": round(water_score, 1), 
-                        "label": "Secure" if water_score > 70 else "Limited" if water_score > 40 else "Critical"
-                    }
-                }
-            },
-            "risk": {
-                "drought": drought_risk,
-                "heat": heat_risk,
-                "flood": flood_risk,
-                "water": water_risk
-            },
-            "recommendations": recommendations
-        }
-        
+        predicted_yield = heuristic_yield(req)
+
+        return agronomy.build_responses(
+            agronomy.SIMPLE_SERVER_PROFILE, agronomy.inputs_from_requests([req]), [predicted_yield]
+        )[0]
+
     except Exception as e:
         print(f"Prediction error: {e}")
         return {
@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import random
 
+import agronomy
+
 app = FastAPI(title="Tamil Nadu Rice Yield Test API")
 
 app.add_middleware(
@@ -76,42 +78,16 @@ def predict(req: PredictionRequest):
     yield_value = yield_value * (0.9 + random.random() * 0.2)
     yield_value = max(1500, min(6000, yield_value))  # Clamp between realistic values
     
-    # Monthly distribution
-    monthly_weights = [0.03, 0.04, 0.05, 0.08, 0.10, 0.13, 0.15, 0.14, 0.11, 0.07, 0.06, 0.04]
-    monthly_yield = [round(yield_value * w, 2) for w in monthly_weights]
-    
-    # Weather analysis
-    temp_score = max(0, min(100, 100 - abs(req.temperature - 29) * 3))
-    rain_score = max(0, min(100, 100 - abs(req.rainfall - 1200) * 0.04))
-    humid_score = max(0, min(100, 100 - abs(req.humidity - 75) * 1.5))
-    water_score = req.water
-    
-    suitability = (temp_score + rain_score + humid_score + water_score) / 4
-    
-    return {
-        "yield": round(yield_value, 2),
-        "monthly_yield": monthly_yield,
-        "weather_analysis": {
-            "suitability_score": round(suitability, 1),
-            "factors": {
-                "temperature": {"score": round(temp_score, 1), "label": "Good" if temp_score > 70 else "Fair"},
-                "rainfall": {"score": round(rain_score, 1), "label": "Good" if rain_score > 70 else "Fair"},
-                "humidity": {"score": round(humid_score, 1), "label": "Good" if humid_score > 70 else "Fair"},
-                "water": {"score": round(water_score, 1), "label": "Good" if water_score > 70 else "Fair"}
-            }
-        },
-        "risk": {
-            "drought": "High" if req.rainfall < 600 else "Low",
-            "heat": "High" if req.temperature > 35 else "Low",
-            "flood": "High" if req.rainfall > 2000 else "Low",
-            "water": "High" if req.water < 40 else "Low"
-        },
-        "recommendations": [
-            f"Predicted yield: {round(yield_value, 2)} kg/ha based on your inputs",
-            "Adjust irrigation based on rainfall patterns",
-            "Monitor temperature during critical growth stages"
-        ]
-    }
+    # Monthly distribution, weather analysis and risk via the shared engine
+    response = agronomy.build_responses(
+        agronomy.SIMPLE_TEST_PROFILE, agronomy.inputs_from_requests([req]), [yield_value]
+    )[0]
+    response["recommendations"] = [
+        f"Predicted yield: {round(yield_value, 2)} kg/ha based on your inputs",
+        "Adjust irrigation based on rainfall patterns",
+        "Monitor temperature during critical growth stages"
+    ]
+    return response
 
 if __name__ == "__main__":
     import uvicorn
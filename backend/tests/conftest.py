@@ -0,0 +1,70 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("PREDICTION_LOG_PATH", "")  # main.py: no SQLite log next to the code
+
+DISTRICTS = ["Chennai", "Thanjavur", "Madurai", "Coimbatore", "Tiruvarur"]
+SEASONS = ["Kuruvai", "Samba", "Navarai"]
+
+
+def served_frame(n_rows: int = 400, seed: int = 0) -> tuple[pd.DataFrame, np.ndarray]:
+    """Synthetic rows in the served schema (model_registry.SERVED_FEATURES minus production_tonnes) and yields."""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        "year": rng.integers(1990, 2024, n_rows),
+        "district": rng.choice(DISTRICTS, n_rows),
+        "season": rng.choice(SEASONS, n_rows),
+        "area_ha": rng.uniform(5000, 80000, n_rows),
+        "rainfall_mm": rng.uniform(300, 1800, n_rows),
+        "max_temp_c": rng.uniform(28, 40, n_rows),
+        "min_temp_c": rng.uniform(18, 27, n_rows),
+        "irrigation_percent": rng.uniform(20, 100, n_rows),
+        "fertilizer_kg_per_ha": rng.uniform(50, 250, n_rows),
+    })
+    y = (3000 + 0.8 * X["rainfall_mm"] - 40 * (X["max_temp_c"] - 32) ** 2 + 8 * X["irrigation_percent"]
+         + X["district"].map(dict(zip(DISTRICTS, [0, 400, -200, 150, 300]))) + rng.normal(0, 100, n_rows))
+    return X, y.to_numpy()
+
+
+def fit_pipeline(X: pd.DataFrame, y, n_estimators: int = 40, seed: int = 0):
+    """A pipeline with train.py's layout: imputed, scaled numerics and one-hot categoricals into XGBoost."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+    from xgboost import XGBRegressor
+
+    numeric_cols = X.select_dtypes(include=np.number).columns.tolist()
+    categorical_cols = X.select_dtypes(exclude=np.number).columns.tolist()
+    preprocessor = ColumnTransformer([
+        ("num", Pipeline([("imputer", SimpleImputer(strategy="median")), ("scaler", StandardScaler())]), numeric_cols),
+        ("cat", Pipeline([("imputer", SimpleImputer(strategy="most_frequent")),
+                          ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=False))]), categorical_cols),
+    ])
+    pipeline = Pipeline([
+        ("preprocessor", preprocessor),
+        ("regressor", XGBRegressor(objective="reg:squarederror", tree_method="hist", n_estimators=n_estimators,
+                                   max_depth=4, random_state=seed, n_jobs=1)),
+    ])
+    return pipeline.fit(X, y)
+
+
+@pytest.fixture(scope="session")
+def served_data():
+    return served_frame()
+
+
+@pytest.fixture(scope="session")
+def pipeline(served_data):
+    return fit_pipeline(*served_data)
+
+
+def as_columns(frame: pd.DataFrame) -> dict:
+    # The column dict main.feature_columns builds: numeric arrays, categorical lists
+    return {col: frame[col].to_numpy() if frame[col].dtype.kind in "biuf" else frame[col].tolist()
+            for col in frame.columns}
@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from admission import Admission, AdmissionMiddleware
+
+
+def make_app(admission: Admission, sleep_seconds: float = 0.3) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, admission=admission, paths=["/sync", "/async"])
+
+    @app.get("/sync")
+    def sync_route():
+        time.sleep(sleep_seconds)  # runs in the threadpool, cannot be cancelled
+        return {"ok": True}
+
+    @app.get("/async")
+    async def async_route():
+        await asyncio.sleep(sleep_seconds)
+        return {"ok": True}
+
+    @app.get("/free")
+    def free_route():
+        return {"ok": True}
+
+    return app
+
+
+def run(app, scenario):
+    # scenario(client) runs on one event loop against the app, as requests to a single worker would
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+def test_full_queue_is_rejected_with_429():
+    admission = Admission(max_concurrent=1, max_queue=1, queue_timeout_ms=5000)
+    app = make_app(admission)
+
+    async def scenario(client):
+        return await asyncio.gather(*(client.get("/async") for _ in range(3)))
+
+    responses = run(app, scenario)
+    assert sorted(r.status_code for r in responses) == [200, 200, 429]
+    assert admission.rejected["queue_full"] == 1
+    assert int(next(r for r in responses if r.status_code == 429).headers["retry-after"]) >= 1
+
+
+def test_queue_deadline_is_rejected_with_503():
+    admission = Admission(max_concurrent=1, max_queue=4, queue_timeout_ms=50)
+    app = make_app(admission)
+
+    async def scenario(client):
+        return await asyncio.gather(client.get("/async"), client.get("/async"))
+
+    responses = run(app, scenario)
+    assert sorted(r.status_code for r in responses) == [200, 503]
+    assert next(r for r in responses if r.status_code == 503).json()["reason"] == "deadline"
+    assert admission.rejected["deadline"] == 1
+    assert admission.active == 0
+
+
+def test_client_deadline_answers_503_but_holds_the_slot_until_sync_work_ends():
+    admission = Admission(max_concurrent=1, max_queue=4, queue_timeout_ms=5000)
+    app = make_app(admission, sleep_seconds=0.5)
+
+    async def scenario(client):
+        started = time.perf_counter()
+        late = await client.get("/sync", headers={"X-Request-Timeout-Ms": "50"})
+        answered = time.perf_counter() - started
+        held = admission.active
+        follow_up = await client.get("/sync")
+        return late, answered, held, follow_up, time.perf_counter() - started
+
+    late, answered, held, follow_up, total = run(app, scenario)
+    assert late.status_code == 503 and late.json()["reason"] == "timed_out"
+    assert answered < 0.4
+    assert held == 1  # the abandoned thread still runs
+    assert follow_up.status_code == 200
+    assert total >= 0.9  # the next request waited for the first one's thread
+    assert admission.rejected["timed_out"] == 1
+    assert admission.active == 0
+
+
+def test_client_deadline_covers_async_routes():
+    admission = Admission(max_concurrent=2, max_queue=4, queue_timeout_ms=5000)
+    app = make_app(admission)
+
+    async def scenario(client):
+        late = await client.get("/async", headers={"X-Request-Timeout-Ms": "20"})
+        in_time = await client.get("/async", headers={"X-Request-Timeout-Ms": "5000"})
+        await asyncio.sleep(0.4)
+        return late, in_time
+
+    late, in_time = run(app, scenario)
+    assert late.status_code == 503
+    assert in_time.status_code == 200
+    assert admission.active == 0
+
+
+def test_other_paths_bypass_admission():
+    admission = Admission(max_concurrent=1, max_queue=0, queue_timeout_ms=10)
+    app = make_app(admission)
+
+    async def scenario(client):
+        return await asyncio.gather(client.get("/async"), *(client.get("/free") for _ in range(5)))
+
+    assert all(r.status_code == 200 for r in run(app, scenario))
+    assert admission.admitted == 1
@@ -0,0 +1,75 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from drift import DriftMonitor, build_reference, psi, psi_status
+
+
+def test_psi_of_identical_distributions_is_zero():
+    assert psi([0.25, 0.25, 0.5], [0.25, 0.25, 0.5]) == pytest.approx(0.0)
+
+
+def test_psi_matches_hand_computed_value():
+    expected, observed = [0.5, 0.5], [0.8, 0.2]
+    by_hand = (0.8 - 0.5) * math.log(0.8 / 0.5) + (0.2 - 0.5) * math.log(0.2 / 0.5)
+    assert psi(expected, observed) == pytest.approx(by_hand)
+    assert psi(expected, observed) == pytest.approx(0.4158883, abs=1e-6)
+    assert psi_status(psi(expected, observed)) == "significant"
+
+
+def test_psi_floors_empty_bins():
+    # A bin seen on one side only scores high instead of infinite
+    score = psi([0.5, 0.5, 0.0], [0.4, 0.4, 0.2])
+    assert math.isfinite(score) and score > 1.0
+
+
+def test_psi_thresholds():
+    assert psi_status(0.05) == "stable"
+    assert psi_status(0.1) == "moderate"
+    assert psi_status(0.3) == "significant"
+
+
+def uniform_reference(n_rows: int = 10000, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "max_temp_c": rng.uniform(20, 40, n_rows),
+        "rainfall_mm": rng.uniform(0, 2000, n_rows),
+        "irrigation_percent": rng.uniform(0, 100, n_rows),
+        "fertilizer_kg_per_ha": rng.uniform(50, 250, n_rows),
+        "district": rng.choice(["Chennai", "Madurai"], n_rows),
+        "season": rng.choice(["Kuruvai", "Samba"], n_rows),
+    })
+    return build_reference(frame)
+
+
+def test_monitor_reports_stable_for_the_reference_distribution():
+    monitor = DriftMonitor(uniform_reference(), window=5000)
+    rng = np.random.default_rng(1)
+    for _ in range(4000):
+        monitor.observe(rng.choice(["Chennai", "Madurai"]), rng.choice(["Kuruvai", "Samba"]),
+                        (rng.uniform(20, 40), rng.uniform(0, 2000), None, rng.uniform(0, 100), rng.uniform(50, 250)))
+    features = monitor.report()["features"]
+    for field in ("temperature", "rainfall", "water", "fertilizer", "district", "season"):
+        assert features[field]["psi"] < 0.1, field
+        assert features[field]["status"] == "stable"
+    assert features["humidity"]["status"] == "no_reference"
+
+
+def test_monitor_flags_a_shifted_distribution():
+    monitor = DriftMonitor(uniform_reference(), window=5000)
+    rng = np.random.default_rng(2)
+    for _ in range(2000):
+        # Hotter than anything in training, otherwise unchanged
+        monitor.observe("Chennai" if rng.random() < 0.5 else "Madurai", "Samba" if rng.random() < 0.5 else "Kuruvai",
+                        (rng.uniform(35, 45), rng.uniform(0, 2000), None, rng.uniform(0, 100), rng.uniform(50, 250)))
+    features = monitor.report()["features"]
+    assert features["temperature"]["status"] == "significant"
+    assert features["rainfall"]["status"] == "stable"
+
+
+def test_reference_needs_served_columns():
+    merged = pd.DataFrame({"Avg_Temperature_C": [30.0, 31.0], "District_yield": ["Chennai", "Madurai"]})
+    with pytest.raises(ValueError, match="served-schema"):
+        build_reference(merged)
@@ -0,0 +1,47 @@
+import numpy as np
+
+from conftest import as_columns
+from fast_encoder import CompiledEncoder
+
+
+def test_transform_matches_column_transformer(pipeline, served_data):
+    X, _ = served_data
+    preprocessor = pipeline.named_steps["preprocessor"]
+    encoder = CompiledEncoder.from_preprocessor(preprocessor)
+
+    expected = np.asarray(preprocessor.transform(X), dtype=np.float64)
+    assert encoder.n_features == expected.shape[1]
+    np.testing.assert_allclose(encoder.transform(as_columns(X)), expected, rtol=1e-6, atol=1e-9)
+
+
+def test_transform_row_matches_column_transformer(pipeline, served_data):
+    X, _ = served_data
+    preprocessor = pipeline.named_steps["preprocessor"]
+    encoder = CompiledEncoder.from_preprocessor(preprocessor)
+
+    for i in range(5):
+        row = X.iloc[[i]]
+        expected = np.asarray(preprocessor.transform(row), dtype=np.float64)  # one-row matrix, as transform_row
+        np.testing.assert_allclose(encoder.transform_row(row.iloc[0].to_dict()), expected, rtol=1e-6, atol=1e-9)
+
+
+def test_missing_and_unknown_values_match_column_transformer(pipeline, served_data):
+    X, _ = served_data
+    preprocessor = pipeline.named_steps["preprocessor"]
+    encoder = CompiledEncoder.from_preprocessor(preprocessor)
+
+    odd = X.iloc[:4].copy()
+    odd["rainfall_mm"] = odd["rainfall_mm"].astype(float)
+    odd.iloc[0, odd.columns.get_loc("rainfall_mm")] = np.nan      # imputed with the training median
+    odd.iloc[1, odd.columns.get_loc("district")] = "Atlantis"     # unseen: all-zero one-hot block
+    odd.iloc[2, odd.columns.get_loc("season")] = None             # imputed with the most frequent season
+
+    expected = np.asarray(preprocessor.transform(odd), dtype=np.float64)
+    np.testing.assert_allclose(encoder.transform(as_columns(odd)), expected, rtol=1e-6, atol=1e-9)
+
+
+def test_spec_round_trip(pipeline, served_data):
+    X, _ = served_data
+    encoder = CompiledEncoder.from_pipeline(pipeline)
+    restored = CompiledEncoder.from_spec(encoder.to_spec())
+    np.testing.assert_array_equal(restored.transform(as_columns(X)), encoder.transform(as_columns(X)))
@@ -0,0 +1,108 @@
+import os
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from conftest import as_columns, fit_pipeline, served_frame
+from model_registry import (ACTIVE_FILE, active_version, clear_active, list_versions, register_version,
+                            set_active)
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    # A private registry and a server that has not loaded anything yet
+    monkeypatch.setattr(main, "MODEL_REGISTRY_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "serving_model", None)
+    monkeypatch.setattr(main, "previous_model", None)
+    monkeypatch.setattr(main, "drift_monitor", None)
+    monkeypatch.setattr(main, "activation_status", {"version": None, "state": "idle", "error": None})
+    return str(tmp_path)
+
+
+def register_two(registry_dir, pipeline):
+    X, y = served_frame(seed=5)
+    first = register_version(registry_dir, pipeline, metrics={"rmse": 1.0}, activate=False)
+    second = register_version(registry_dir, fit_pipeline(X, y, seed=5), metrics={"rmse": 2.0}, activate=False)
+    return first["version"], second["version"]
+
+
+def test_register_does_not_activate_unless_asked(registry, pipeline):
+    first, second = register_two(registry, pipeline)
+    assert active_version(registry) is None
+    assert [v["version"] for v in list_versions(registry)] == [first, second]
+
+
+def test_rollback_restores_previous_version_and_persists_it(registry, pipeline):
+    first, second = register_two(registry, pipeline)
+
+    main.activate_version(first)
+    main.activate_version(second)
+    assert main.current_model().version == second
+    assert active_version(registry) == second
+
+    result = main.rollback_model()
+    assert result["serving"]["version"] == first
+    assert main.current_model().version == first
+    # Written to the registry, so pollers and other workers follow instead of undoing it
+    assert active_version(registry) == first
+
+    # The version rolled back from is now the rollback target
+    main.rollback_model()
+    assert main.current_model().version == second
+    assert active_version(registry) == second
+
+
+def test_rolled_back_model_keeps_serving_same_predictions(registry, pipeline, served_data):
+    first, second = register_two(registry, pipeline)
+    columns = as_columns(served_data[0].iloc[:20])
+
+    main.activate_version(first)
+    before = main.current_model().predict(columns)
+    main.activate_version(second)
+    main.rollback_model()
+    assert (main.current_model().predict(columns) == before).all()
+
+
+def test_rollback_without_previous_version_is_409(registry, pipeline):
+    first, _ = register_two(registry, pipeline)
+    main.activate_version(first)
+    with pytest.raises(HTTPException) as raised:
+        main.rollback_model()
+    assert raised.value.status_code == 409
+
+
+def test_failed_activation_keeps_current_version(registry, pipeline, monkeypatch):
+    first, second = register_two(registry, pipeline)
+    main.activate_version(first)
+
+    def broken(candidate):
+        raise ValueError("non-finite warm-up predictions")
+
+    monkeypatch.setattr(main, "warm_up", broken)
+    main.activate_version(second)
+    assert main.activation_status["state"] == "failed"
+    assert main.current_model().version == first
+    assert active_version(registry) == first
+
+
+def test_unservable_version_cannot_be_activated(registry):
+    X, y = served_frame(n_rows=200, seed=7)
+    X = X.rename(columns={"rainfall_mm": "Total_Rainfall_mm"})  # a column the server never builds
+    version = register_version(registry, fit_pipeline(X, y), activate=False)["version"]
+
+    with pytest.raises(ValueError, match="Total_Rainfall_mm"):
+        set_active(registry, version)
+    assert not os.path.exists(os.path.join(registry, ACTIVE_FILE))
+
+    main.activate_version(version)
+    assert main.activation_status["state"] == "failed"
+    assert main.serving_model is None
+
+
+def test_clear_active_falls_back_to_local_files(registry, pipeline):
+    first, _ = register_two(registry, pipeline)
+    set_active(registry, first)
+    clear_active(registry)
+    assert active_version(registry) is None
+    clear_active(registry)  # already cleared: no error
@@ -0,0 +1,41 @@
+import numpy as np
+from xgboost import XGBRegressor
+
+from conftest import as_columns, fit_pipeline, served_frame
+from fast_encoder import CompiledEncoder
+from tree_ensemble import TreeEnsemble, export_pipeline, flatten_booster
+
+
+def test_exported_trees_match_xgboost(pipeline, served_data, tmp_path):
+    X, _ = served_data
+    path = tmp_path / "trees.npz"
+    export_pipeline(pipeline, str(path))
+    trees, spec = TreeEnsemble.load(str(path))
+    encoder = CompiledEncoder.from_spec(spec)
+
+    expected = pipeline.predict(X)
+    np.testing.assert_allclose(trees.predict(encoder.transform(as_columns(X))), expected, rtol=1e-6, atol=1e-3)
+
+
+def test_missing_values_follow_default_direction():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(300, 4)).astype(np.float32)
+    X[rng.random(X.shape) < 0.2] = np.nan  # xgboost learns a default branch for missing values
+    y = np.nansum(X, axis=1) + rng.normal(0, 0.1, 300)
+    model = XGBRegressor(objective="reg:squarederror", n_estimators=30, max_depth=5, n_jobs=1).fit(X, y)
+
+    trees = TreeEnsemble(flatten_booster(model.get_booster()))
+    np.testing.assert_allclose(trees.predict(X), model.predict(X), rtol=1e-6, atol=1e-5)
+
+
+def test_early_stopped_model_uses_best_iteration():
+    X, y = served_frame(n_rows=300, seed=3)
+    pipeline = fit_pipeline(X, y, n_estimators=200, seed=3)
+    encoded = pipeline.named_steps["preprocessor"].transform(X)
+    regressor = XGBRegressor(objective="reg:squarederror", n_estimators=300, early_stopping_rounds=5,
+                             learning_rate=0.3, n_jobs=1)
+    regressor.fit(encoded[:200], y[:200], eval_set=[(encoded[200:], y[200:])], verbose=False)
+    assert regressor.best_iteration + 1 < regressor.get_booster().num_boosted_rounds()
+
+    trees = TreeEnsemble(flatten_booster(regressor.get_booster()))
+    np.testing.assert_allclose(trees.predict(encoded), regressor.predict(encoded), rtol=1e-6, atol=1e-3)
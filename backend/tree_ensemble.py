@@ -0,0 +1,168 @@
+"""
+tree_ensemble.py
+Export the XGBRegressor inside rice_yield_model_xgb.pkl to flat NumPy arrays and
+evaluate it without the xgboost, sklearn or joblib runtimes.
+
+Every tree is flattened into shared contiguous arrays (feature index, threshold,
+left/right child, default direction, leaf value); the compiled feature encoder spec
+is stored alongside so main.py can serve from the .npz alone.
+
+Export:
+    python tree_ensemble.py --model rice_yield_model_xgb.pkl --out rice_yield_model_trees.npz
+"""
+
+import json
+
+import numpy as np
+
+# Objectives whose prediction is the raw margin (no link function)
+IDENTITY_OBJECTIVES = {"reg:squarederror", "reg:linear", "reg:absoluteerror", "reg:pseudohubererror"}
+
+
+def _parse_base_score(raw: str) -> float:
+    # Newer xgboost stores base_score as a one-element vector, e.g. "[4.1045103E3]"
+    return float(raw.strip("[]").split(",")[0])
+
+
+def flatten_booster(booster) -> dict:
+    """Flatten an xgboost Booster into contiguous arrays (one global node index space)."""
+    raw = json.loads(booster.save_raw(raw_format="json"))
+    learner = raw["learner"]
+
+    objective = learner["objective"]["name"]
+    if objective not in IDENTITY_OBJECTIVES:
+        raise ValueError(f"Unsupported objective for export: {objective}")
+    booster_model = learner["gradient_booster"]
+    if booster_model["name"] != "gbtree":
+        raise ValueError(f"Unsupported booster for export: {booster_model['name']}")
+
+    trees = booster_model["model"]["trees"]
+    # Honour early stopping the same way XGBRegressor.predict does
+    best_iteration = booster.attr("best_iteration")
+    if best_iteration is not None:
+        n_parallel = int(booster_model["model"]["gbtree_model_param"]["num_parallel_tree"])
+        trees = trees[: (int(best_iteration) + 1) * n_parallel]
+
+    feature, threshold, left, right, default_left, value = [], [], [], [], [], []
+    roots, depths = [], []
+    offset = 0
+    for tree in trees:
+        if tree["categories_nodes"]:
+            raise ValueError("Categorical splits are not supported")
+        lc, rc = tree["left_children"], tree["right_children"]
+        n_nodes = len(lc)
+        is_leaf = [c == -1 for c in lc]
+
+        roots.append(offset)
+        feature.extend(0 if leaf else f for f, leaf in zip(tree["split_indices"], is_leaf))
+        threshold.extend(tree["split_conditions"])
+        left.extend(-1 if leaf else c + offset for c, leaf in zip(lc, is_leaf))
+        right.extend(-1 if leaf else c + offset for c, leaf in zip(rc, is_leaf))
+        default_left.extend(tree["default_left"])
+        # Leaf values live in split_conditions; internal nodes keep 0
+        value.extend(v if leaf else 0.0 for v, leaf in zip(tree["split_conditions"], is_leaf))
+
+        depth = [0] * n_nodes
+        for node in range(n_nodes):
+            if not is_leaf[node]:
+                depth[lc[node]] = depth[rc[node]] = depth[node] + 1
+        depths.append(max(depth))
+        offset += n_nodes
+
+    return {
+        "feature": np.asarray(feature, dtype=np.int32),
+        "threshold": np.asarray(threshold, dtype=np.float32),
+        "left": np.asarray(left, dtype=np.int32),
+        "right": np.asarray(right, dtype=np.int32),
+        "default_left": np.asarray(default_left, dtype=bool),
+        "value": np.asarray(value, dtype=np.float32),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "max_depth": np.int32(max(depths) if depths else 0),
+        "base_score": np.float32(_parse_base_score(learner["learner_model_param"]["base_score"])),
+        "n_features": np.int32(int(learner["learner_model_param"]["num_feature"])),
+    }
+
+
+def export_pipeline(pipeline, out_path: str) -> dict:
+    """Write the flattened regressor and the compiled encoder spec of a trained pipeline to one .npz."""
+    from fast_encoder import CompiledEncoder
+
+    arrays = flatten_booster(pipeline.named_steps["regressor"].get_booster())
+    encoder = CompiledEncoder.from_pipeline(pipeline)
+    np.savez(out_path, encoder_spec=np.asarray(json.dumps(encoder.to_spec())), **arrays)
+    return arrays
+
+
+class TreeEnsemble:
+    def __init__(self, arrays: dict):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.default_left = arrays["default_left"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.max_depth = int(arrays["max_depth"])
+        self.base_score = np.float32(arrays["base_score"])
+        self.n_features = int(arrays["n_features"])
+
+        # Leaves point at themselves so every row can take max_depth steps without branching
+        nodes = np.arange(len(self.left), dtype=np.int32)
+        leaf = self.left < 0
+        self._left = np.where(leaf, nodes, self.left)
+        self._right = np.where(leaf, nodes, self.right)
+
+    @classmethod
+    def load(cls, path: str):
+        """Load an exported .npz; returns (ensemble, encoder spec dict)."""
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in data.files}
+        spec = json.loads(str(arrays.pop("encoder_spec")))
+        return cls(arrays), spec
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n, {self.n_features}), got {X.shape}")
+
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.default_left[node], x < self.threshold[node])
+            node = np.where(go_left, self._left[node], self._right[node])
+
+        # xgboost accumulates leaf values tree by tree in float32, starting from base_score
+        leaves = np.empty((X.shape[0], len(self.roots) + 1), dtype=np.float32)
+        leaves[:, 0] = self.base_score
+        leaves[:, 1:] = self.value[node]
+        return np.add.accumulate(leaves, axis=1, dtype=np.float32)[:, -1]
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    import joblib
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Export the trained XGBoost pipeline to flat NumPy arrays")
+    parser.add_argument("--model", default=os.path.join(here, "rice_yield_model_xgb.pkl"))
+    parser.add_argument("--out", default=os.path.join(here, "rice_yield_model_trees.npz"))
+    parser.add_argument("--csv", default=None, help="optional training CSV to verify the export against model.predict")
+    args = parser.parse_args()
+
+    pipeline = joblib.load(args.model)
+    arrays = export_pipeline(pipeline, args.out)
+    print(f"✅ Exported {len(arrays['roots'])} trees ({len(arrays['feature'])} nodes) to {args.out}")
+
+    if args.csv:
+        import pandas as pd
+        from fast_encoder import CompiledEncoder
+
+        ensemble, spec = TreeEnsemble.load(args.out)
+        encoder = CompiledEncoder.from_spec(spec)
+        df = pd.read_csv(args.csv)
+        X = encoder.transform({col: df[col].tolist() for col in encoder.numeric_cols + encoder.categorical_cols})
+        diff = np.abs(ensemble.predict(X) - pipeline.named_steps["regressor"].predict(X))
+        print(f"Rows checked: {len(df)}, max prediction diff vs model.predict: {diff.max()}")
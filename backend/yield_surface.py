@@ -0,0 +1,253 @@
+"""
+yield_surface.py
+Precomputed yield surface: the serving model evaluated offline on a grid per
+(district, season), answered at request time by multilinear interpolation.
+
+Humidity is not a model input, so the grid axes are temperature, rainfall, water,
+fertilizer and year (ranges cover the dashboard sliders and its year picker). The grid
+is stored as one .npy array of shape (district, season, *axes), opened memory-mapped
+so only the pages a request touches are read, plus a JSON sidecar with the axes, the
+model version it was built from and the measured interpolation error.
+
+XGBoost is piecewise constant, so interpolation is exact only away from split
+thresholds. After building, random points inside each cell's box are scored both
+ways; the largest absolute difference per cell is reported with every surface answer
+as "error_bound" (an empirical bound, not a guarantee).
+
+    python yield_surface.py build                      # uses the model main.py would serve
+    python yield_surface.py build --step rainfall=50 --step temperature=1
+    python yield_surface.py check                      # re-measure the error of an existing surface
+"""
+
+import bisect
+import json
+import os
+import time
+
+import numpy as np
+
+SURFACE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rice_yield_surface.npy")
+
+# field -> (start, stop, step), inclusive of stop
+DEFAULT_AXES = {
+    "temperature": (15.0, 45.0, 2.0),
+    "rainfall": (0.0, 3000.0, 150.0),
+    "water": (0.0, 100.0, 10.0),
+    "fertilizer": (0.0, 100.0, 10.0),
+    "year": (2024.0, 2045.0, 7.0),
+}
+ERROR_SAMPLES_PER_CELL = 256
+
+
+def axis_points(start: float, stop: float, step: float) -> np.ndarray:
+    n = int(np.floor((stop - start) / step + 1e-9)) + 1
+    points = start + step * np.arange(n)
+    if points[-1] < stop - 1e-9:
+        points = np.append(points, stop)
+    return points
+
+
+def sidecar_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+class YieldSurface:
+    def __init__(self, values: np.ndarray, meta: dict):
+        self.values = values  # (district, season, *axes), usually a read-only memmap
+        self.meta = meta
+        self.fields = list(meta["axes"])
+        self.axes = [np.asarray(meta["axes"][f], dtype=np.float64) for f in self.fields]
+        self.district_index = {d: i for i, d in enumerate(meta["districts"])}
+        self.season_index = {s: i for i, s in enumerate(meta["seasons"])}
+        self.model_version = meta["model_version"]
+        self.model_path = meta.get("model_path")
+        per_cell = meta.get("error", {}).get("max_abs_per_cell")
+        self.error_bound = np.asarray(per_cell, dtype=np.float64) if per_cell is not None else np.full(values.shape[:2], np.nan)
+
+        # The 2^k corners of a grid cell in C order (last axis fastest, like np.multiply.outer
+        # of the per-axis weight pairs): which corners take the upper weight, and their flat offsets
+        n_axes = len(self.axes)
+        strides = np.array(values.strides[2:]) // values.itemsize
+        self._bits = np.indices((2,) * n_axes).reshape(n_axes, -1).T.astype(bool)
+        self._corner_offsets = self._bits.astype(np.int64) @ strides
+        self._strides = strides
+        self._district_stride = values.strides[0] // values.itemsize
+        self._season_stride = values.strides[1] // values.itemsize
+        self._flat = values.view(np.ndarray).reshape(-1)  # plain view: memmap indexing overhead dominates single lookups
+        self._axis_lists = [axis.tolist() for axis in self.axes]
+        self._scalar_strides = strides.tolist()
+        self._error_bounds = self.error_bound.tolist()
+
+    @classmethod
+    def load(cls, path: str = SURFACE_PATH):
+        with open(sidecar_path(path)) as f:
+            meta = json.load(f)
+        return cls(np.load(path, mmap_mode="r"), meta)
+
+    def matches(self, version: str, path: str) -> bool:
+        """Whether the surface was built from this model (and that model file has not changed since)."""
+        if version != self.model_version or path != self.model_path:
+            return False
+        mtime = self.meta.get("model_mtime")
+        return mtime is None or not os.path.exists(path) or abs(os.path.getmtime(path) - mtime) < 1e-6
+
+    def interpolate(self, district_idx: np.ndarray, season_idx: np.ndarray, points: np.ndarray) -> np.ndarray:
+        """Multilinear interpolation for n points (n x axes) that lie inside the grid."""
+        base = district_idx * self._district_stride + season_idx * self._season_stride
+        weights = np.ones((len(points), len(self._corner_offsets)))
+        for k, axis in enumerate(self.axes):
+            i = np.clip(np.searchsorted(axis, points[:, k], side="right") - 1, 0, len(axis) - 2)
+            t = (points[:, k] - axis[i]) / (axis[i + 1] - axis[i])
+            base = base + i * self._strides[k]
+            weights *= np.where(self._bits[:, k], t[:, None], 1.0 - t[:, None])
+        corners = self._flat[base[:, None] + self._corner_offsets].astype(np.float64)
+        return np.sum(corners * weights, axis=1)
+
+    def lookup(self, district: str, season: str, values: dict):
+        """(yield, error bound) for one request, or None when it falls outside the grid."""
+        # Scalar version of interpolate(): one gather, the rest in plain Python (NumPy call
+        # overhead would dominate for a single point)
+        d = self.district_index.get(district)
+        s = self.season_index.get(season)
+        if d is None or s is None:
+            return None
+        offset = d * self._district_stride + s * self._season_stride
+        fractions = []
+        for field, axis, stride in zip(self.fields, self._axis_lists, self._scalar_strides):
+            value = float(values[field])
+            if not axis[0] <= value <= axis[-1]:
+                return None
+            i = min(max(bisect.bisect_right(axis, value) - 1, 0), len(axis) - 2)
+            fractions.append((value - axis[i]) / (axis[i + 1] - axis[i]))
+            offset += i * stride
+
+        # Corners are in C order, so neighbours along the last axis are adjacent: collapse
+        # one axis at a time, last first
+        corners = self._flat[offset + self._corner_offsets].tolist()
+        for t in reversed(fractions):
+            corners = [lo + (hi - lo) * t for lo, hi in zip(corners[0::2], corners[1::2])]
+        return corners[0], self._error_bounds[d][s]
+
+
+def grid_columns(districts: list[str], seasons: list[str], axes: dict, cell: tuple) -> tuple[list, list, np.ndarray, dict]:
+    """Inputs for every grid point of one (district, season) cell."""
+    grids = np.meshgrid(*axes.values(), indexing="ij")
+    n = grids[0].size
+    values = {field: grid.ravel() for field, grid in zip(axes, grids)}
+    return [districts[cell[0]]] * n, [seasons[cell[1]]] * n, values.pop("year"), values
+
+
+def build_surface(score_fn, districts: list[str], seasons: list[str], axes: dict, path: str, model: dict,
+                  dtype: str = "float32", error_samples: int = ERROR_SAMPLES_PER_CELL, seed: int = 0) -> dict:
+    """Evaluate score_fn on the grid and write the .npy and its sidecar; returns the sidecar.
+
+    score_fn(districts, seasons, years, inputs) -> yields, with inputs holding temperature,
+    rainfall, water and fertilizer arrays (the main.py scoring path).
+    """
+    shape = (len(districts), len(seasons)) + tuple(len(points) for points in axes.values())
+    tmp_path = path + ".partial.npy"
+    out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.dtype(dtype), shape=shape)
+
+    started = time.perf_counter()
+    for d in range(len(districts)):
+        for s in range(len(seasons)):
+            cell_districts, cell_seasons, years, inputs = grid_columns(districts, seasons, axes, (d, s))
+            out[d, s] = np.asarray(score_fn(cell_districts, cell_seasons, years, inputs)).reshape(shape[2:])
+        print(f"  {districts[d]}: {d + 1}/{len(districts)} districts ({time.perf_counter() - started:.1f}s)")
+    out.flush()
+    del out
+    os.replace(tmp_path, path)
+
+    meta = {
+        "axes": {field: [float(v) for v in points] for field, points in axes.items()},
+        "districts": list(districts),
+        "seasons": list(seasons),
+        "dtype": dtype,
+        **model,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "build_seconds": round(time.perf_counter() - started, 1),
+    }
+    meta["error"] = measure_error(YieldSurface(np.load(path, mmap_mode="r"), meta), score_fn, error_samples, seed)
+    with open(sidecar_path(path), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def measure_error(surface: YieldSurface, score_fn, samples_per_cell: int = ERROR_SAMPLES_PER_CELL, seed: int = 0) -> dict:
+    """Interpolated vs exact yields at random in-grid points of every cell."""
+    rng = np.random.default_rng(seed)
+    n_d, n_s = len(surface.meta["districts"]), len(surface.meta["seasons"])
+    max_abs = np.zeros((n_d, n_s))
+    errors = []
+    for d in range(n_d):
+        for s in range(n_s):
+            points = np.column_stack([rng.uniform(axis[0], axis[-1], samples_per_cell) for axis in surface.axes])
+            fields = dict(zip(surface.fields, points.T))
+            years = np.round(fields.pop("year"))
+            points[:, surface.fields.index("year")] = years
+            exact = np.asarray(score_fn([surface.meta["districts"][d]] * samples_per_cell,
+                                        [surface.meta["seasons"][s]] * samples_per_cell, years, fields), dtype=np.float64)
+            approx = surface.interpolate(np.full(samples_per_cell, d), np.full(samples_per_cell, s), points)
+            diff = np.abs(approx - exact)
+            max_abs[d, s] = diff.max()
+            errors.append(diff)
+    errors = np.concatenate(errors)
+    return {
+        "samples": int(errors.size),
+        "mean_abs": round(float(errors.mean()), 2),
+        "p99_abs": round(float(np.percentile(errors, 99)), 2),
+        "max_abs": round(float(errors.max()), 2),
+        "max_abs_per_cell": np.round(max_abs, 2).tolist(),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import contextlib
+    import sys
+
+    parser = argparse.ArgumentParser(description="Build or check the precomputed yield surface")
+    parser.add_argument("command", choices=["build", "check"])
+    parser.add_argument("--out", default=SURFACE_PATH)
+    parser.add_argument("--step", action="append", default=[], metavar="FIELD=STEP", help="grid step for one axis")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--error-samples", type=int, default=ERROR_SAMPLES_PER_CELL, help="random points checked per cell")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        import main
+        main.load_model()
+    current = main.current_model()
+
+    def score_fn(districts, seasons, years, inputs):
+        return main.score_feature_columns(main.feature_columns(districts, seasons, years, inputs), current)
+
+    if args.command == "check":
+        surface = YieldSurface.load(args.out)
+        if not surface.matches(current.version, current.path):
+            print(f"⚠️ Surface was built from model {surface.model_version} ({surface.model_path}), "
+                  f"not the current {current.version} ({current.path})")
+        error = measure_error(surface, score_fn, args.error_samples)
+        print(f"Interpolation error (kg/ha): mean {error['mean_abs']}, p99 {error['p99_abs']}, max {error['max_abs']}")
+        sys.exit(0)
+
+    steps = dict(DEFAULT_AXES)
+    for item in args.step:
+        field, _, step = item.partition("=")
+        if field not in steps:
+            parser.error(f"unknown axis '{field}' (choose from {', '.join(steps)})")
+        steps[field] = (steps[field][0], steps[field][1], float(step))
+    axes = {field: axis_points(*spec) for field, spec in steps.items()}
+
+    districts = main.surface_districts(current)
+    seasons = main.surface_seasons()
+    model = {"model_version": current.version, "model_path": current.path,
+             "model_mtime": os.path.getmtime(current.path) if current.path and os.path.exists(current.path) else None}
+    n_points = len(districts) * len(seasons) * int(np.prod([len(points) for points in axes.values()]))
+    print(f"Building {n_points:,} grid points ({len(districts)} districts x {len(seasons)} seasons x "
+          f"{' x '.join(str(len(p)) for p in axes.values())})")
+
+    meta = build_surface(score_fn, districts, seasons, axes, args.out, model, args.dtype, args.error_samples)
+    error = meta["error"]
+    print(f"✅ Wrote {args.out} ({os.path.getsize(args.out) / 1e6:.1f} MB) in {meta['build_seconds']}s")
+    print(f"Interpolation error (kg/ha): mean {error['mean_abs']}, p99 {error['p99_abs']}, max {error['max_abs']}")
@@ -0,0 +1,160 @@
+"""
+prepare_data.py
+Compact, de-duplicated training table built from the monthly-exploded merged CSV.
+
+Merged_TamilNaduRice_Climate_FULL.csv repeats every Year x District x Season yield
+row once per climate record (Month), so the per-season columns are duplicated ~10x
+and the copies of one season can land in different CV folds. This stage
+
+- averages the climate records per (Year, District, Season, Month),
+- pivots them into one column per variable and month (e.g. Rainfall_mm_Jun),
+- drops the now-redundant Month and District_climate columns,
+- stores float32 / small-int / categorical dtypes in a columnar cache file.
+
+The pivoted columns are not ones the server builds for a request, so train.py only
+pivots with --pivot-monthly, for --offline experiments.
+
+The cache is keyed by the CSV's SHA-256, so train.py re-reads the CSV only when it
+changed. Parquet is used when pyarrow is installed; otherwise a pickle keeps the
+same dtypes.
+
+    python prepare_data.py                 # build (or verify) the cache
+    python prepare_data.py --rebuild
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+SOURCE_PATH = "Merged_TamilNaduRice_Climate_FULL.csv"
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+KEY_COLUMNS = ["Year", "District_yield", "Season"]
+MONTHLY_COLUMNS = ["Temperature_C", "Rainfall_mm", "Humidity_%", "WindSpeed_kmph", "SoilMoisture_%", "CropYield_Index"]
+REDUNDANT_COLUMNS = ["District_climate"]  # always equal to District_yield
+MONTHS = ["January", "February", "March", "April", "May", "June",
+          "July", "August", "September", "October", "November", "December"]
+
+
+def is_monthly(df_or_columns) -> bool:
+    columns = df_or_columns.columns if hasattr(df_or_columns, "columns") else df_or_columns
+    return "Month" in columns and all(c in columns for c in KEY_COLUMNS + MONTHLY_COLUMNS)
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pivot_monthly(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per (Year, District, Season): season columns once, climate as <variable>_<Mon> columns."""
+    season_cols = [c for c in df.columns if c not in MONTHLY_COLUMNS + REDUNDANT_COLUMNS + ["Month"]]
+    seasons = df[season_cols].drop_duplicates(subset=KEY_COLUMNS).set_index(KEY_COLUMNS)
+
+    monthly = df.groupby(KEY_COLUMNS + ["Month"], sort=False)[MONTHLY_COLUMNS].mean().unstack("Month")
+    months = [m for m in MONTHS if m in monthly.columns.get_level_values("Month")]
+    monthly = monthly.reindex(columns=pd.MultiIndex.from_product([MONTHLY_COLUMNS, months]))
+    monthly.columns = [f"{variable}_{month[:3]}" for variable, month in monthly.columns]
+
+    return seasons.join(monthly).reset_index()
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy()
+    for col in out.columns:
+        series = out[col]
+        if pd.api.types.is_float_dtype(series):
+            out[col] = series.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(series):
+            out[col] = pd.to_numeric(series, downcast="integer")
+        elif not pd.api.types.is_numeric_dtype(series):
+            out[col] = series.astype("category")
+    return out
+
+
+def _parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def cache_path(csv_path: str, digest: str, cache_dir: str = CACHE_DIR) -> str:
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    ext = "parquet" if _parquet_available() else "pkl"
+    return os.path.join(cache_dir, f"{stem}.{digest[:16]}.{ext}")
+
+
+def build_cache(csv_path: str, path: str) -> pd.DataFrame:
+    prepared = compact_dtypes(pivot_monthly(pd.read_csv(csv_path)))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Drop caches of earlier versions of the same CSV
+    stem = os.path.basename(path).split(".")[0]
+    for old in glob.glob(os.path.join(os.path.dirname(path), f"{stem}.*")):
+        if old != path:
+            os.remove(old)
+
+    tmp_path = path + ".tmp"
+    if path.endswith(".parquet"):
+        prepared.to_parquet(tmp_path, index=False)
+    else:
+        prepared.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+    return prepared
+
+
+def load_prepared(csv_path: str = SOURCE_PATH, cache_dir: str = CACHE_DIR, rebuild: bool = False) -> pd.DataFrame:
+    """Pivoted, typed table for a monthly-exploded CSV, from the cache when the CSV is unchanged."""
+    path = cache_path(csv_path, file_hash(csv_path), cache_dir)
+    if not rebuild and os.path.exists(path):
+        return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_pickle(path)
+    return build_cache(csv_path, path)
+
+
+def load_dataset(csv_path: str, cache_dir: str = CACHE_DIR, rebuild: bool = False,
+                 pivot: bool = False) -> pd.DataFrame:
+    """What train.py trains on: the CSV itself, or with `pivot` the prepared table for a monthly CSV.
+
+    A monthly CSV without `pivot` is refused rather than trained on row by row.
+    """
+    header = pd.read_csv(csv_path, nrows=0)
+    if is_monthly(header):
+        if not pivot:
+            raise ValueError(f"{csv_path} has one row per month; pass --pivot-monthly (offline models only)")
+        return load_prepared(csv_path, cache_dir, rebuild)
+    return pd.read_csv(csv_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the compact training table from the merged monthly CSV")
+    parser.add_argument("--csv", default=SOURCE_PATH)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    raw = pd.read_csv(args.csv)
+    csv_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    prepared = load_prepared(args.csv, args.cache_dir, args.rebuild)
+    prepared_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    load_prepared(args.csv, args.cache_dir)
+    cached_seconds = time.perf_counter() - started
+
+    mb = lambda frame: frame.memory_usage(deep=True).sum() / 1e6
+    print(f"CSV:      {raw.shape[0]} rows x {raw.shape[1]} cols, {mb(raw):.1f} MB, read in {csv_seconds:.2f}s")
+    print(f"Prepared: {prepared.shape[0]} rows x {prepared.shape[1]} cols, {mb(prepared):.1f} MB "
+          f"(built in {prepared_seconds:.2f}s, cached load {cached_seconds:.3f}s incl. hash)")
+    print("✅ Cache:", cache_path(args.csv, file_hash(args.csv), args.cache_dir))
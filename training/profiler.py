@@ -0,0 +1,213 @@
+"""
+profiler.py
+Training cost and serving cost of a train.py run, written as a JSON report next to the model.
+
+- Each stage (data load, baseline CV, search, final fit, save, plotting) records its wall
+  time, the process's peak resident memory while it ran and how much resident memory it
+  left behind. On Linux the peak is reset at the start of every stage
+  (/proc/self/clear_refs), so it is the stage's own peak; elsewhere it is the peak of
+  the run so far (ru_maxrss).
+- Inference latency is measured on the saved files, the way the server loads them: the
+  pickled sklearn pipeline and the native booster + preprocessing spec (main.py's default
+  format). Single-row latency is taken over individual test rows, batch latency over
+  repeated batches of `batch_size` rows. The native model gets the rows as the column
+  dict main.feature_columns builds (arrays, with district and season as lists). A model
+  reading columns the server does not send is marked "served_input": false: its figures
+  are for offline comparison only, no request can reach that path.
+- check_latency() compares the native single-row p95 and batch p95 to the limits given on
+  the command line; train.py does not activate a model that exceeds them.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+PROC_STATUS = "/proc/self/status"
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+def _status_mb(field: str):
+    try:
+        with open(PROC_STATUS) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb():
+    return _status_mb("VmRSS")
+
+
+def _reset_peak() -> bool:
+    # Writing 5 resets VmHWM (the resident-memory high-water mark) to the current RSS
+    try:
+        with open(PROC_CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_mb() -> float:
+    peak = _status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 2**20 if sys.platform == "darwin" else maxrss / 1024
+
+
+class TrainingProfiler:
+    def __init__(self):
+        self.stages = {}
+        self.started = time.perf_counter()
+        self.per_stage_peak = _reset_peak()
+
+    @contextmanager
+    def stage(self, name: str):
+        self.per_stage_peak = _reset_peak() and self.per_stage_peak
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            rss_after = rss_mb()
+            record = {"wall_seconds": round(time.perf_counter() - started, 3), "peak_rss_mb": round(_peak_mb(), 1)}
+            if rss_before is not None and rss_after is not None:
+                record["rss_delta_mb"] = round(rss_after - rss_before, 1)
+            self.stages[name] = record
+            print(f"⏱️  {name}: {record['wall_seconds']:.2f}s, peak RSS {record['peak_rss_mb']:.0f} MB")
+
+    def report(self, **sections) -> dict:
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "total_seconds": round(time.perf_counter() - self.started, 3),
+            "peak_rss_scope": "stage" if self.per_stage_peak else "run",
+            "stages": self.stages,
+            "cpus": os.cpu_count(),
+        }
+        report.update(sections)
+        return report
+
+
+def candidate_timings(history: list[dict]) -> list[dict]:
+    """Fit times of every candidate the search scored (all halving rungs), slowest first."""
+    rows = [{
+        "params": result["params"],
+        "fraction": result["fraction"],
+        "fit_seconds": round(result["fit_seconds"], 3),
+        "rmse": round(result["rmse"], 3),
+        "trees": [i + 1 for i in result["best_iterations"]],
+    } for result in history]
+    return sorted(rows, key=lambda r: -r["fit_seconds"])
+
+
+def _percentiles(seconds: list[float]) -> dict:
+    ms = np.asarray(seconds) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "max_ms": round(float(ms.max()), 4),
+    }
+
+
+def _time_calls(predict, inputs: list, warmup: int = 5) -> list[float]:
+    for x in inputs[:warmup]:
+        predict(x)
+    timings = []
+    for x in inputs:
+        started = time.perf_counter()
+        predict(x)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def measure_latency(X, pickle_path: str, booster_path: str, spec_path: str, single_rows: int = 200,
+                    batch_size: int = 1000, batch_repeats: int = 20, random_state: int = 42) -> dict:
+    """Single-row and batch latency of the saved pipeline and native model on rows of X (a DataFrame)."""
+    import joblib
+
+    from model_registry import ServingModel, unservable_features
+    from native_model import load_native
+
+    rng = np.random.default_rng(random_state)
+    single = rng.choice(len(X), size=min(single_rows, len(X)), replace=False)
+    batch = rng.choice(len(X), size=batch_size, replace=True)
+    X_batch = X.iloc[batch].reset_index(drop=True)
+
+    started = time.perf_counter()
+    pipeline = joblib.load(pickle_path)
+    pipeline_load = time.perf_counter() - started
+    started = time.perf_counter()
+    regressor, encoder = load_native(booster_path, spec_path)
+    native = ServingModel("profile", "native", booster_path, encoder=encoder, regressor=regressor)
+    native_load = time.perf_counter() - started
+
+    # Same container types as main.feature_columns: numeric arrays, categorical lists
+    as_served = lambda frame: {col: frame[col].to_numpy() if frame[col].dtype.kind in "biuf" else frame[col].tolist()
+                               for col in frame.columns}
+    columns, batch_columns = as_served(X), as_served(X_batch)
+    results = {
+        "pipeline": {
+            "load_seconds": round(pipeline_load, 4),
+            "single_row": _percentiles(_time_calls(pipeline.predict, [X.iloc[[i]] for i in single])),
+            "batch": _percentiles(_time_calls(pipeline.predict, [X_batch] * batch_repeats, warmup=1)),
+        },
+        "native": {
+            "load_seconds": round(native_load, 4),
+            "single_row": _percentiles(_time_calls(
+                native.predict, [{col: values[i:i + 1] for col, values in columns.items()} for i in single])),
+            "batch": _percentiles(_time_calls(native.predict, [batch_columns] * batch_repeats, warmup=1)),
+        },
+    }
+    for measured in results.values():
+        measured["batch"]["rows_per_second"] = round(batch_size / (measured["batch"]["p50_ms"] / 1000.0))
+    results.update({"single_rows": len(single), "batch_size": batch_size, "batch_repeats": batch_repeats,
+                    "served_input": not unservable_features(X.columns)})
+    return results
+
+
+def check_latency(latency: dict, max_single_ms: float = 0, max_batch_ms: float = 0) -> list[str]:
+    """Reasons the native model is too slow to serve (empty when within the limits; 0 = no limit)."""
+    problems = []
+    single_p95 = latency["native"]["single_row"]["p95_ms"]
+    batch_p95 = latency["native"]["batch"]["p95_ms"]
+    if max_single_ms and single_p95 > max_single_ms:
+        problems.append(f"single-row p95 {single_p95:.3f} ms > {max_single_ms} ms")
+    if max_batch_ms and batch_p95 > max_batch_ms:
+        problems.append(f"{latency['batch_size']}-row batch p95 {batch_p95:.3f} ms > {max_batch_ms} ms")
+    return problems
+
+
+def summary(report: dict) -> dict:
+    """The figures worth comparing across versions, for the registry metadata."""
+    result = {
+        "training_seconds": report["total_seconds"],
+        "peak_rss_mb": max((s["peak_rss_mb"] for s in report["stages"].values()), default=None),
+        "stage_seconds": {name: s["wall_seconds"] for name, s in report["stages"].items()},
+    }
+    latency = report.get("latency")
+    if latency:
+        result["single_row_p95_ms"] = latency["native"]["single_row"]["p95_ms"]
+        result["batch_p95_ms"] = latency["native"]["batch"]["p95_ms"]
+        result["batch_size"] = latency["batch_size"]
+        result["served_input"] = latency["served_input"]
+    if "offline" in report:
+        result["offline"] = report["offline"]
+    if "rejected" in report:
+        result["rejected"] = report["rejected"]
+    return result
+
+
+def write_report(report: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
@@ -0,0 +1,164 @@
+"""
+search.py
+Hyperparameter search used by train.py.
+
+- The ColumnTransformer is fitted once per CV fold and the encoded float32 arrays are
+  reused by every candidate (instead of refitting it for every candidate x fold).
+- Each fit uses XGBoost's histogram tree method with early stopping on a validation
+  split carved out of the fold's training rows, so n_estimators is found rather than
+  searched.
+- Candidate x fold fits run on `cv_jobs` threads (XGBoost releases the GIL) with
+  `xgb_threads` threads each, so cv_jobs * xgb_threads never oversubscribes the CPU.
+- "halving" mode scores all candidates on a small share of the training rows and
+  promotes the best 1/eta to the next rung with eta times more rows.
+- A wall-clock budget stops the search; the best candidate of the last rung every
+  survivor finished wins, and is re-scored on all rows if that rung used fewer.
+"""
+
+import math
+import os
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import ParameterSampler, train_test_split
+from xgboost import XGBRegressor
+
+
+def thread_plan(cv_jobs: int = None, xgb_threads: int = None, n_folds: int = 5) -> tuple[int, int]:
+    """(outer parallel fits, threads per XGBoost fit) that together fit in the available CPUs."""
+    cpus = os.cpu_count() or 1
+    if cv_jobs is None:
+        cv_jobs = max(1, min(n_folds, cpus))
+    if xgb_threads is None:
+        xgb_threads = max(1, cpus // cv_jobs)
+    return cv_jobs, xgb_threads
+
+
+def build_fold_cache(preprocessor, X, y, cv, val_size: float = 0.1, random_state: int = 42) -> list[dict]:
+    """Fit the preprocessor once per fold and keep the encoded train/val/test arrays."""
+    folds = []
+    y = np.asarray(y, dtype=np.float32)
+    for train_idx, test_idx in cv.split(X):
+        fitted = clone(preprocessor).fit(X.iloc[train_idx], y[train_idx])
+        fit_idx, val_idx = train_test_split(train_idx, test_size=val_size, random_state=random_state)
+        encode = lambda idx: np.asarray(fitted.transform(X.iloc[idx]), dtype=np.float32)
+        folds.append({
+            "X_train": encode(fit_idx), "y_train": y[fit_idx],
+            "X_val": encode(val_idx), "y_val": y[val_idx],
+            "X_test": encode(test_idx), "y_test": y[test_idx],
+            # Fixed row order for taking the first `fraction` of the training rows
+            "order": np.random.default_rng(random_state).permutation(len(fit_idx)),
+        })
+    return folds
+
+
+def fit_fold(params: dict, fold: dict, fraction: float = 1.0, xgb_threads: int = 1, max_estimators: int = 2000,
+             early_stopping_rounds: int = 50, random_state: int = 42, deadline: float = None):
+    """Fit one candidate on one cached fold; None when the time budget ran out before starting."""
+    if deadline is not None and time.monotonic() >= deadline:
+        return None
+
+    rows = fold["order"][:max(1, int(len(fold["order"]) * fraction))]
+    model = XGBRegressor(
+        objective="reg:squarederror",
+        tree_method="hist",
+        n_estimators=max_estimators,
+        early_stopping_rounds=early_stopping_rounds,
+        n_jobs=xgb_threads,
+        random_state=random_state,
+        **params,
+    )
+    started = time.perf_counter()
+    model.fit(fold["X_train"][rows], fold["y_train"][rows], eval_set=[(fold["X_val"], fold["y_val"])], verbose=False)
+    fit_seconds = time.perf_counter() - started
+
+    y_pred = model.predict(fold["X_test"])
+    return {
+        "rmse": float(np.sqrt(mean_squared_error(fold["y_test"], y_pred))),
+        "r2": float(r2_score(fold["y_test"], y_pred)),
+        "best_iteration": int(model.best_iteration),
+        "fit_seconds": fit_seconds,
+    }
+
+
+def evaluate(candidates: list[dict], folds: list[dict], fraction: float = 1.0, cv_jobs: int = 1,
+             deadline: float = None, history: list = None, **fit_kwargs) -> list[dict]:
+    """Score every candidate on every fold; candidates missing a fold (time budget) are dropped.
+
+    Results are also appended to `history`, if given, so a halving search keeps every rung's.
+    """
+    tasks = [(c, f) for c in range(len(candidates)) for f in range(len(folds))]
+    outputs = Parallel(n_jobs=cv_jobs, backend="threading")(
+        delayed(fit_fold)(candidates[c], folds[f], fraction, deadline=deadline, **fit_kwargs) for c, f in tasks
+    )
+
+    per_candidate = {}
+    for (c, _), out in zip(tasks, outputs):
+        per_candidate.setdefault(c, []).append(out)
+
+    results = []
+    for c, fold_results in sorted(per_candidate.items()):
+        if any(r is None for r in fold_results):
+            continue
+        results.append({
+            "params": candidates[c],
+            "fraction": fraction,
+            "rmse": float(np.mean([r["rmse"] for r in fold_results])),
+            "r2": float(np.mean([r["r2"] for r in fold_results])),
+            "best_iterations": [r["best_iteration"] for r in fold_results],
+            "fit_seconds": float(sum(r["fit_seconds"] for r in fold_results)),
+        })
+    if history is not None:
+        history.extend(results)
+    return results
+
+
+def sample_candidates(param_dist: dict, n_candidates: int, random_state: int = 42) -> list[dict]:
+    return [dict(p) for p in ParameterSampler(param_dist, n_iter=n_candidates, random_state=random_state)]
+
+
+def random_search(candidates: list[dict], folds: list[dict], time_budget: float = None, **kwargs) -> list[dict]:
+    deadline = time.monotonic() + time_budget if time_budget else None
+    return sorted(evaluate(candidates, folds, deadline=deadline, **kwargs), key=lambda r: r["rmse"])
+
+
+def successive_halving(candidates: list[dict], folds: list[dict], eta: int = 3, time_budget: float = None,
+                       min_rows: int = 100, **kwargs) -> list[dict]:
+    """Returns the results of the last fully completed rung, best first, the winner re-scored on all rows.
+
+    A rung cut short by the time budget is ignored: its finished candidates are the fast
+    ones, not the best. Only when not even the first rung completes are its finished
+    candidates used. The first rung trains on at least `min_rows` rows, so small datasets
+    get fewer rungs.
+    """
+    deadline = time.monotonic() + time_budget if time_budget else None
+    n_rows = min(len(fold["order"]) for fold in folds)
+    n_rungs = math.ceil(math.log(len(candidates), eta)) + 1 if len(candidates) > 1 else 1
+    n_rungs = max(1, min(n_rungs, 1 + int(math.log(max(n_rows / min_rows, 1.0), eta))))
+
+    survivors, ranked = list(candidates), []
+    for rung in range(n_rungs):
+        fraction = float(eta) ** (rung - (n_rungs - 1))
+        results = sorted(evaluate(survivors, folds, fraction=fraction, deadline=deadline, **kwargs),
+                         key=lambda r: r["rmse"])
+        if not results:
+            print(f"  rung {rung}: time budget exhausted")
+            break
+        print(f"  rung {rung}: {len(results)}/{len(survivors)} candidates on {fraction:.0%} of the rows, "
+              f"best RMSE {results[0]['rmse']:.3f}")
+        if len(results) < len(survivors):
+            if rung == 0:
+                ranked = results
+            break  # budget ran out mid-rung
+        ranked = results
+        survivors = [r["params"] for r in results[:max(1, math.ceil(len(results) / eta))]]
+
+    if ranked and ranked[0]["fraction"] < 1.0:
+        # The winner's score and tree counts came from a subsample; past the budget, but the final fit needs them
+        refit = evaluate([ranked[0]["params"]], folds, fraction=1.0, **kwargs)
+        print(f"  winner on all rows: RMSE {refit[0]['rmse']:.3f}")
+        ranked = refit + ranked[1:]
+    return ranked
@@ -3,19 +3,42 @@ train_xgb.py
 Train an XGBoost regression model for rice yield using the existing dataset.
 
 Dataset:
-    /training/tamil_nadu_rice_yield_dataset.csv
+    /training/tamil_nadu_rice_yield_dataset.csv, the columns the server builds for each request
+    (model_registry.SERVED_FEATURES). Datasets with other columns need --offline: the model is
+    registered for comparison but never activated, since the server cannot feed it.
+    With --pivot-monthly, monthly-exploded CSVs (Merged_TamilNaduRice_Climate_FULL.csv) are pivoted
+    to one row per season by prepare_data.py and read from its cache while the CSV is unchanged.
+    The pivoted columns are not served, so this only makes sense with --offline.
 
 Outputs:
 - backend/rice_yield_model_xgb.pkl
+- backend/rice_yield_model_xgb.ubj + backend/rice_yield_model_preprocess.json (native serving format)
+- backend/models/<version>/ (same files + metadata.json + profile.json + drift_reference.json), registered as the active version
+- backend/rice_yield_model_profile.json (stage timings, peak memory, candidate fit times, inference latency)
+- backend/rice_yield_model_drift.json (training-data sketches the server compares requests with, see drift.py)
 - backend/feature_importances.png
 - xgb_test_predictions.csv
+
+A model whose measured inference latency exceeds --max-single-latency-ms / --max-batch-latency-ms
+is registered but not activated, the backend files are left as they were, and the run exits with status 1.
+
+Usage:
+    python train.py                                   # successive halving, all CPUs
+    python train.py --search random --n-candidates 30 --time-budget 300
+    python train.py --cv-jobs 2 --xgb-threads 4       # explicit thread split
+    python train.py --update new_season.csv           # continue boosting the saved model on new rows
+    python train.py --max-single-latency-ms 2 --max-batch-latency-ms 50   # refuse models too slow to serve
+    python train.py --offline --pivot-monthly --data Merged_TamilNaduRice_Climate_FULL.csv --target Rice_Yield_kg_per_ha
 """
 
+import argparse
 import os
+import sys
+import time
 import joblib
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split, KFold, RandomizedSearchCV, cross_validate
+from sklearn.model_selection import train_test_split, KFold
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
@@ -26,31 +49,192 @@ import matplotlib.pyplot as plt
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
+from prepare_data import load_dataset
+from profiler import TrainingProfiler, candidate_timings, check_latency, measure_latency, summary, write_report
+from search import build_fold_cache, evaluate, random_search, sample_candidates, successive_halving, thread_plan
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from drift import build_reference, save_reference
+from native_model import save_native
+from tree_ensemble import export_pipeline
+from model_registry import (DRIFT_FILE, PROFILE_FILE, artifact_paths, register_version, set_active, unservable_features,
+                            update_metadata, version_dir)
+
 # --------- Configuration ---------
-DATA_PATH = "Merged_TamilNaduRice_Climate_FULL.csv"  # merged dataset in current folder
+DATA_PATH = "tamil_nadu_rice_yield_dataset.csv"  # served schema, in current folder
 OUTPUT_MODEL_PATH = os.path.join("..", "backend", "rice_yield_model_xgb.pkl")
+NATIVE_BOOSTER_PATH = os.path.join("..", "backend", "rice_yield_model_xgb.ubj")
+NATIVE_SPEC_PATH = os.path.join("..", "backend", "rice_yield_model_preprocess.json")
+TREES_PATH = os.path.join("..", "backend", "rice_yield_model_trees.npz")
 FI_PLOT_PATH = os.path.join("..", "backend", "feature_importances.png")
+PROFILE_PATH = os.path.join("..", "backend", "rice_yield_model_profile.json")
+DRIFT_REFERENCE_PATH = os.path.join("..", "backend", "rice_yield_model_drift.json")
+REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", os.path.join("..", "backend", "models"))
+TARGET = "yield_kg_per_ha"
+# Not features: constant, or (production_tonnes = area_ha x yield / 1000) the target itself
+DROP_COLUMNS = ["state", "crop", "production_tonnes"]
 RANDOM_STATE = 42
 N_SPLITS = 5
+MAX_ESTIMATORS = 2000          # upper bound; early stopping picks the actual number of trees
+EARLY_STOPPING_ROUNDS = 50
+VALIDATION_SIZE = 0.1          # share of each fold's training rows used for early stopping
 # ---------------------------------
 
+parser = argparse.ArgumentParser(description="Train the rice yield XGBoost model")
+parser.add_argument("--data", default=DATA_PATH)
+parser.add_argument("--target", default=TARGET)
+parser.add_argument("--offline", action="store_true",
+                    help="allow features the server does not send; the model is registered but never activated")
+parser.add_argument("--search", choices=["halving", "random"], default="halving")
+parser.add_argument("--n-candidates", type=int, default=15, help="hyperparameter candidates to sample")
+parser.add_argument("--eta", type=int, default=3, help="halving: keep the best 1/eta candidates per rung")
+parser.add_argument("--time-budget", type=float, default=0, help="seconds for the search; 0 = no limit")
+parser.add_argument("--cv-jobs", type=int, default=None, help="candidate x fold fits run in parallel")
+parser.add_argument("--xgb-threads", type=int, default=None, help="threads per XGBoost fit")
+parser.add_argument("--pivot-monthly", action="store_true",
+                    help="pivot a monthly-exploded CSV to one row per season (unserved columns: needs --offline)")
+parser.add_argument("--rebuild-data-cache", action="store_true", help="re-pivot the monthly CSV even if cached")
+parser.add_argument("--skip-baseline", action="store_true", help="skip the default-parameter CV baseline")
+parser.add_argument("--update", metavar="NEW_CSV", help="update the saved model with these rows instead of retraining")
+parser.add_argument("--update-rounds", type=int, default=100, help="update: max boosting rounds to add")
+parser.add_argument("--update-learning-rate", type=float, default=None, help="update: learning rate (default: 0.1x model's)")
+parser.add_argument("--dry-run", action="store_true", help="update: report metrics without saving")
+parser.add_argument("--max-single-latency-ms", type=float, default=0,
+                    help="do not activate a model whose single-row p95 latency exceeds this; 0 = no limit")
+parser.add_argument("--max-batch-latency-ms", type=float, default=0,
+                    help="do not activate a model whose batch p95 latency exceeds this; 0 = no limit")
+parser.add_argument("--latency-batch-size", type=int, default=1000, help="rows per batch for the latency benchmark")
+args = parser.parse_args()
+
+profiler = TrainingProfiler()
+
+
+def save_outputs(pipeline, metrics: dict, extra: dict, X_latency: pd.DataFrame,
+                 drift_reference: dict = None) -> tuple[dict, dict, list]:
+    """Register the pipeline, benchmark the saved files and activate it unless it is too slow to serve.
+
+    `drift_reference` is None only for offline models, which are never served.
+
+    Returns (metadata, latency, problems); a rejected or offline model stays registered but inactive.
+    """
+    unservable = unservable_features(pipeline.named_steps["preprocessor"].feature_names_in_)
+    with profiler.stage("save"):
+        metadata = register_version(REGISTRY_DIR, pipeline, metrics=metrics, extra={**extra, "offline": bool(unservable)},
+                                    activate=False, documents={DRIFT_FILE: drift_reference} if drift_reference else None)
+        print("\nRegistered model version:", metadata["version"], "in", REGISTRY_DIR)
+
+    with profiler.stage("latency"):
+        paths = artifact_paths(version_dir(REGISTRY_DIR, metadata["version"]))
+        latency = measure_latency(X_latency, paths["pickle"], paths["booster"], paths["spec"],
+                                  batch_size=args.latency_batch_size, random_state=RANDOM_STATE)
+    for name in ("native", "pipeline"):
+        single, batch = latency[name]["single_row"], latency[name]["batch"]
+        print(f"{name:8s} latency: single row p50 {single['p50_ms']:.3f} ms / p95 {single['p95_ms']:.3f} ms, "
+              f"{latency['batch_size']} rows p95 {batch['p95_ms']:.2f} ms ({batch['rows_per_second']} rows/s)")
+
+    problems = check_latency(latency, args.max_single_latency_ms, args.max_batch_latency_ms)
+    if problems:
+        print("❌ Model too slow to serve, not activated:", "; ".join(problems))
+        return metadata, latency, problems
+    if unservable:
+        print("⚠️ Offline model, not activated: the server does not send", ", ".join(unservable[:5]),
+              f"(+{len(unservable) - 5} more)" if len(unservable) > 5 else "")
+        return metadata, latency, problems
+
+    with profiler.stage("publish"):
+        joblib.dump(pipeline, OUTPUT_MODEL_PATH)
+        print("Saved model to:", OUTPUT_MODEL_PATH)
+        save_native(pipeline, NATIVE_BOOSTER_PATH, NATIVE_SPEC_PATH)
+        print("Saved native booster to:", NATIVE_BOOSTER_PATH, "and preprocessing spec to:", NATIVE_SPEC_PATH)
+        export_pipeline(pipeline, TREES_PATH)
+        print("Saved exported trees to:", TREES_PATH)
+        save_reference(drift_reference, DRIFT_REFERENCE_PATH)
+        print("Saved drift reference to:", DRIFT_REFERENCE_PATH)
+        set_active(REGISTRY_DIR, metadata["version"])
+        print("Activated model version:", metadata["version"])
+    return metadata, latency, problems
+
+
+def save_profile(metadata: dict, problems: list, **sections):
+    """Write the run's profile into the version directory (and next to the backend model if activated)."""
+    report = profiler.report(version=metadata["version"], **sections)
+    if metadata["offline"]:
+        report["offline"] = "reads columns the server does not send; figures are for comparison only"
+    if problems:
+        report["rejected"] = problems
+    write_report(report, os.path.join(version_dir(REGISTRY_DIR, metadata["version"]), PROFILE_FILE))
+    if not problems and not metadata["offline"]:
+        write_report(report, PROFILE_PATH)
+        print("Saved training profile to:", PROFILE_PATH)
+    update_metadata(REGISTRY_DIR, metadata["version"], {"profile": summary(report)})
+
+
+# 🔁 Update mode: refresh the saved model with a new season of rows, then stop
+if args.update:
+    from update import run_update
+
+    print(f"Updating {OUTPUT_MODEL_PATH} with rows from {args.update}...")
+    with profiler.stage("update"):
+        _, updated_pipe, report = run_update(
+            OUTPUT_MODEL_PATH, args.update, args.data, args.target,
+            rounds=args.update_rounds, learning_rate=args.update_learning_rate, random_state=RANDOM_STATE,
+            pivot=args.pivot_monthly,
+        )
+    if report["added_categories"]:
+        print("New categories:", report["added_categories"])
+    print(f"Trees: {report['trees_before']} + {report['trees_added']} (features {report['n_features_before']} -> "
+          f"{report['n_features_after']})")
+    for name in ("holdout", "reference"):
+        if report[name]:
+            before, after = report[name]["before"], report[name]["after"]
+            print(f"{name:9s} RMSE {before['rmse']:.3f} -> {after['rmse']:.3f}   R2 {before['r2']:.4f} -> {after['r2']:.4f}"
+                  f"   ({before['rows']} rows)")
+
+    if not args.dry_run:
+        feature_cols = list(updated_pipe.named_steps["preprocessor"].feature_names_in_)
+        new_rows = load_dataset(args.update, pivot=args.pivot_monthly)[feature_cols]
+        # The updated model has seen the original training data and the new rows
+        seen = [load_dataset(args.data, pivot=args.pivot_monthly)[feature_cols]] if os.path.exists(args.data) else []
+        metadata, latency, problems = save_outputs(
+            updated_pipe,
+            metrics={"holdout_rmse": report["holdout"]["after"]["rmse"], "holdout_r2": report["holdout"]["after"]["r2"]},
+            extra={"update": report},
+            X_latency=new_rows,
+            drift_reference=None if unservable_features(feature_cols)
+            else build_reference(pd.concat(seen + [new_rows], ignore_index=True)),
+        )
+        save_profile(metadata, problems, latency=latency)
+        if problems:
+            sys.exit(1)
+    print("\n🎯 Update Completed Successfully! 🚀")
+    sys.exit(0)
+
+cv_jobs, xgb_threads = thread_plan(args.cv_jobs, args.xgb_threads, N_SPLITS)
+print(f"Threads: {cv_jobs} parallel fits x {xgb_threads} XGBoost threads (CPUs: {os.cpu_count()})")
+
 # 1️⃣ Load dataset
-df = pd.read_csv(DATA_PATH)
+with profiler.stage("load"):
+    df = load_dataset(args.data, rebuild=args.rebuild_data_cache, pivot=args.pivot_monthly)
 print("Loaded dataset:", df.shape)
 print(df.head())
 
 # 2️⃣ Features / Target
-TARGET = "Rice_Yield_kg_per_ha"
-if TARGET not in df.columns:
-    raise ValueError(f"Target column '{TARGET}' not found in dataset.")
+if args.target not in df.columns:
+    raise ValueError(f"Target column '{args.target}' not found in dataset.")
 
-df = df.drop(columns=["state", "crop"], errors="ignore")
+df = df.drop(columns=DROP_COLUMNS, errors="ignore")
 
-X = df.drop(columns=[TARGET])
-y = df[TARGET].astype(float)
+X = df.drop(columns=[args.target])
+y = df[args.target].astype(float)
+
+unservable = unservable_features(X.columns)
+if unservable and not args.offline:
+    raise ValueError(f"{args.data} has columns the server does not send ({', '.join(unservable[:5])}...); "
+                     "train on the served schema or pass --offline")
 
 numeric_cols = X.select_dtypes(include=np.number).columns.tolist()
-categorical_cols = X.select_dtypes(include=["object"]).columns.tolist()
+# Everything non-numeric is categorical (object, or pandas' string dtype)
+categorical_cols = X.select_dtypes(exclude=np.number).columns.tolist()
 
 print("\nNumeric features:", numeric_cols)
 print("Categorical features:", categorical_cols)
@@ -71,60 +255,114 @@ preprocessor = ColumnTransformer([
     ("cat", categorical_transformer, categorical_cols)
 ])
 
-# 4️⃣ Model Pipeline
-xgb = XGBRegressor(
-    objective="reg:squarederror",
-    random_state=RANDOM_STATE,
-    n_jobs=-1
-)
+# 4️⃣ Cached CV folds (preprocessing fitted once per fold, reused by every candidate)
+cv = KFold(n_splits=N_SPLITS, shuffle=True, random_state=RANDOM_STATE)
+started = time.perf_counter()
+with profiler.stage("fold_cache"):
+    folds = build_fold_cache(preprocessor, X, y, cv, val_size=VALIDATION_SIZE, random_state=RANDOM_STATE)
+print(f"\nEncoded {N_SPLITS} folds in {time.perf_counter() - started:.1f}s")
 
-pipe = Pipeline([
-    ("preprocessor", preprocessor),
-    ("regressor", xgb)
-])
+fit_kwargs = {
+    "cv_jobs": cv_jobs,
+    "xgb_threads": xgb_threads,
+    "max_estimators": MAX_ESTIMATORS,
+    "early_stopping_rounds": EARLY_STOPPING_ROUNDS,
+    "random_state": RANDOM_STATE,
+}
 
 # 5️⃣ Baseline CV
-cv = KFold(n_splits=N_SPLITS, shuffle=True, random_state=RANDOM_STATE)
-scoring = {"rmse": "neg_root_mean_squared_error", "r2": "r2"}
-
-print("\nRunning baseline metrics...")
-cv_results = cross_validate(pipe, X, y, cv=cv, scoring=scoring, n_jobs=-1)
-print(f"Baseline RMSE: {-cv_results['test_rmse'].mean():.3f}")
-print(f"Baseline R2: {cv_results['test_r2'].mean():.3f}")
+baseline = None
+if not args.skip_baseline:
+    print("\nRunning baseline metrics...")
+    with profiler.stage("baseline_cv"):
+        baseline = evaluate([{}], folds, **fit_kwargs)[0]
+    print(f"Baseline RMSE: {baseline['rmse']:.3f}")
+    print(f"Baseline R2: {baseline['r2']:.3f}")
 
 # 6️⃣ Hyperparameter Search
 param_dist = {
-    "regressor__n_estimators": [200, 400, 600],
-    "regressor__max_depth": [4, 6, 8],
-    "regressor__learning_rate": [0.03, 0.05, 0.1],
-    "regressor__subsample": [0.7, 0.9, 1.0],
-    "regressor__colsample_bytree": [0.6, 0.8, 1.0]
+    "max_depth": [4, 6, 8],
+    "learning_rate": [0.03, 0.05, 0.1],
+    "subsample": [0.7, 0.9, 1.0],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+    "min_child_weight": [1, 3, 5],
 }
+candidates = sample_candidates(param_dist, args.n_candidates, RANDOM_STATE)
 
-print("\nRunning RandomizedSearchCV...")
-rs = RandomizedSearchCV(
-    pipe, param_dist,
-    n_iter=15, scoring="neg_root_mean_squared_error",
-    cv=cv, verbose=1, random_state=RANDOM_STATE, n_jobs=-1
-)
-rs.fit(X, y)
-best_pipe = rs.best_estimator_
+print(f"\nRunning {args.search} search over {len(candidates)} candidates...")
+search_history = []
+started = time.perf_counter()
+with profiler.stage("search"):
+    if args.search == "halving":
+        ranked = successive_halving(candidates, folds, eta=args.eta, time_budget=args.time_budget,
+                                    history=search_history, **fit_kwargs)
+    else:
+        ranked = random_search(candidates, folds, time_budget=args.time_budget, history=search_history, **fit_kwargs)
+search_seconds = time.perf_counter() - started
+
+if ranked:
+    best = ranked[0]
+elif baseline is not None:
+    print("⚠️ Time budget ran out before any candidate finished; using default parameters")
+    best = baseline
+else:
+    raise RuntimeError("Time budget ran out before any candidate finished; raise --time-budget")
 
-print("\nBest parameters:", rs.best_params_)
-print("Best RMSE:", -rs.best_score_)
+# Trees for the final fit: early-stopped length averaged over the folds
+n_estimators = int(np.mean(best["best_iterations"])) + 1
+
+print(f"\nSearch finished in {search_seconds:.1f}s")
+print("Best parameters:", best["params"], "n_estimators:", n_estimators)
+print("Best RMSE:", best["rmse"])
+
+best_pipe = Pipeline([
+    ("preprocessor", preprocessor),
+    ("regressor", XGBRegressor(
+        objective="reg:squarederror",
+        tree_method="hist",
+        n_estimators=n_estimators,
+        random_state=RANDOM_STATE,
+        n_jobs=cv_jobs * xgb_threads,
+        **best["params"],
+    )),
+])
 
 # 7️⃣ Final Train-Test Evaluation
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.15, random_state=RANDOM_STATE)
-best_pipe.fit(X_train, y_train)
+with profiler.stage("final_fit"):
+    best_pipe.fit(X_train, y_train)
 y_pred = best_pipe.predict(X_test)
 
+test_rmse = float(np.sqrt(mean_squared_error(y_test, y_pred)))
+test_r2 = float(r2_score(y_test, y_pred))
+
 print("\nFinal Performance:")
-print("Test RMSE:", mean_squared_error(y_test, y_pred, squared=False))
-print("Test R2:", r2_score(y_test, y_pred))
+print("Test RMSE:", test_rmse)
+print("Test R2:", test_r2)
 
 # 8️⃣ Save Model
-joblib.dump(best_pipe, OUTPUT_MODEL_PATH)
-print("\nSaved model to:", OUTPUT_MODEL_PATH)
+metrics = {
+    "test_rmse": test_rmse,
+    "test_r2": test_r2,
+    "cv_rmse": best["rmse"],
+    "cv_r2": best["r2"],
+}
+if baseline is not None:
+    metrics.update({"baseline_cv_rmse": baseline["rmse"], "baseline_cv_r2": baseline["r2"]})
+
+metadata, latency, problems = save_outputs(
+    best_pipe,
+    metrics=metrics,
+    extra={
+        "data_path": args.data,
+        "n_rows": int(len(df)),
+        "best_params": {**best["params"], "n_estimators": n_estimators},
+        "search": {"mode": args.search, "candidates": len(candidates), "seconds": round(search_seconds, 1),
+                   "cv_jobs": cv_jobs, "xgb_threads": xgb_threads},
+    },
+    X_latency=X_test,
+    drift_reference=None if unservable else build_reference(X_train),
+)
 
 # 9️⃣ Feature Importance Plot
 ohe = best_pipe.named_steps["preprocessor"].named_transformers_["cat"].named_steps["onehot"]
@@ -133,15 +371,28 @@ feature_names = list(numeric_cols) + list(ohe.get_feature_names_out(categorical_
 importances = best_pipe.named_steps["regressor"].feature_importances_
 fi = pd.Series(importances, index=feature_names).sort_values().tail(25)
 
-plt.figure(figsize=(8, 10))
-fi.plot(kind="barh")
-plt.title("Top Feature Importances")
-plt.tight_layout()
-plt.savefig(FI_PLOT_PATH)
-print("Saved feature importances to:", FI_PLOT_PATH)
+# A rejected or offline model's plot stays with its version instead of replacing the served model's
+published = not problems and not metadata["offline"]
+plot_path = FI_PLOT_PATH if published else os.path.join(version_dir(REGISTRY_DIR, metadata["version"]), os.path.basename(FI_PLOT_PATH))
+with profiler.stage("plot"):
+    plt.figure(figsize=(8, 10))
+    fi.plot(kind="barh")
+    plt.title("Top Feature Importances")
+    plt.tight_layout()
+    plt.savefig(plot_path)
+print("Saved feature importances to:", plot_path)
 
 # 🔟 Save Predictions Sample
 pd.DataFrame({"actual": y_test, "predicted": y_pred}).to_csv("xgb_test_predictions.csv", index=False)
 print("Saved sample predictions to xgb_test_predictions.csv")
 
+# 📊 Training profile
+save_profile(
+    metadata, problems,
+    search={"mode": args.search, "seconds": round(search_seconds, 3), "candidates": candidate_timings(search_history)},
+    latency=latency,
+)
+if problems:
+    sys.exit(1)
+
 print("\n🎯 Training Completed Successfully! 🚀")
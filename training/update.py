@@ -0,0 +1,208 @@
+"""
+update.py
+Refresh the trained pipeline with a new season of rows instead of retraining from scratch
+(`python train.py --update new_season.csv`).
+
+- The fitted preprocessor is kept as is; categories never seen before (e.g. a new
+  district) are appended by replacing the OneHotEncoder with one fitted on the extended
+  category lists (public API only). The ColumnTransformer's documented output_indices_
+  is then recomputed, which is checked against the scikit-learn versions below, and the
+  extended preprocessor must encode the new rows exactly like the compiled encoder.
+- Appending categories shifts the one-hot columns that follow, so every split in the
+  existing booster is remapped to its feature's new index before training continues.
+  On old rows the remapped booster predicts exactly what the original did.
+- Boosting continues on the new rows only, with early stopping on a slice of them and
+  (by default) a tenth of the model's learning rate, so a small season nudges the model
+  rather than overwriting what it learned.
+- Before/after RMSE and R2 are reported on a holdout of the new rows and on a sample
+  of the original training data (to catch forgetting).
+"""
+
+import copy
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from xgboost import Booster, XGBRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from fast_encoder import CompiledEncoder
+from prepare_data import load_dataset
+
+UPDATE_LEARNING_RATE_SCALE = 0.1  # default update learning rate, relative to the model's own
+# scikit-learn releases whose ColumnTransformer/OneHotEncoder layout extend_categories was checked against
+SKLEARN_VERSIONS = ((1, 2), (2, 0))
+
+
+def _check_sklearn():
+    version = tuple(int(part) for part in sklearn.__version__.split(".")[:2])
+    low, high = SKLEARN_VERSIONS
+    if not low <= version < high:
+        raise RuntimeError(f"Updating categories is only supported on scikit-learn >={'.'.join(map(str, low))},"
+                           f"<{'.'.join(map(str, high))} (found {sklearn.__version__}); retrain instead")
+
+
+def extend_categories(preprocessor, X_new) -> dict:
+    """Append unseen categories to each OneHotEncoder in place; returns {column: [added categories]}."""
+    added, rebuilt = {}, False
+    for name, transformer, cols in preprocessor.transformers_:
+        if not hasattr(transformer, "named_steps") or "onehot" not in transformer.named_steps:
+            continue
+        onehot = transformer.named_steps["onehot"]
+        categories = []
+        for i, col in enumerate(cols):
+            known = onehot.categories_[i].tolist()
+            new = [v for v in dict.fromkeys(X_new[col].dropna().tolist()) if v not in set(known)]
+            if new:
+                added[col] = new
+            categories.append(known + new)
+        if not any(col in added for col in cols):
+            continue
+
+        _check_sklearn()
+        # A fresh encoder with the same settings, fitted on the extended lists (explicit categories keep their order)
+        extended = type(onehot)(**{**onehot.get_params(), "categories": categories})
+        longest = max(len(c) for c in categories)
+        extended.fit(pd.DataFrame({col: [c[min(j, len(c) - 1)] for j in range(longest)]
+                                   for col, c in zip(cols, categories)}))
+        transformer.steps[-1] = ("onehot", extended)
+        rebuilt = True
+
+    if rebuilt:
+        # The ColumnTransformer records each block's output slice; recompute it for the wider one-hot block
+        if not isinstance(getattr(preprocessor, "output_indices_", None), dict):
+            raise RuntimeError(f"ColumnTransformer has no output_indices_ on scikit-learn {sklearn.__version__}; "
+                               "retrain instead")
+        start, indices = 0, {}
+        for name, transformer, cols in preprocessor.transformers_:
+            width = len(cols)
+            if hasattr(transformer, "named_steps") and "onehot" in transformer.named_steps:
+                width = sum(len(c) for c in transformer.named_steps["onehot"].categories_)
+            indices[name] = slice(start, start + width)
+            start += width
+        preprocessor.output_indices_ = indices
+
+        # The rebuilt preprocessor must agree with the encoder the server compiles from it
+        encoder = CompiledEncoder.from_preprocessor(preprocessor)
+        X = X_new[list(preprocessor.feature_names_in_)]
+        expected = encoder.transform({col: X[col].tolist() for col in X.columns})
+        if not np.allclose(np.asarray(preprocessor.transform(X), dtype=np.float64), expected, atol=1e-6):
+            raise RuntimeError("Extended preprocessor does not match its compiled encoder; retrain instead")
+    return added
+
+
+def feature_index_map(old_encoder: CompiledEncoder, new_encoder: CompiledEncoder) -> np.ndarray:
+    """old encoded column -> new encoded column, for the same preprocessor before/after extend_categories."""
+    mapping = np.arange(old_encoder.n_features)
+    for old_index, new_index in zip(old_encoder.category_index, new_encoder.category_index):
+        for category, position in old_index.items():
+            mapping[position] = new_index[category]
+    return mapping
+
+
+def remap_booster(booster: Booster, mapping: np.ndarray, n_features: int) -> Booster:
+    """Copy of the booster whose splits use the new feature indices."""
+    model = json.loads(booster.save_raw("json"))
+    learner = model["learner"]
+    gbm = learner["gradient_booster"]
+    if gbm.get("name") != "gbtree":
+        raise ValueError(f"Only gbtree boosters can be updated, not {gbm.get('name')!r}")
+
+    for tree in gbm["model"]["trees"]:
+        left = tree["left_children"]
+        tree["split_indices"] = [int(mapping[f]) if left[node] != -1 else 0
+                                 for node, f in enumerate(tree["split_indices"])]
+        tree["tree_param"]["num_feature"] = str(n_features)
+    learner["learner_model_param"]["num_feature"] = str(n_features)
+    learner["feature_names"] = []
+    learner["feature_types"] = []
+
+    remapped = Booster()
+    remapped.load_model(bytearray(json.dumps(model).encode()))
+    return remapped
+
+
+def regression_metrics(pipeline, X, y) -> dict:
+    y_pred = pipeline.predict(X)
+    return {"rmse": float(np.sqrt(mean_squared_error(y, y_pred))), "r2": float(r2_score(y, y_pred)), "rows": int(len(y))}
+
+
+def update_pipeline(pipeline, X_new, y_new, rounds: int = 100, learning_rate: float = None,
+                    early_stopping_rounds: int = 10, val_size: float = 0.15, random_state: int = 42):
+    """Returns (updated copy of the pipeline, info dict); the input pipeline is left untouched."""
+    updated = copy.deepcopy(pipeline)
+    preprocessor = updated.named_steps["preprocessor"]
+    old_regressor = updated.named_steps["regressor"]
+
+    old_encoder = CompiledEncoder.from_preprocessor(preprocessor)
+    added = extend_categories(preprocessor, X_new)
+    new_encoder = CompiledEncoder.from_preprocessor(preprocessor)
+
+    booster = old_regressor.get_booster()
+    old_trees = booster.num_boosted_rounds()
+    if added:
+        booster = remap_booster(booster, feature_index_map(old_encoder, new_encoder), new_encoder.n_features)
+
+    params = old_regressor.get_params()
+    params.update({"n_estimators": rounds, "early_stopping_rounds": early_stopping_rounds or None})
+    if learning_rate is None:
+        learning_rate = (params.get("learning_rate") or 0.3) * UPDATE_LEARNING_RATE_SCALE  # 0.3 = XGBoost default
+    params["learning_rate"] = learning_rate
+    regressor = XGBRegressor(**params)
+
+    X_enc = np.asarray(preprocessor.transform(X_new), dtype=np.float32)
+    y_new = np.asarray(y_new, dtype=np.float32)
+    if early_stopping_rounds:
+        X_fit, X_val, y_fit, y_val = train_test_split(X_enc, y_new, test_size=val_size, random_state=random_state)
+        regressor.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], xgb_model=booster, verbose=False)
+    else:
+        regressor.fit(X_enc, y_new, xgb_model=booster, verbose=False)
+
+    updated.steps[-1] = ("regressor", regressor)
+    total_trees = regressor.get_booster().num_boosted_rounds()
+    return updated, {
+        "added_categories": added,
+        "n_features_before": old_encoder.n_features,
+        "n_features_after": new_encoder.n_features,
+        "trees_before": old_trees,
+        "trees_added": total_trees - old_trees,
+        "best_iteration": getattr(regressor, "best_iteration", None) if early_stopping_rounds else None,
+        "update_rows": int(len(y_new)),
+        "learning_rate": learning_rate,
+    }
+
+
+def run_update(model_path: str, new_data_path: str, reference_data_path: str, target: str,
+               rounds: int = 100, learning_rate: float = None, holdout_size: float = 0.2,
+               early_stopping_rounds: int = 10, random_state: int = 42, pivot: bool = False):
+    """Load, update and evaluate; returns (old pipeline, updated pipeline, report)."""
+    import joblib
+
+    pipeline = joblib.load(model_path)
+    feature_cols = list(pipeline.named_steps["preprocessor"].feature_names_in_)
+
+    new_df = load_dataset(new_data_path, pivot=pivot)
+    missing = [c for c in feature_cols + [target] if c not in new_df.columns]
+    if missing:
+        raise ValueError(f"New data is missing columns: {missing}")
+    train_df, holdout_df = train_test_split(new_df, test_size=holdout_size, random_state=random_state)
+
+    updated, info = update_pipeline(pipeline, train_df[feature_cols], train_df[target], rounds=rounds,
+                                    learning_rate=learning_rate, early_stopping_rounds=early_stopping_rounds,
+                                    random_state=random_state)
+
+    report = {"model_path": model_path, "new_data": new_data_path, **info, "holdout": {}, "reference": {}}
+    report["holdout"]["before"] = regression_metrics(pipeline, holdout_df[feature_cols], holdout_df[target])
+    report["holdout"]["after"] = regression_metrics(updated, holdout_df[feature_cols], holdout_df[target])
+
+    if reference_data_path and os.path.exists(reference_data_path):
+        ref_df = load_dataset(reference_data_path, pivot=pivot)
+        ref_df = ref_df.sample(n=min(2000, len(ref_df)), random_state=random_state)
+        report["reference"]["before"] = regression_metrics(pipeline, ref_df[feature_cols], ref_df[target])
+        report["reference"]["after"] = regression_metrics(updated, ref_df[feature_cols], ref_df[target])
+    return pipeline, updated, report